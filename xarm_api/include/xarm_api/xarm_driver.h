@@ -9,6 +9,11 @@
 #ifndef __XARM_DRIVER_H
 #define __XARM_DRIVER_H
 
+#include <map>
+#include <deque>
+#include <functional>
+#include <ctime>
+#include <thread>
 #include <rclcpp/rclcpp.hpp>
 #include <rclcpp_action/rclcpp_action.hpp>
 #include <std_msgs/msg/float32.hpp>
@@ -17,6 +22,8 @@
 #include <control_msgs/action/gripper_command.hpp>
 
 #include "xarm_msgs.h"
+#include "xarm_report_buffer.h"
+#include "xarm_report_watchdog.h"
 #include "xarm/wrapper/xarm_api.h"
 
 namespace xarm_api
@@ -37,6 +44,9 @@ namespace xarm_api
         bool is_connected(void);
         std::string controller_error_interpreter(int err=-1);
 
+        // latest joint states of the report socket, only one consumer thread is allowed
+        bool get_report_joint_states(ReportJointStates &states, double max_age = 0);
+
         rclcpp::Logger get_logger() { return node_->get_logger(); }
 
     private:
@@ -44,17 +54,95 @@ namespace xarm_api
         void _report_data_callback(XArmReportData *report_data_ptr);
         bool _get_wait_param(void);
 
+        template<typename MessageT>
+        void _publish_report_msg(const typename rclcpp::Publisher<MessageT>::SharedPtr &pub, const MessageT &msg);
+        struct ReportTopicRate
+        {
+            double interval;  // seconds, 0: every report
+            double last_stamp;
+        };
+        void _init_report_topic_rate(const std::string &topic, ReportTopicRate &rate);
+        bool _report_topic_due(const rclcpp::PublisherBase::SharedPtr &pub, ReportTopicRate &rate, const rclcpp::Time &stamp);
+        void _publish_report_data(const ReportPublishData &data);
+        void _batch_ftsensor_data(const ReportPublishData &data);
+        void _report_publish_loop(void);
+        void _record_report_cost(const struct timespec &cpu_start, const std::chrono::steady_clock::time_point &wall_start);
+        bool _get_report_snapshot(ReportSnapshot &snapshot, float max_age, bool need_err_warn = false);
+
         void _init_gripper(void);
         inline float _gripper_pos_convert(float pos, bool reversed = false);
         rclcpp_action::GoalResponse _handle_gripper_action_goal(const rclcpp_action::GoalUUID & uuid, std::shared_ptr<const control_msgs::action::GripperCommand::Goal> goal);
         rclcpp_action::CancelResponse _handle_gripper_action_cancel(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle);
         void _handle_gripper_action_accepted(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle);
         void _gripper_action_execute(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle);
+        void _gripper_loop(void);
         void _pub_gripper_joint_states(float pos);
 
         template<typename ServiceT, typename CallbackT>
     	typename rclcpp::Service<ServiceT>::SharedPtr _create_service(const std::string & service_name, CallbackT && callback);
 
+        struct ServiceGroup
+        {
+            rclcpp::CallbackGroup::SharedPtr callback_group;
+            int limit;  // concurrent callbacks, <= 0: unlimited
+            bool reject;  // return busy beyond a limit above 1, otherwise such a limit is not enforced
+            int running;  // counted for every limit
+            std::mutex mutex;
+        };
+        // leaves the service group when the callback returns or throws
+        class ServiceGroupGuard
+        {
+        public:
+            ServiceGroupGuard(XArmDriver *driver, const std::shared_ptr<ServiceGroup> &group)
+                : driver_(driver), group_(group), entered_(driver->_enter_service_group(group)) {}
+            ~ServiceGroupGuard() { if (entered_) driver_->_leave_service_group(group_); }
+            bool entered(void) const { return entered_; }
+        private:
+            XArmDriver *driver_;
+            std::shared_ptr<ServiceGroup> group_;
+            bool entered_;
+        };
+        void _init_service_groups(void);
+        std::shared_ptr<ServiceGroup> _get_service_group(const std::string &service_name);
+        bool _enter_service_group(const std::shared_ptr<ServiceGroup> &group);
+        void _leave_service_group(const std::shared_ptr<ServiceGroup> &group);
+
+        enum class MotionActionEnd { SUCCEEDED, ABORTED, CANCELED };
+        // a goal of the motion action servers, independent of the action type
+        struct MotionActionGoal
+        {
+            std::string name;
+            std::function<int(void)> send;  // sends the motion without waiting for it
+            std::function<bool(void)> is_canceling;
+            std::function<void(const ReportSnapshot &snapshot, int queue_index)> publish_feedback;
+            std::function<void(MotionActionEnd end, int ret, const std::string &message)> finish;
+            bool moved;
+            std::chrono::steady_clock::time_point sent_stamp;
+        };
+        template<typename ActionT>
+        typename rclcpp_action::Server<ActionT>::SharedPtr _create_motion_action_server(const std::string &name,
+            std::function<int(const std::shared_ptr<const typename ActionT::Goal> &goal)> send);
+        void _init_motion_action(void);
+        bool _other_motions_active(std::string &reason);
+        void _motion_action_loop(void);
+        int _send_waypoint(bool cartesian, const xarm_msgs::msg::Waypoint &waypoint);
+        void _waypoint_loop(void);
+        void _move_waypoints_execute(const std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> goal_handle);
+
+        struct ServoStreamStats
+        {
+            std::atomic<long int> received;
+            std::atomic<long int> forwarded;
+            std::atomic<long int> stale;
+            std::atomic<long int> rate_limited;
+            std::atomic<long int> failed;
+            std::chrono::steady_clock::time_point last_forward;
+        };
+        rclcpp::Subscription<xarm_msgs::msg::ServoCommand>::SharedPtr _create_servo_subscription(const std::string &topic,
+            std::function<int(const xarm_msgs::msg::ServoCommand &cmd)> forward);
+        void _init_servo_stream(void);
+        void _log_servo_stream_stats(void);
+
         void _init_publisher(void);
         void _init_service(void);
 
@@ -73,27 +161,101 @@ namespace xarm_api
         std::string report_type_;
         std::vector<std::string> joint_names_;
         sensor_msgs::msg::JointState joint_state_msg_;
-        geometry_msgs::msg::WrenchStamped ftsensor_msg_;
+        geometry_msgs::msg::WrenchStamped ftsensor_ext_msg_;
+        geometry_msgs::msg::WrenchStamped ftsensor_raw_msg_;
+        int ftsensor_batch_size_;
+        xarm_msgs::msg::FTSensorBatch ftsensor_batch_msg_;
         xarm_msgs::msg::RobotMsg xarm_state_msg_;
         xarm_msgs::msg::CIOState cgpio_state_msg_;
+        uint64_t report_seq_;
+        float report_prev_angle_[7];
+        std::chrono::steady_clock::time_point report_prev_stamp_;
+
+        bool report_publish_async_;
+        std::atomic<long int> report_overrun_cnts_;
+        DropOldestQueue<ReportPublishData> report_queue_;
+        std::thread report_publish_thread_;
+
+        bool report_skip_unsubscribed_;
+        ReportTopicRate joint_state_rate_;
+        ReportTopicRate robot_state_rate_;
+        ReportTopicRate cgpio_state_rate_;
+        ReportTopicRate ftsensor_ext_state_rate_;
+        ReportTopicRate ftsensor_raw_state_rate_;
+        double report_cost_period_;
+        long int report_cost_cnts_;
+        double report_cpu_total_time_;
+        double report_cpu_max_time_;
+        double report_wall_total_time_;
+        double report_wall_max_time_;
+        std::chrono::steady_clock::time_point report_cost_start_;
+        LatestValueBuffer<ReportJointStates> report_joint_states_;
+        std::mutex report_snapshot_mutex_;
+        ReportSnapshot report_snapshot_;
+        double getter_max_age_;
 
         rclcpp::Publisher<sensor_msgs::msg::JointState>::SharedPtr joint_state_pub_;
         rclcpp::Publisher<xarm_msgs::msg::RobotMsg>::SharedPtr robot_state_pub_;
         rclcpp::Publisher<xarm_msgs::msg::CIOState>::SharedPtr cgpio_state_pub_;
         rclcpp::Publisher<geometry_msgs::msg::WrenchStamped>::SharedPtr ftsensor_ext_state_pub_;
         rclcpp::Publisher<geometry_msgs::msg::WrenchStamped>::SharedPtr ftsensor_raw_state_pub_;
+        rclcpp::Publisher<xarm_msgs::msg::FTSensorBatch>::SharedPtr ftsensor_batch_state_pub_;
 
         rclcpp::Subscription<std_msgs::msg::Float32>::SharedPtr sleep_sub_;
 
-        bool gripper_init_loop_;
+        std::atomic<bool> motion_action_enable_;
+        double motion_feedback_rate_;
+        double motion_start_timeout_;
+        double motion_report_timeout_;
+        bool motion_resume_after_stop_;
+        bool motion_action_quit_;
+        std::mutex motion_action_mutex_;
+        std::condition_variable motion_action_cond_;
+        std::deque<std::shared_ptr<MotionActionGoal>> motion_pending_goals_;
+        std::atomic<int> motion_goal_cnt_;  // accepted motion goals which are not finished
+        std::thread motion_action_thread_;
+        rclcpp_action::Server<xarm_msgs::action::MoveCartesian>::SharedPtr set_position_action_server_;
+        rclcpp_action::Server<xarm_msgs::action::MoveCartesian>::SharedPtr set_tool_position_action_server_;
+        rclcpp_action::Server<xarm_msgs::action::MoveJoint>::SharedPtr set_servo_angle_action_server_;
+        rclcpp_action::Server<xarm_msgs::action::MoveCircle>::SharedPtr move_circle_action_server_;
+        rclcpp_action::Server<xarm_msgs::action::MoveHome>::SharedPtr move_gohome_action_server_;
+        int waypoint_window_;
+        std::atomic<bool> waypoint_goal_active_;
+        std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> waypoint_goal_;  // accepted, not yet taken by the waypoint thread
+        std::thread waypoint_thread_;
+        rclcpp_action::Server<xarm_msgs::action::MoveWaypoints>::SharedPtr move_waypoints_action_server_;
+
+        double servo_max_age_;
+        double servo_min_interval_;
+        rclcpp::CallbackGroup::SharedPtr servo_callback_group_;
+        std::map<std::string, std::shared_ptr<ServoStreamStats>> servo_stream_stats_;
+        rclcpp::Subscription<xarm_msgs::msg::ServoCommand>::SharedPtr servo_angle_j_sub_;
+        rclcpp::Subscription<xarm_msgs::msg::ServoCommand>::SharedPtr servo_cartesian_sub_;
+        rclcpp::Subscription<xarm_msgs::msg::ServoCommand>::SharedPtr servo_cartesian_aa_sub_;
+        rclcpp::TimerBase::SharedPtr servo_stats_timer_;
+
+        // motion, io, gripper and query
+        std::map<std::string, std::shared_ptr<ServiceGroup>> service_groups_;
+
         int gripper_speed_;
         int gripper_max_pos_;
         int gripper_frequency_;
         int gripper_threshold_;
         int gripper_threshold_times_;
+        int gripper_reached_tolerance_;
+        double gripper_idle_frequency_;
+        bool gripper_publish_;  // add_gripper, publish the joint states of the gripper
+        float gripper_last_pos_;  // last position read, only used by the gripper thread
+        bool gripper_last_pos_valid_;
+        double gripper_timeout_;
+        bool gripper_preempt_;
+        std::atomic<bool> gripper_ready_;  // mode/enable/speed are set, cleared by the gripper services
+        bool gripper_quit_;
+        std::mutex gripper_mutex_;
+        std::condition_variable gripper_cond_;
+        std::deque<std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>>> gripper_goals_;
+        std::thread gripper_thread_;
         sensor_msgs::msg::JointState gripper_joint_state_msg_;
-        control_msgs::action::GripperCommand::Feedback::SharedPtr gripper_feedback_;
-        control_msgs::action::GripperCommand::Result::SharedPtr gripper_result_;
         rclcpp_action::Server<control_msgs::action::GripperCommand>::SharedPtr gripper_action_server_;
     
     private:
@@ -4,6 +4,9 @@
 #include <xarm_msgs/msg/robot_msg.hpp>
 #include <xarm_msgs/msg/io_state.hpp>
 #include <xarm_msgs/msg/cio_state.hpp>
+#include <xarm_msgs/msg/ft_sensor_batch.hpp>
+#include <xarm_msgs/msg/waypoint.hpp>
+#include <xarm_msgs/msg/servo_command.hpp>
 
 #include <xarm_msgs/srv/bio_gripper_ctrl.hpp>
 #include <xarm_msgs/srv/bio_gripper_enable.hpp>
@@ -49,4 +52,10 @@
 #include <xarm_msgs/srv/linear_track_back_origin.hpp>
 #include <xarm_msgs/srv/linear_track_set_pos.hpp>
 
+#include <xarm_msgs/action/move_cartesian.hpp>
+#include <xarm_msgs/action/move_joint.hpp>
+#include <xarm_msgs/action/move_circle.hpp>
+#include <xarm_msgs/action/move_home.hpp>
+#include <xarm_msgs/action/move_waypoints.hpp>
+
 #endif // __XARM_MSGS_H
\ No newline at end of file
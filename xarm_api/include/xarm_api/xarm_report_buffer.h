@@ -0,0 +1,183 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __XARM_REPORT_BUFFER_H
+#define __XARM_REPORT_BUFFER_H
+
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <mutex>
+#include <vector>
+#include <condition_variable>
+#include <rclcpp/time.hpp>
+
+namespace xarm_api
+{
+    /**
+     * Lock-free single-producer/single-consumer buffer holding the latest value (triple buffer).
+     * The producer never waits for the consumer and the consumer always gets the newest complete value.
+     */
+    template<typename T>
+    class LatestValueBuffer
+    {
+    public:
+        LatestValueBuffer() : middle_(1), back_(2), front_(0) {}
+
+        // producer: fill back() then publish()
+        T& back(void) { return slots_[back_]; }
+        void publish(void)
+        {
+            back_ = middle_.exchange(back_ | DIRTY, std::memory_order_acq_rel) & INDEX_MASK;
+        }
+
+        // consumer: update() then read front(), returns true if a new value was taken
+        bool update(void)
+        {
+            if (!(middle_.load(std::memory_order_relaxed) & DIRTY)) return false;
+            front_ = middle_.exchange(front_, std::memory_order_acq_rel) & INDEX_MASK;
+            return true;
+        }
+        const T& front(void) const { return slots_[front_]; }
+
+    private:
+        static const int DIRTY = 4;
+        static const int INDEX_MASK = 3;
+
+        T slots_[3];
+        alignas(64) std::atomic<int> middle_;
+        alignas(64) int back_;
+        alignas(64) int front_;
+    };
+
+    struct ReportJointStates
+    {
+        ReportJointStates() : seq(0), state(0), err(0), mode(0) {}
+
+        uint64_t seq;  // 0 means nothing received yet
+        std::chrono::steady_clock::time_point stamp;
+        int state;
+        int err;
+        int mode;
+        float position[7];
+        float velocity[7];
+        float effort[7];
+    };
+
+    // report values the cached getter services answer from, guarded by a mutex as any service thread may read it
+    struct ReportSnapshot
+    {
+        ReportSnapshot() : seq(0), state(0), cmdnum(0), err(0), war(0) {}
+
+        uint64_t seq;  // 0 means nothing received yet
+        std::chrono::steady_clock::time_point stamp;
+        int state;
+        int cmdnum;
+        int err;
+        int war;
+        float angle[7];
+        float pose[6];
+    };
+
+    /**
+     * Bounded queue that drops the oldest element when full, the producer never blocks on the consumer.
+     * All slots are allocated by set_capacity(), push() and pop() only copy into and out of them.
+     */
+    template<typename T>
+    class DropOldestQueue
+    {
+    public:
+        DropOldestQueue() : head_(0), size_(0), closed_(false) { slots_.resize(1); }
+
+        void set_capacity(size_t capacity)
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            slots_.resize(capacity > 0 ? capacity : 1);
+            head_ = 0;
+            size_ = 0;
+        }
+
+        // returns false if the oldest element was dropped to make room
+        bool push(const T &value)
+        {
+            bool dropped = false;
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                if (closed_) return true;
+                if (size_ == slots_.size()) {
+                    head_ = (head_ + 1) % slots_.size();
+                    size_ -= 1;
+                    dropped = true;
+                }
+                slots_[(head_ + size_) % slots_.size()] = value;
+                size_ += 1;
+            }
+            cond_.notify_one();
+            return !dropped;
+        }
+
+        // blocks until an element is available, returns false once closed
+        bool pop(T &value)
+        {
+            std::unique_lock<std::mutex> lock(mutex_);
+            cond_.wait(lock, [this] { return size_ > 0 || closed_; });
+            if (closed_) return false;
+            value = slots_[head_];
+            head_ = (head_ + 1) % slots_.size();
+            size_ -= 1;
+            return true;
+        }
+
+        void close(void)
+        {
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                closed_ = true;
+            }
+            cond_.notify_all();
+        }
+
+    private:
+        std::vector<T> slots_;
+        size_t head_;
+        size_t size_;
+        bool closed_;
+        std::mutex mutex_;
+        std::condition_variable cond_;
+    };
+
+    // fields of XArmReportData published on the report topics
+    struct ReportPublishData
+    {
+        rclcpp::Time stamp;
+        int total_num;
+        int state;
+        int mode;
+        int cmdnum;
+        int err;
+        int war;
+        int mt_brake;
+        int mt_able;
+        float angle[7];
+        float rt_joint_spds[7];
+        float tau[7];
+        float pose[6];
+        float tcp_offset[6];
+        int cgpio_state;
+        int cgpio_code;
+        int cgpio_input_digitals[2];
+        int cgpio_output_digitals[2];
+        float cgpio_input_analogs[2];
+        float cgpio_output_analogs[2];
+        int cgpio_input_conf[16];
+        int cgpio_output_conf[16];
+        float ft_ext_force[6];
+        float ft_raw_force[6];
+    };
+}
+
+#endif // __XARM_REPORT_BUFFER_H
@@ -0,0 +1,57 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __XARM_REPORT_WATCHDOG_H
+#define __XARM_REPORT_WATCHDOG_H
+
+#include <chrono>
+#include <cstdint>
+
+namespace xarm_api
+{
+    /**
+     * Tells a motion goal which reports know about its last send, and when no such report arrived for too long,
+     * e.g. the report socket is down, so that the goal is aborted instead of waiting forever.
+     * Not thread-safe.
+     */
+    class ReportWatchdog
+    {
+    public:
+        typedef std::chrono::steady_clock::time_point TimePoint;
+
+        ReportWatchdog() : timeout_(0), last_seq_(0) {}
+
+        // starts waiting for a fresh report at now, timeout in seconds, <= 0 waits forever
+        void start(double timeout, TimePoint now)
+        {
+            timeout_ = timeout;
+            wait_start_ = now;
+        }
+
+        // true for a report not taken yet and received after the last send, it restarts the wait
+        bool fresh(uint64_t seq, TimePoint stamp, TimePoint sent_stamp, TimePoint now)
+        {
+            if (seq == 0 || seq == last_seq_ || stamp <= sent_stamp) return false;
+            last_seq_ = seq;
+            wait_start_ = now;
+            return true;
+        }
+
+        // true once no fresh report arrived within the timeout
+        bool expired(TimePoint now) const
+        {
+            return timeout_ > 0 && std::chrono::duration<double>(now - wait_start_).count() > timeout_;
+        }
+
+    private:
+        double timeout_;
+        uint64_t last_seq_;
+        TimePoint wait_start_;
+    };
+}
+
+#endif // __XARM_REPORT_WATCHDOG_H
@@ -7,8 +7,58 @@
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
  
 import os
+import json
+import time
 import yaml
+import hashlib
 from tempfile import NamedTemporaryFile
+from ament_index_python import get_package_share_directory
+from launch.launch_description_sources import load_python_launch_file_as_module
+
+
+def get_xarm_cache_dir(*paths):
+    # xarm_description/launch/lib/robot_description_lib.py
+    mod = load_python_launch_file_as_module(os.path.join(get_package_share_directory('xarm_description'), 'launch', 'lib', 'robot_description_lib.py'))
+    return getattr(mod, 'get_xarm_cache_dir')(*paths)
+
+
+def _evict_params_files(cache_dir, max_entries, keep=None, min_age=600):
+    # least recently used first, every use of a file refreshes its mtime
+    # files used within min_age seconds are kept, another launch may have passed them to a node that did not start yet
+    try:
+        now = time.time()
+        files = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.yaml')]
+        files.sort(key=lambda path: os.path.getmtime(path))
+        for path in files[:max(len(files) - max_entries, 0)]:
+            if path != keep and now - os.path.getmtime(path) > min_age:
+                os.remove(path)
+    except Exception:
+        pass
+
+
+def generate_params_file(params_yaml, prefix='launch_params_', max_entries=64):
+    """
+    Write params_yaml to the xarm cache directory, the file is named by the hash of its content.
+    The same parameters always give the same path, an existing file is reused instead of dumped again.
+    """
+    digest = hashlib.sha256(json.dumps(params_yaml, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+    cache_dir = get_xarm_cache_dir('params')
+    path = os.path.join(cache_dir, '{}{}.yaml'.format(prefix, digest))
+    try:
+        if os.path.exists(path):
+            os.utime(path, None)
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            with NamedTemporaryFile(mode='w', dir=cache_dir, prefix='.{}'.format(prefix), delete=False) as h:
+                yaml.dump(params_yaml, h, default_flow_style=False)
+            os.replace(h.name, path)
+            _evict_params_files(cache_dir, max_entries, keep=path)
+        return path
+    except Exception as e:
+        print('write params to {} error, {}'.format(cache_dir, e))
+        with NamedTemporaryFile(mode='w', prefix=prefix, delete=False) as h:
+            yaml.dump(params_yaml, h, default_flow_style=False)
+            return h.name
 
 
 def merge_dict(dict1, dict2):
@@ -52,8 +102,6 @@ def generate_robot_api_params(robot_default_params_path, robot_user_params_path=
             }
         else:
             xarm_params_yaml = ros2_control_params_yaml
-        with NamedTemporaryFile(mode='w', prefix='launch_params_', delete=False) as h:
-            yaml.dump(xarm_params_yaml, h, default_flow_style=False)
-            return h.name
+        return generate_params_file(xarm_params_yaml)
     return robot_default_params_path
 
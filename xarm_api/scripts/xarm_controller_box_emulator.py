@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2021, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Local emulator of the xArm controller box, to run xarm_driver and the ros2_control hardware without a robot.
+
+It serves the control port (502) and the report ports (30001 normal, 30002 rich, 30003 dev) on --host,
+so the existing launch files can use robot_ip:=127.0.0.1. Use another loopback address (127.0.0.2, ...)
+for every additional arm. Binding port 502 needs root, or lowering net.ipv4.ip_unprivileged_port_start.
+
+Emulated: servo_angle_j, set_servo_angle, vc_set_joint_velocity, get_servo_angle/get_joint_states,
+state/mode/error handling, the report stream and the gripper Modbus registers.
+Other registers are acknowledged with zero data.
+"""
+
+import argparse
+import math
+import random
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+CONTROL_PORT = 502
+REPORT_PORTS = {'normal': 30001, 'rich': 30002, 'dev': 30003}
+REPORT_SIZES = {'normal': 145, 'rich': 481, 'dev': 135}
+
+# register numbers of the control protocol
+GET_VERSION = 1
+GET_ROBOT_SN = 2
+MOTION_EN = 11
+SET_STATE = 12
+GET_STATE = 13
+GET_CMDNUM = 14
+GET_ERROR = 15
+CLEAN_ERR = 16
+CLEAN_WAR = 17
+SET_MODE = 19
+MOVE_JOINT = 23
+MOVE_HOME = 25
+MOVE_SERVOJ = 29
+GET_JOINT_POS = 42
+VC_SET_JOINTV = 81
+RS485_RTU = 124
+TGPIO_R16B = 128
+
+# data length (bytes) of the replies of the get registers, the others reply without data
+REPLY_SIZES = {
+    GET_VERSION: 40, GET_ROBOT_SN: 40, 3: 1, 8: 1, 10: 79, 13: 1, 14: 2, 15: 2, 22: 2,
+    41: 24, 42: 28, 43: 28, 44: 24, 45: 1, 46: 1, 51: 2, 56: 1, 91: 24, 102: 2, 103: 1,
+    106: 16, 129: 4, 130: 2, 131: 4, 132: 2, 133: 2, 134: 2, 135: 2, 200: 1, 201: 24,
+}
+
+BAUDRATES = (4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600, 1000000, 1500000, 2000000, 2500000)
+GRIPPER_BAUDRATE = 2000000
+RS485_HOST_ID = 9
+GRIPPER_ID = 8
+GRIPPER_CON_EN = 0x0100
+GRIPPER_CON_MODE = 0x0101
+GRIPPER_RESET_ERR = 0x0109
+GRIPPER_POS_SPD = 0x0303
+GRIPPER_TAGET_POS = 0x0700
+GRIPPER_CURR_POS = 0x0702
+GRIPPER_ERR_CODE = 0x000F
+GRIPPER_MAX_POS = 850
+
+MAX_JOINT_SPEED = math.pi  # rad/s, limit of the simulated joints
+VERSION = '7,1,XF1300EMU0001,AC1300EMU0001,v1.8.103'
+
+
+def to_fp32s(values):
+    return struct.pack('<{}f'.format(len(values)), *values)
+
+
+def from_fp32s(data, count):
+    count = min(count, len(data) // 4)
+    return list(struct.unpack('<{}f'.format(count), data[:count * 4]))
+
+
+class SimArm(object):
+    """
+    Joints, state and gripper of the emulated arm, stepped by a background thread.
+    States: 1 moving, 2 standby, 3 paused, 4 stopped. Modes only apply on set_state(0), as on the real box.
+    """
+    def __init__(self, dof, sim_rate):
+        self.lock = threading.Lock()
+        self.dof = dof
+        self.sim_rate = sim_rate
+        self.position = [0.0] * 7
+        self.velocity = [0.0] * 7
+        self.effort = [0.0] * 7
+        self.target = None
+        self.target_speed = MAX_JOINT_SPEED
+        self.joint_velocity = [0.0] * 7
+        self.velocity_deadline = 0
+        self.mode = 0
+        self.pending_mode = 0
+        self.state = 4
+        self.motion_enable = 1
+        self.err = 0
+        self.war = 0
+        self.cmdnum = 0
+        self.gripper_enable = 0
+        self.gripper_mode = 0
+        self.gripper_speed = 1500
+        self.gripper_pos = float(GRIPPER_MAX_POS)
+        self.gripper_target = float(GRIPPER_MAX_POS)
+        self.servoj_count = 0
+        self.velocity_count = 0
+
+    def run(self, stop_event):
+        dt = 1.0 / self.sim_rate
+        next_time = time.monotonic()
+        while not stop_event.is_set():
+            next_time += dt
+            with self.lock:
+                self._step(dt)
+            sleep_time = next_time - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_time = time.monotonic()
+
+    def _step(self, dt):
+        moving = False
+        for i in range(self.dof):
+            if self.state not in (1, 2):
+                desired = 0.0
+            elif self.mode == 4:
+                desired = self.joint_velocity[i] if self.velocity_deadline == 0 or time.monotonic() < self.velocity_deadline else 0.0
+            elif self.target is not None:
+                desired = (self.target[i] - self.position[i]) / dt
+                limit = MAX_JOINT_SPEED if self.mode == 1 else self.target_speed
+                desired = max(-limit, min(limit, desired))
+            else:
+                desired = 0.0
+            self.effort[i] = 0.05 * (desired - self.velocity[i]) / dt + 2.0 * desired
+            self.velocity[i] = desired
+            self.position[i] += desired * dt
+            moving = moving or abs(desired) > 1e-6
+        if self.state in (1, 2):
+            self.state = 1 if moving else 2
+            if self.mode == 0 and not moving:
+                self.cmdnum = 0
+        if self.gripper_enable:
+            step = self.gripper_speed * dt
+            diff = self.gripper_target - self.gripper_pos
+            self.gripper_pos += max(-step, min(step, diff))
+
+    def set_state(self, state):
+        if state == 0:
+            self.mode = self.pending_mode
+            self.target = None
+            self.joint_velocity = [0.0] * 7
+            self.state = 2 if self.motion_enable else 4
+        elif state == 3:
+            self.state = 3
+        elif state == 4:
+            self.state = 4
+            self.target = None
+            self.cmdnum = 0
+            self.joint_velocity = [0.0] * 7
+
+    def ready(self, mode):
+        return self.mode == mode and self.state in (1, 2) and self.err == 0
+
+
+class EmulatorContext(object):
+    def __init__(self, args):
+        self.args = args
+        self.arm = SimArm(args.dof, args.sim_rate)
+        self.stop_event = threading.Event()
+
+    def delay(self):
+        latency = self.args.latency
+        if self.args.latency_jitter > 0:
+            latency = max(0.0, random.gauss(latency, self.args.latency_jitter))
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+
+class ControlHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        ctx = self.server.ctx
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = b''
+        while not ctx.stop_event.is_set():
+            try:
+                data = sock.recv(4096)
+            except (ConnectionError, OSError):
+                break
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= 7:
+                length = struct.unpack('>H', buffer[4:6])[0]
+                if len(buffer) < 6 + length:
+                    break
+                frame, buffer = buffer[:6 + length], buffer[6 + length:]
+                trans_id, prot_id = struct.unpack('>HH', frame[:4])
+                register = frame[6]
+                reply = self._handle_register(ctx.arm, register, frame[7:])
+                with ctx.arm.lock:
+                    state_byte = (0x40 if ctx.arm.err else 0) | (0x20 if ctx.arm.war else 0)
+                ctx.delay()
+                try:
+                    sock.sendall(struct.pack('>HHHBB', trans_id, prot_id, len(reply) + 2, register, state_byte) + reply)
+                except (ConnectionError, OSError):
+                    return
+
+    def _handle_register(self, arm, register, payload):
+        with arm.lock:
+            if register == GET_VERSION:
+                return VERSION.encode().ljust(40, b'\0')
+            if register == GET_ROBOT_SN:
+                return 'XF1300EMU0001'.encode().ljust(40, b'\0')
+            if register == MOTION_EN and len(payload) >= 2:
+                arm.motion_enable = payload[1]
+                if not arm.motion_enable:
+                    arm.set_state(4)
+                return b''
+            if register == SET_STATE and len(payload) >= 1:
+                arm.set_state(payload[0])
+                return b''
+            if register == GET_STATE:
+                return bytes([arm.state])
+            if register == GET_CMDNUM:
+                return struct.pack('>H', arm.cmdnum)
+            if register == GET_ERROR:
+                return bytes([arm.err, arm.war])
+            if register == CLEAN_ERR:
+                arm.err = 0
+                return b''
+            if register == CLEAN_WAR:
+                arm.war = 0
+                return b''
+            if register == SET_MODE and len(payload) >= 1:
+                arm.pending_mode = payload[0]
+                return b''
+            if register in (MOVE_JOINT, MOVE_HOME):
+                values = from_fp32s(payload, 10)
+                if arm.ready(0):
+                    arm.target = values[:7] if register == MOVE_JOINT else [0.0] * 7
+                    arm.target_speed = values[7] if len(values) > 7 and values[7] > 0 else MAX_JOINT_SPEED
+                    arm.cmdnum = 1
+                    arm.state = 1
+                return b''
+            if register == MOVE_SERVOJ:
+                if arm.ready(1):
+                    arm.target = from_fp32s(payload, 7)
+                    arm.servoj_count += 1
+                return b''
+            if register == VC_SET_JOINTV:
+                if arm.ready(4):
+                    arm.joint_velocity = from_fp32s(payload, 7)
+                    duration = from_fp32s(payload[29:], 1)
+                    arm.velocity_deadline = time.monotonic() + duration[0] if duration and duration[0] > 0 else 0
+                    arm.velocity_count += 1
+                return b''
+            if register == GET_JOINT_POS:
+                num = (payload[0] & 0x0F) if payload else 1
+                values = (arm.position, arm.velocity, arm.effort)
+                return b''.join(to_fp32s(values[i]) for i in range(max(1, min(num, 3))))
+            if register == TGPIO_R16B:
+                addr = struct.unpack('>H', payload[1:3])[0] if len(payload) >= 3 else 0
+                value = BAUDRATES.index(GRIPPER_BAUDRATE) if addr == 0x0A0B else 0
+                return struct.pack('>i', value)
+            if register == RS485_RTU:
+                return self._handle_gripper(arm, payload[1:])
+            return bytes(REPLY_SIZES.get(register, 0))
+
+    def _handle_gripper(self, arm, modbus):
+        if len(modbus) < 6 or modbus[0] != GRIPPER_ID:
+            return bytes([RS485_HOST_ID]) + bytes(modbus[:2])
+        func = modbus[1]
+        addr, count = struct.unpack('>HH', modbus[2:6])
+        if func == 0x03:
+            registers = {
+                GRIPPER_CON_EN: arm.gripper_enable,
+                GRIPPER_CON_MODE: arm.gripper_mode,
+                GRIPPER_POS_SPD: arm.gripper_speed,
+                GRIPPER_CURR_POS: (int(round(arm.gripper_pos)) >> 16) & 0xFFFF,
+                GRIPPER_CURR_POS + 1: int(round(arm.gripper_pos)) & 0xFFFF,
+                GRIPPER_TAGET_POS: (int(arm.gripper_target) >> 16) & 0xFFFF,
+                GRIPPER_TAGET_POS + 1: int(arm.gripper_target) & 0xFFFF,
+                GRIPPER_ERR_CODE: 0,
+            }
+            data = b''.join(struct.pack('>H', registers.get(addr + i, 0)) for i in range(count))
+            return bytes([RS485_HOST_ID, GRIPPER_ID, 0x03, len(data)]) + data
+        if func == 0x10:
+            data = modbus[7:7 + count * 2]
+            words = [struct.unpack('>H', data[i * 2:i * 2 + 2])[0] for i in range(len(data) // 2)]
+            for i, word in enumerate(words):
+                reg = addr + i
+                if reg == GRIPPER_CON_EN:
+                    arm.gripper_enable = word
+                elif reg == GRIPPER_CON_MODE:
+                    arm.gripper_mode = word
+                elif reg == GRIPPER_POS_SPD:
+                    arm.gripper_speed = max(1, word)
+            if addr == GRIPPER_TAGET_POS and len(words) >= 2:
+                target = struct.unpack('>i', data[:4])[0]
+                arm.gripper_target = float(max(0, min(GRIPPER_MAX_POS, target)))
+            return bytes([RS485_HOST_ID]) + bytes(modbus[:6])
+        return bytes([RS485_HOST_ID]) + bytes(modbus[:2])
+
+
+class ReportHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        ctx = self.server.ctx
+        report_type = self.server.report_type
+        rate = ctx.args.report_rate if report_type == 'dev' else ctx.args.normal_report_rate
+        period = 1.0 / rate
+        next_time = time.monotonic()
+        count = 0
+        while not ctx.stop_event.is_set():
+            with ctx.arm.lock:
+                frame = build_report(ctx.arm, report_type, count)
+            count += 1
+            ctx.delay()
+            try:
+                self.request.sendall(frame)
+            except (ConnectionError, OSError):
+                break
+            next_time += period
+            sleep_time = next_time - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_time = time.monotonic()
+
+
+def build_report(arm, report_type, count):
+    size = REPORT_SIZES[report_type]
+    data = bytearray(size)
+    struct.pack_into('>I', data, 0, size)
+    data[4] = (arm.state & 0x0F) | ((arm.mode & 0x0F) << 4)
+    struct.pack_into('>H', data, 5, arm.cmdnum)
+    data[7:35] = to_fp32s(arm.position)
+    pose = [206.0, 0.0, 120.5, math.pi, 0.0, 0.0]
+    data[35:59] = to_fp32s(pose)
+    data[59:87] = to_fp32s(arm.effort)
+    if report_type == 'dev':
+        return bytes(data)
+    mt_able = (1 << arm.dof) - 1 if arm.motion_enable else 0
+    data[87:91] = bytes([0, mt_able, arm.err, arm.war])
+    data[115:131] = to_fp32s([0.0, 0.0, 0.0, 0.0])
+    data[131:133] = bytes([3, 3])
+    data[133:145] = to_fp32s([0.0, 0.0, -1.0])
+    if report_type == 'normal':
+        return bytes(data)
+    data[145:151] = bytes([1, arm.dof, 0, 0, 0, 0])
+    data[151:181] = VERSION.encode()[-30:].ljust(30, b'\0')
+    data[245:245 + arm.dof] = bytes([35] * arm.dof)
+    data[252:284] = to_fp32s([abs(v) for v in arm.velocity] + [0.0])
+    struct.pack_into('>I', data, 284, count & 0xFFFFFFFF)
+    struct.pack_into('>7H', data, 341, *([4800] * 7))
+    return bytes(data)
+
+
+class EmulatorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler, ctx, report_type=None):
+        self.ctx = ctx
+        self.report_type = report_type
+        socketserver.TCPServer.__init__(self, address, handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulate a xArm controller box on a local address.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on, default is 127.0.0.1')
+    parser.add_argument('--dof', type=int, default=7, help='number of joints of the emulated arm')
+    parser.add_argument('--latency', type=float, default=0.0, help='network latency added to every reply and report, ms')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='standard deviation of the latency, ms')
+    parser.add_argument('--report-rate', type=float, default=100.0, help='rate of the dev report, Hz')
+    parser.add_argument('--normal-report-rate', type=float, default=5.0, help='rate of the normal and rich reports, Hz')
+    parser.add_argument('--sim-rate', type=float, default=250.0, help='rate of the joint simulation, Hz')
+    parser.add_argument('--port-offset', type=int, default=0, help='added to every port, only for clients that allow other ports')
+    args = parser.parse_args()
+
+    ctx = EmulatorContext(args)
+    servers = [EmulatorServer((args.host, CONTROL_PORT + args.port_offset), ControlHandler, ctx)]
+    for report_type, port in REPORT_PORTS.items():
+        servers.append(EmulatorServer((args.host, port + args.port_offset), ReportHandler, ctx, report_type))
+    threads = [threading.Thread(target=ctx.arm.run, args=(ctx.stop_event,), daemon=True)]
+    threads.extend(threading.Thread(target=server.serve_forever, daemon=True) for server in servers)
+    for th in threads:
+        th.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: ctx.stop_event.set())
+    print('xarm controller box emulator on {}, dof={}, latency={}ms, report_rate={}Hz'.format(
+        args.host, args.dof, args.latency, args.report_rate), flush=True)
+    try:
+        while not ctx.stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ctx.stop_event.set()
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        with ctx.arm.lock:
+            print('servo_angle_j={}, vc_set_joint_velocity={}'.format(ctx.arm.servoj_count, ctx.arm.velocity_count), flush=True)
+
+
+if __name__ == '__main__':
+    main()
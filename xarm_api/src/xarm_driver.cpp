@@ -40,6 +40,21 @@ namespace xarm_api
 
     XArmDriver::~XArmDriver()
     {   
+        {
+            std::lock_guard<std::mutex> locker(motion_action_mutex_);
+            motion_action_quit_ = true;
+        }
+        motion_action_cond_.notify_all();
+        if (motion_action_thread_.joinable()) motion_action_thread_.join();
+        if (waypoint_thread_.joinable()) waypoint_thread_.join();
+        {
+            std::lock_guard<std::mutex> locker(gripper_mutex_);
+            gripper_quit_ = true;
+        }
+        gripper_cond_.notify_all();
+        if (gripper_thread_.joinable()) gripper_thread_.join();
+        report_queue_.close();
+        if (report_publish_thread_.joinable()) report_publish_thread_.join();
         arm->set_mode(XARM_MODE::POSE);
         arm->disconnect();
     }
@@ -59,90 +74,327 @@ namespace xarm_api
     void XArmDriver::_report_data_callback(XArmReportData *report_data_ptr)
     {
         // RCLCPP_INFO(node_->get_logger(), "[1] state: %d, error_code: %d", report_data_ptr->state, report_data_ptr->err);
+        struct timespec cpu_start;
+        std::chrono::steady_clock::time_point wall_start;
+        if (report_cost_period_ > 0) {
+            clock_gettime(CLOCK_THREAD_CPUTIME_ID, &cpu_start);
+            wall_start = std::chrono::steady_clock::now();
+        }
+
         curr_state = report_data_ptr->state;
         curr_err = report_data_ptr->err;
         curr_mode = report_data_ptr->mode;
         curr_cmdnum = report_data_ptr->cmdnum;
 
-        rclcpp::Time now_ = node_->get_clock()->now();
-        joint_state_msg_.header.stamp = now_;
-        for(int i = 0; i < dof_; i++)
+        ReportJointStates &states = report_joint_states_.back();
+        states.seq = ++report_seq_;
+        states.stamp = std::chrono::steady_clock::now();
+        states.state = report_data_ptr->state;
+        states.err = report_data_ptr->err;
+        states.mode = report_data_ptr->mode;
+        // only the rich report has the joint speeds, the others are differentiated over the report stamps
+        double dt = states.seq > 1 ? std::chrono::duration<double>(states.stamp - report_prev_stamp_).count() : 0;
+        for (int i = 0; i < dof_ && i < 7; i++) {
+            states.position[i] = report_data_ptr->angle[i];
+            if (report_type_ == "rich")
+                states.velocity[i] = report_data_ptr->rt_joint_spds[i];
+            else
+                states.velocity[i] = dt > 0 ? (report_data_ptr->angle[i] - report_prev_angle_[i]) / dt : 0;
+            states.effort[i] = report_data_ptr->tau[i];
+            report_prev_angle_[i] = report_data_ptr->angle[i];
+        }
+        report_prev_stamp_ = states.stamp;
         {
-            joint_state_msg_.position[i] = (double)report_data_ptr->angle[i];
-            joint_state_msg_.velocity[i] = (double)report_data_ptr->rt_joint_spds[i];
-            joint_state_msg_.effort[i] = (double)report_data_ptr->tau[i];
+            std::lock_guard<std::mutex> locker(report_snapshot_mutex_);
+            report_snapshot_.seq = states.seq;
+            report_snapshot_.stamp = states.stamp;
+            report_snapshot_.state = report_data_ptr->state;
+            report_snapshot_.cmdnum = report_data_ptr->cmdnum;
+            report_snapshot_.err = report_data_ptr->err;
+            report_snapshot_.war = report_data_ptr->war;
+            for (int i = 0; i < 7; i++) report_snapshot_.angle[i] = i < dof_ ? report_data_ptr->angle[i] : 0;
+            for (int i = 0; i < 6; i++) report_snapshot_.pose[i] = report_data_ptr->pose[i];
+        }
+        // the motion actions are driven by the report
+        if (motion_action_enable_) motion_action_cond_.notify_all();
+        report_joint_states_.publish();
+
+        // the ROS publishing works on a copy of the fields it needs, in async mode on the publisher thread
+        ReportPublishData data;
+        data.stamp = node_->get_clock()->now();
+        data.total_num = report_data_ptr->total_num;
+        data.state = report_data_ptr->state;
+        data.mode = report_data_ptr->mode;
+        data.cmdnum = report_data_ptr->cmdnum;
+        data.err = report_data_ptr->err;
+        data.war = report_data_ptr->war;
+        data.mt_brake = report_data_ptr->mt_brake;
+        data.mt_able = report_data_ptr->mt_able;
+        for (int i = 0; i < dof_ && i < 7; i++) {
+            data.angle[i] = report_data_ptr->angle[i];
+            data.rt_joint_spds[i] = report_data_ptr->rt_joint_spds[i];
+            data.tau[i] = report_data_ptr->tau[i];
+        }
+        for (int i = 0; i < 6; i++) {
+            data.pose[i] = report_data_ptr->pose[i];
+            data.tcp_offset[i] = report_data_ptr->tcp_offset[i];
+            data.ft_ext_force[i] = report_data_ptr->ft_ext_force[i];
+            data.ft_raw_force[i] = report_data_ptr->ft_raw_force[i];
+        }
+        data.cgpio_state = report_data_ptr->cgpio_state;
+        data.cgpio_code = report_data_ptr->cgpio_code;
+        for (int i = 0; i < 2; i++) {
+            data.cgpio_input_digitals[i] = report_data_ptr->cgpio_input_digitals[i];
+            data.cgpio_output_digitals[i] = report_data_ptr->cgpio_output_digitals[i];
+            data.cgpio_input_analogs[i] = report_data_ptr->cgpio_input_analogs[i];
+            data.cgpio_output_analogs[i] = report_data_ptr->cgpio_output_analogs[i];
+        }
+        for (int i = 0; i < 16; i++) {
+            data.cgpio_input_conf[i] = report_data_ptr->cgpio_input_conf[i];
+            data.cgpio_output_conf[i] = report_data_ptr->cgpio_output_conf[i];
         }
-        pub_joint_state(joint_state_msg_);
 
-        xarm_state_msg_.state = report_data_ptr->state;
-        xarm_state_msg_.mode = report_data_ptr->mode;
-        xarm_state_msg_.cmdnum = report_data_ptr->cmdnum;
-        xarm_state_msg_.err = report_data_ptr->err;
-        xarm_state_msg_.warn = report_data_ptr->war;
-        xarm_state_msg_.mt_brake = report_data_ptr->mt_brake;
-        xarm_state_msg_.mt_able = report_data_ptr->mt_able;
+        if (report_publish_async_) {
+            if (!report_queue_.push(data)) report_overrun_cnts_ += 1;
+        }
+        else {
+            _publish_report_data(data);
+        }
 
-        for(int i = 0; i < dof_; i++)
-        {
-            xarm_state_msg_.angle[i] = (double)report_data_ptr->angle[i];
+        if (report_cost_period_ > 0) {
+            _record_report_cost(cpu_start, wall_start);
         }
-        for(int i = 0; i < 6; i++)
-        {
-            xarm_state_msg_.pose[i] = report_data_ptr->pose[i];
-            xarm_state_msg_.offset[i] = report_data_ptr->tcp_offset[i];
+    }
+
+    void XArmDriver::_init_report_topic_rate(const std::string &topic, ReportTopicRate &rate)
+    {
+        // <topic>_rate: target rate in Hz, 0 (default) publishes every report
+        double hz = 0;
+        rclcpp::Parameter param;
+        if (node_->get_parameter("report_publish." + topic + "_rate", param)) {
+            if (param.get_type() == rclcpp::ParameterType::PARAMETER_INTEGER)
+                hz = param.as_int();
+            else if (param.get_type() == rclcpp::ParameterType::PARAMETER_DOUBLE)
+                hz = param.as_double();
+        }
+        rate.interval = hz > 0 ? 1.0 / hz : 0;
+        rate.last_stamp = 0;
+        if (hz > 0) {
+            RCLCPP_INFO(node_->get_logger(), "report_publish: %s at most %f Hz", topic.c_str(), hz);
+        }
+    }
+
+    bool XArmDriver::_report_topic_due(const rclcpp::PublisherBase::SharedPtr &pub, ReportTopicRate &rate, const rclcpp::Time &stamp)
+    {
+        if (report_skip_unsubscribed_ && pub->get_subscription_count() == 0) return false;
+        if (rate.interval <= 0) return true;
+        double now = stamp.seconds();
+        double elapsed = now - rate.last_stamp;
+        if (elapsed < rate.interval && elapsed >= 0) return false;
+        // keep the phase so the average rate matches the target, resync after a gap
+        rate.last_stamp = (elapsed >= 0 && elapsed < 2 * rate.interval) ? rate.last_stamp + rate.interval : now;
+        return true;
+    }
+
+    void XArmDriver::_publish_report_data(const ReportPublishData &data)
+    {
+        rclcpp::Time now_ = data.stamp;
+        if (_report_topic_due(joint_state_pub_, joint_state_rate_, now_)) {
+            joint_state_msg_.header.stamp = now_;
+            for(int i = 0; i < dof_; i++)
+            {
+                joint_state_msg_.position[i] = (double)data.angle[i];
+                joint_state_msg_.velocity[i] = (double)data.rt_joint_spds[i];
+                joint_state_msg_.effort[i] = (double)data.tau[i];
+            }
+            pub_joint_state(joint_state_msg_);
+        }
+
+        if (_report_topic_due(robot_state_pub_, robot_state_rate_, now_)) {
+            xarm_state_msg_.state = data.state;
+            xarm_state_msg_.mode = data.mode;
+            xarm_state_msg_.cmdnum = data.cmdnum;
+            xarm_state_msg_.err = data.err;
+            xarm_state_msg_.warn = data.war;
+            xarm_state_msg_.mt_brake = data.mt_brake;
+            xarm_state_msg_.mt_able = data.mt_able;
+
+            for(int i = 0; i < dof_; i++)
+            {
+                xarm_state_msg_.angle[i] = (double)data.angle[i];
+            }
+            for(int i = 0; i < 6; i++)
+            {
+                xarm_state_msg_.pose[i] = data.pose[i];
+                xarm_state_msg_.offset[i] = data.tcp_offset[i];
+            }
+            xarm_state_msg_.header.stamp = now_;
+            pub_robot_msg(xarm_state_msg_);
         }
-        xarm_state_msg_.header.stamp = now_;
-        pub_robot_msg(xarm_state_msg_);
 
-        if (report_data_ptr->total_num >= 417) {
+        if (data.total_num >= 417 && _report_topic_due(cgpio_state_pub_, cgpio_state_rate_, now_)) {
             cgpio_state_msg_.header.stamp = now_;
-            cgpio_state_msg_.state = report_data_ptr->cgpio_state;
-            cgpio_state_msg_.code = report_data_ptr->cgpio_code;
-            cgpio_state_msg_.input_digitals[0] = report_data_ptr->cgpio_input_digitals[0];
-            cgpio_state_msg_.input_digitals[1] = report_data_ptr->cgpio_input_digitals[1];
-            cgpio_state_msg_.output_digitals[0] = report_data_ptr->cgpio_output_digitals[0];
-            cgpio_state_msg_.output_digitals[1] = report_data_ptr->cgpio_output_digitals[1];
-
-            cgpio_state_msg_.input_analogs[0] = report_data_ptr->cgpio_input_analogs[0];
-            cgpio_state_msg_.input_analogs[1] = report_data_ptr->cgpio_input_analogs[1];
-            cgpio_state_msg_.output_analogs[0] = report_data_ptr->cgpio_output_analogs[0];
-            cgpio_state_msg_.output_analogs[1] = report_data_ptr->cgpio_output_analogs[1];
+            cgpio_state_msg_.state = data.cgpio_state;
+            cgpio_state_msg_.code = data.cgpio_code;
+            cgpio_state_msg_.input_digitals[0] = data.cgpio_input_digitals[0];
+            cgpio_state_msg_.input_digitals[1] = data.cgpio_input_digitals[1];
+            cgpio_state_msg_.output_digitals[0] = data.cgpio_output_digitals[0];
+            cgpio_state_msg_.output_digitals[1] = data.cgpio_output_digitals[1];
+
+            cgpio_state_msg_.input_analogs[0] = data.cgpio_input_analogs[0];
+            cgpio_state_msg_.input_analogs[1] = data.cgpio_input_analogs[1];
+            cgpio_state_msg_.output_analogs[0] = data.cgpio_output_analogs[0];
+            cgpio_state_msg_.output_analogs[1] = data.cgpio_output_analogs[1];
 
             for (int i = 0; i < 16; ++i) {
-                cgpio_state_msg_.input_conf[i] = report_data_ptr->cgpio_input_conf[i];
-                cgpio_state_msg_.output_conf[i] = report_data_ptr->cgpio_output_conf[i];
+                cgpio_state_msg_.input_conf[i] = data.cgpio_input_conf[i];
+                cgpio_state_msg_.output_conf[i] = data.cgpio_output_conf[i];
             }
             pub_cgpio_state(cgpio_state_msg_);
         }
 
-        if ((report_type_ == "dev" && report_data_ptr->total_num >= 135) 
-            || (report_type_ == "rich" && report_data_ptr->total_num >= 481)) {
-            ftsensor_msg_.header.stamp = now_;
-            ftsensor_msg_.header.frame_id = "uf_ft_sensor_ext_data";
-            ftsensor_msg_.wrench.force.x = report_data_ptr->ft_ext_force[0];
-            ftsensor_msg_.wrench.force.y = report_data_ptr->ft_ext_force[1];
-            ftsensor_msg_.wrench.force.z = report_data_ptr->ft_ext_force[2];
-            ftsensor_msg_.wrench.torque.x = report_data_ptr->ft_ext_force[3];
-            ftsensor_msg_.wrench.torque.y = report_data_ptr->ft_ext_force[4];
-            ftsensor_msg_.wrench.torque.z = report_data_ptr->ft_ext_force[5];
-            pub_ftsensor_ext_state(ftsensor_msg_);
-            ftsensor_msg_.header.frame_id = "uf_ft_sensor_raw_data";
-            ftsensor_msg_.wrench.force.x = report_data_ptr->ft_raw_force[0];
-            ftsensor_msg_.wrench.force.y = report_data_ptr->ft_raw_force[1];
-            ftsensor_msg_.wrench.force.z = report_data_ptr->ft_raw_force[2];
-            ftsensor_msg_.wrench.torque.x = report_data_ptr->ft_raw_force[3];
-            ftsensor_msg_.wrench.torque.y = report_data_ptr->ft_raw_force[4];
-            ftsensor_msg_.wrench.torque.z = report_data_ptr->ft_raw_force[5];
-            pub_ftsensor_raw_state(ftsensor_msg_);
+        if ((report_type_ == "dev" && data.total_num >= 135) 
+            || (report_type_ == "rich" && data.total_num >= 481)) {
+            if (_report_topic_due(ftsensor_ext_state_pub_, ftsensor_ext_state_rate_, now_)) {
+                ftsensor_ext_msg_.header.stamp = now_;
+                ftsensor_ext_msg_.wrench.force.x = data.ft_ext_force[0];
+                ftsensor_ext_msg_.wrench.force.y = data.ft_ext_force[1];
+                ftsensor_ext_msg_.wrench.force.z = data.ft_ext_force[2];
+                ftsensor_ext_msg_.wrench.torque.x = data.ft_ext_force[3];
+                ftsensor_ext_msg_.wrench.torque.y = data.ft_ext_force[4];
+                ftsensor_ext_msg_.wrench.torque.z = data.ft_ext_force[5];
+                pub_ftsensor_ext_state(ftsensor_ext_msg_);
+            }
+            if (_report_topic_due(ftsensor_raw_state_pub_, ftsensor_raw_state_rate_, now_)) {
+                ftsensor_raw_msg_.header.stamp = now_;
+                ftsensor_raw_msg_.wrench.force.x = data.ft_raw_force[0];
+                ftsensor_raw_msg_.wrench.force.y = data.ft_raw_force[1];
+                ftsensor_raw_msg_.wrench.force.z = data.ft_raw_force[2];
+                ftsensor_raw_msg_.wrench.torque.x = data.ft_raw_force[3];
+                ftsensor_raw_msg_.wrench.torque.y = data.ft_raw_force[4];
+                ftsensor_raw_msg_.wrench.torque.z = data.ft_raw_force[5];
+                pub_ftsensor_raw_state(ftsensor_raw_msg_);
+            }
+            if (ftsensor_batch_size_ > 0) {
+                _batch_ftsensor_data(data);
+            }
+        }
+    }
+
+    void XArmDriver::_batch_ftsensor_data(const ReportPublishData &data)
+    {
+        if (report_skip_unsubscribed_ && ftsensor_batch_state_pub_->get_subscription_count() == 0) {
+            ftsensor_batch_msg_.count = 0;
+            return;
+        }
+        if (ftsensor_batch_msg_.count == 0) {
+            ftsensor_batch_msg_.header.stamp = data.stamp;
+            ftsensor_batch_msg_.ext_force.clear();
+            ftsensor_batch_msg_.raw_force.clear();
+        }
+        // capacity is reserved in _init_publisher, appending does not allocate
+        ftsensor_batch_msg_.ext_force.insert(ftsensor_batch_msg_.ext_force.end(), data.ft_ext_force, data.ft_ext_force + 6);
+        ftsensor_batch_msg_.raw_force.insert(ftsensor_batch_msg_.raw_force.end(), data.ft_raw_force, data.ft_raw_force + 6);
+        ftsensor_batch_msg_.count += 1;
+        if (ftsensor_batch_msg_.count >= (uint32_t)ftsensor_batch_size_) {
+            double first_stamp = rclcpp::Time(ftsensor_batch_msg_.header.stamp).seconds();
+            ftsensor_batch_msg_.period = ftsensor_batch_msg_.count > 1 ? (data.stamp.seconds() - first_stamp) / (ftsensor_batch_msg_.count - 1) : 0.0;
+            _publish_report_msg(ftsensor_batch_state_pub_, ftsensor_batch_msg_);
+            ftsensor_batch_msg_.count = 0;
+        }
+    }
+
+    void XArmDriver::_report_publish_loop(void)
+    {
+        ReportPublishData data;
+        long int last_overrun_cnts = 0;
+        while (report_queue_.pop(data)) {
+            _publish_report_data(data);
+            long int overrun_cnts = report_overrun_cnts_;
+            if (overrun_cnts != last_overrun_cnts) {
+                RCLCPP_WARN_THROTTLE(node_->get_logger(), *node_->get_clock(), 5000, 
+                    "[REPORT] publishing can not keep up with the report, dropped the oldest reports %ld times", overrun_cnts);
+                last_overrun_cnts = overrun_cnts;
+            }
+        }
+    }
+
+    void XArmDriver::_record_report_cost(const struct timespec &cpu_start, const std::chrono::steady_clock::time_point &wall_start)
+    {
+        struct timespec cpu_end;
+        clock_gettime(CLOCK_THREAD_CPUTIME_ID, &cpu_end);
+        std::chrono::steady_clock::time_point wall_end = std::chrono::steady_clock::now();
+        double cpu_time = (cpu_end.tv_sec - cpu_start.tv_sec) + (cpu_end.tv_nsec - cpu_start.tv_nsec) / 1e9;
+        double wall_time = std::chrono::duration<double>(wall_end - wall_start).count();
+        if (report_cost_cnts_ == 0) report_cost_start_ = wall_start;
+        report_cost_cnts_ += 1;
+        report_cpu_total_time_ += cpu_time;
+        report_wall_total_time_ += wall_time;
+        if (cpu_time > report_cpu_max_time_) report_cpu_max_time_ = cpu_time;
+        if (wall_time > report_wall_max_time_) report_wall_max_time_ = wall_time;
+        if (std::chrono::duration<double>(wall_end - report_cost_start_).count() >= report_cost_period_) {
+            RCLCPP_INFO(node_->get_logger(), "[REPORT] cnt: %ld, cpu mean: %.1fus, cpu max: %.1fus, wall mean: %.1fus, wall max: %.1fus",
+                report_cost_cnts_, report_cpu_total_time_ / report_cost_cnts_ * 1e6, report_cpu_max_time_ * 1e6, 
+                report_wall_total_time_ / report_cost_cnts_ * 1e6, report_wall_max_time_ * 1e6);
+            report_cost_cnts_ = 0;
+            report_cpu_total_time_ = 0;
+            report_cpu_max_time_ = 0;
+            report_wall_total_time_ = 0;
+            report_wall_max_time_ = 0;
         }
     }
 
+    template<typename MessageT>
+    void XArmDriver::_publish_report_msg(const typename rclcpp::Publisher<MessageT>::SharedPtr &pub, const MessageT &msg)
+    {
+        // the report messages have strings and unbounded sequences, which the middlewares can not loan
+        pub->publish(msg);
+    }
+
+    bool XArmDriver::get_report_joint_states(ReportJointStates &states, double max_age)
+    {
+        report_joint_states_.update();
+        const ReportJointStates &latest = report_joint_states_.front();
+        if (latest.seq == 0) return false;
+        if (max_age > 0 && std::chrono::duration<double>(std::chrono::steady_clock::now() - latest.stamp).count() > max_age)
+            return false;
+        states = latest;
+        return true;
+    }
+
+    bool XArmDriver::_get_report_snapshot(ReportSnapshot &snapshot, float max_age, bool need_err_warn)
+    {
+        // max_age of the request: > 0 overrides the parameter, 0 uses the parameter, < 0 always queries
+        double age_limit = max_age > 0 ? max_age : (max_age < 0 ? 0 : getter_max_age_);
+        if (age_limit <= 0) return false;
+        // the dev report has no error/warn code
+        if (need_err_warn && report_type_ == "dev") return false;
+        std::lock_guard<std::mutex> locker(report_snapshot_mutex_);
+        if (report_snapshot_.seq == 0) return false;
+        if (std::chrono::duration<double>(std::chrono::steady_clock::now() - report_snapshot_.stamp).count() > age_limit)
+            return false;
+        snapshot = report_snapshot_;
+        return true;
+    }
+
     void XArmDriver::init(rclcpp::Node::SharedPtr& node, std::string &server_ip)
     {
         curr_err = 0;
         curr_state = 4;
         curr_mode = 0;
         curr_cmdnum = 0;
+        report_seq_ = 0;
+        motion_action_enable_ = false;
+        motion_action_quit_ = false;
+        waypoint_goal_active_ = false;
+        motion_goal_cnt_ = 0;
+        report_publish_async_ = false;
+        report_overrun_cnts_ = 0;
+        report_cost_cnts_ = 0;
+        report_cpu_total_time_ = 0;
+        report_cpu_max_time_ = 0;
+        report_wall_total_time_ = 0;
+        report_wall_max_time_ = 0;
         arm = NULL;
 
         node_ = node;
@@ -172,7 +424,26 @@ namespace xarm_api
         
         RCLCPP_INFO(node_->get_logger(), "baud_checkset: %d, default_gripper_baud: %d", baud_checkset, default_gripper_baud);
 
+        node_->get_parameter_or("report_publish.cost_stats_period", report_cost_period_, 0.0);
+        node_->get_parameter_or("report_publish.async", report_publish_async_, false);
+        int report_queue_size = 8;
+        node_->get_parameter_or("report_publish.queue_size", report_queue_size, 8);
+        node_->get_parameter_or("report_publish.skip_unsubscribed", report_skip_unsubscribed_, true);
+        RCLCPP_INFO(node_->get_logger(), "report_publish: async: %d, queue_size: %d, skip_unsubscribed: %d", 
+            report_publish_async_, report_queue_size, report_skip_unsubscribed_);
+        node_->get_parameter_or("cached_getters.max_age", getter_max_age_, 0.0);
+        RCLCPP_INFO(node_->get_logger(), "cached_getters: max_age: %f", getter_max_age_);
+        _init_report_topic_rate("joint_states", joint_state_rate_);
+        _init_report_topic_rate("robot_states", robot_state_rate_);
+        _init_report_topic_rate("xarm_cgpio_states", cgpio_state_rate_);
+        _init_report_topic_rate("uf_ftsensor_ext_states", ftsensor_ext_state_rate_);
+        _init_report_topic_rate("uf_ftsensor_raw_states", ftsensor_raw_state_rate_);
+
         _init_publisher();
+        if (report_publish_async_) {
+            report_queue_.set_capacity(report_queue_size);
+            report_publish_thread_ = std::thread(&XArmDriver::_report_publish_loop, this);
+        }
         setlinebuf(stdout);
 
         arm = new XArmAPI(
@@ -225,6 +496,8 @@ namespace xarm_api
         }
 
         _init_service();
+        _init_motion_action();
+        _init_servo_stream();
         _init_gripper();
     }
 
@@ -240,26 +513,42 @@ namespace xarm_api
             joint_state_msg_.name[i] = joint_names_[i];
         }
         xarm_state_msg_.angle.resize(dof_);
+        ftsensor_ext_msg_.header.frame_id = "uf_ft_sensor_ext_data";
+        ftsensor_raw_msg_.header.frame_id = "uf_ft_sensor_raw_data";
+        node_->get_parameter_or("report_publish.ftsensor_batch_size", ftsensor_batch_size_, 0);
+        ftsensor_batch_msg_.header.frame_id = "uf_ft_sensor_data";
+        ftsensor_batch_msg_.count = 0;
+        ftsensor_batch_msg_.period = 0;
+        if (ftsensor_batch_size_ > 0) {
+            ftsensor_batch_msg_.ext_force.reserve(6 * ftsensor_batch_size_);
+            ftsensor_batch_msg_.raw_force.reserve(6 * ftsensor_batch_size_);
+        }
 
         joint_state_pub_ = hw_node_->create_publisher<sensor_msgs::msg::JointState>("joint_states", 10);
         robot_state_pub_ = hw_node_->create_publisher<xarm_msgs::msg::RobotMsg>("robot_states", 10);
         cgpio_state_pub_ = hw_node_->create_publisher<xarm_msgs::msg::CIOState>("xarm_cgpio_states", 10);
         ftsensor_ext_state_pub_ = hw_node_->create_publisher<geometry_msgs::msg::WrenchStamped>("uf_ftsensor_ext_states", 10);
         ftsensor_raw_state_pub_ = hw_node_->create_publisher<geometry_msgs::msg::WrenchStamped>("uf_ftsensor_raw_states", 10);
+        if (ftsensor_batch_size_ > 0) {
+            ftsensor_batch_state_pub_ = hw_node_->create_publisher<xarm_msgs::msg::FTSensorBatch>("uf_ftsensor_batch_states", 10);
+        }
     }
 
     void XArmDriver::_init_gripper(void)
     {
         node_->get_parameter_or("xarm_gripper.speed", gripper_speed_, 2000);  // 机械爪速度
         node_->get_parameter_or("xarm_gripper.max_pos", gripper_max_pos_, 850); // 机械爪最大值，用来转换
-        node_->get_parameter_or("xarm_gripper.frequency", gripper_frequency_, 10); // 发送机械爪位置后查询机械爪位置的频率
+        node_->get_parameter_or("xarm_gripper.frequency", gripper_frequency_, 10); // 发送机械爪位置后查询机械爪位置的频率，接近目标时最多快4倍，没动时最多慢4倍
         node_->get_parameter_or("xarm_gripper.threshold", gripper_threshold_, 3); // 检测机械爪当前位置和上一次位置的差值如果小于当前值，则认为机械爪没动
-        node_->get_parameter_or("xarm_gripper.threshold_times", gripper_threshold_times_, 10); // 如果检测到机械爪没动的次数超过此值且当前位置和目标位置差值不超过15，则认为机械爪运动成功
+        node_->get_parameter_or("xarm_gripper.threshold_times", gripper_threshold_times_, 10); // 机械爪连续没动的次数超过此值，则认为机械爪停止(夹住物体)
+        node_->get_parameter_or("xarm_gripper.reached_tolerance", gripper_reached_tolerance_, 15); // 当前位置和目标位置差值小于此值，则认为机械爪运动成功
+        node_->get_parameter_or("xarm_gripper.idle_frequency", gripper_idle_frequency_, 0.0); // 没有运动时查询机械爪位置的频率，0表示不查询，只重发上次的位置
+        node_->get_parameter_or("xarm_gripper.timeout", gripper_timeout_, 10.0);
+        node_->get_parameter_or("xarm_gripper.preempt", gripper_preempt_, false);
         RCLCPP_INFO(node_->get_logger(), "gripper_speed: %d, gripper_max_pos: %d, gripper_frequency : %d, gripper_threshold: %d, gripper_threshold_times: %d", 
             gripper_speed_, gripper_max_pos_, gripper_frequency_, gripper_threshold_, gripper_threshold_times_);
-
-        gripper_feedback_ = std::make_shared<control_msgs::action::GripperCommand::Feedback>();
-        gripper_result_ = std::make_shared<control_msgs::action::GripperCommand::Result>();;
+        RCLCPP_INFO(node_->get_logger(), "gripper_reached_tolerance: %d, gripper_idle_frequency: %f, gripper_timeout: %f, gripper_preempt: %d", 
+            gripper_reached_tolerance_, gripper_idle_frequency_, gripper_timeout_, gripper_preempt_);
         gripper_joint_state_msg_.header.stamp = node_->get_clock()->now();
         gripper_joint_state_msg_.header.frame_id = "gripper-joint-state data";        
         gripper_joint_state_msg_.name.resize(6);
@@ -283,20 +572,11 @@ namespace xarm_api
             BIND_CLS_CB_1(&XArmDriver::_handle_gripper_action_cancel),
             BIND_CLS_CB_1(&XArmDriver::_handle_gripper_action_accepted));
         
-        bool add_gripper;
-        node_->get_parameter_or("add_gripper", add_gripper, false);
-        if (add_gripper) {
-            gripper_init_loop_ = false;
-            std::thread([this]() {
-                float cur_pos;
-                int ret = arm->get_gripper_position(&cur_pos);
-                while (ret == 0 && !gripper_init_loop_)
-                {
-                    std::this_thread::sleep_for(std::chrono::milliseconds(500));
-                    _pub_gripper_joint_states(cur_pos);
-                }
-            }).detach();
-        }
+        // the joint states of the gripper are only published when it is added
+        node_->get_parameter_or("add_gripper", gripper_publish_, false);
+        gripper_ready_ = false;
+        gripper_quit_ = false;
+        gripper_thread_ = std::thread(&XArmDriver::_gripper_loop, this);
     }
 
     inline float XArmDriver::_gripper_pos_convert(float pos, bool reversed)
@@ -331,161 +611,253 @@ namespace xarm_api
     {
         RCLCPP_INFO(node_->get_logger(), "Received request to cancel gripper move goal");
         (void)goal_handle;
+        gripper_cond_.notify_all();
         return rclcpp_action::CancelResponse::ACCEPT;
     }
 
     void XArmDriver::_handle_gripper_action_accepted(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle)
     {
-        // this needs to return quickly to avoid blocking the executor, so spin up a new thread
-        std::thread{BIND_CLS_CB_1(&XArmDriver::_gripper_action_execute), goal_handle}.detach();
+        // the goals are executed one after another by the gripper thread
+        {
+            std::lock_guard<std::mutex> locker(gripper_mutex_);
+            gripper_goals_.push_back(goal_handle);
+        }
+        gripper_cond_.notify_one();
     }
 
-    void XArmDriver::_gripper_action_execute(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle)
+    void XArmDriver::_gripper_loop(void)
     {
-        gripper_init_loop_ = true;
-        const auto goal = goal_handle->get_goal();
-        RCLCPP_INFO(node_->get_logger(), "gripper_action_execute, position=%f, max_effort=%f", goal->command.position, goal->command.max_effort);
-        
-        int ret;
-        float cur_pos = 0;
-        int err = 0;
-        ret = arm->get_gripper_err_code(&err);
-        if (ret != 0 || err != 0) {
-            try {
-                goal_handle->canceled(gripper_result_);
-            } catch (std::exception &e) {
-                RCLCPP_ERROR(node_->get_logger(), "goal_handle canceled exception, ex=%s", e.what());    
+        // the position is read once and republished for the joint states, the goals refresh it
+        gripper_last_pos_valid_ = gripper_publish_ && arm->get_gripper_position(&gripper_last_pos_) == 0;
+        bool idle_poll = gripper_idle_frequency_ > 0;
+        double publish_period = idle_poll ? std::min(0.5, 1.0 / gripper_idle_frequency_) : 0.5;
+        auto last_poll = std::chrono::steady_clock::now();
+        while (true) {
+            std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle;
+            {
+                std::unique_lock<std::mutex> locker(gripper_mutex_);
+                auto has_goal = [this] { return gripper_quit_ || !gripper_goals_.empty(); };
+                if (gripper_publish_)
+                    gripper_cond_.wait_for(locker, std::chrono::duration<double>(publish_period), has_goal);
+                else
+                    gripper_cond_.wait(locker, has_goal);
+                if (gripper_quit_) break;
+                if (!gripper_goals_.empty()) {
+                    goal_handle = gripper_goals_.front();
+                    gripper_goals_.pop_front();
+                }
             }
-            RCLCPP_ERROR(node_->get_logger(), "get_gripper_err_code, ret=%d, err=%d", ret, err);
-            return;
+            if (goal_handle) {
+                _gripper_action_execute(goal_handle);
+                idle_poll = gripper_idle_frequency_ > 0;
+                continue;
+            }
+            if (!gripper_publish_) continue;
+            // no goal moves the gripper, the position is only read at idle_frequency and not any more after a failed read
+            auto now = std::chrono::steady_clock::now();
+            if (idle_poll && std::chrono::duration<double>(now - last_poll).count() >= 1.0 / gripper_idle_frequency_) {
+                last_poll = now;
+                float cur_pos;
+                if (arm->get_gripper_position(&cur_pos) == 0) {
+                    gripper_last_pos_ = cur_pos;
+                    gripper_last_pos_valid_ = true;
+                }
+                else {
+                    idle_poll = false;
+                    RCLCPP_WARN(node_->get_logger(), "get_gripper_position failed, stop polling the idle gripper until the next goal");
+                }
+            }
+            if (gripper_last_pos_valid_) _pub_gripper_joint_states(gripper_last_pos_);
         }
-        ret = arm->get_gripper_position(&cur_pos);
-        _pub_gripper_joint_states(cur_pos);
-
-        ret = arm->set_gripper_mode(0);
-        if (ret != 0) {
-            gripper_result_->position = _gripper_pos_convert(cur_pos);
+        std::lock_guard<std::mutex> locker(gripper_mutex_);
+        for (auto &goal_handle : gripper_goals_) {
             try {
-                goal_handle->canceled(gripper_result_);
+                goal_handle->abort(std::make_shared<control_msgs::action::GripperCommand::Result>());
             } catch (std::exception &e) {
-                RCLCPP_ERROR(node_->get_logger(), "goal_handle canceled exception, ex=%s", e.what()); 
+                RCLCPP_ERROR(node_->get_logger(), "goal_handle abort exception, ex=%s", e.what());
             }
-            ret = arm->get_gripper_err_code(&err);
-            RCLCPP_WARN(node_->get_logger(), "set_gripper_mode, ret=%d, err=%d, cur_pos=%f", ret, err, cur_pos);
-            return;
         }
-        ret = arm->set_gripper_enable(true);
-        if (ret != 0) {
-            gripper_result_->position = _gripper_pos_convert(cur_pos);
+        gripper_goals_.clear();
+    }
+
+    void XArmDriver::_gripper_action_execute(const std::shared_ptr<rclcpp_action::ServerGoalHandle<control_msgs::action::GripperCommand>> goal_handle)
+    {
+        const auto goal = goal_handle->get_goal();
+        RCLCPP_INFO(node_->get_logger(), "gripper_action_execute, position=%f, max_effort=%f", goal->command.position, goal->command.max_effort);
+        auto feedback = std::make_shared<control_msgs::action::GripperCommand::Feedback>();
+        auto result = std::make_shared<control_msgs::action::GripperCommand::Result>();
+        auto finish = [&](MotionActionEnd end) {
             try {
-                goal_handle->canceled(gripper_result_);
+                if (end == MotionActionEnd::SUCCEEDED) goal_handle->succeed(result);
+                else if (end == MotionActionEnd::CANCELED) goal_handle->canceled(result);
+                else goal_handle->abort(result);
             } catch (std::exception &e) {
-                RCLCPP_ERROR(node_->get_logger(), "goal_handle canceled exception, ex=%s", e.what()); 
+                RCLCPP_ERROR(node_->get_logger(), "goal_handle finish exception, ex=%s", e.what());
             }
+        };
+
+        int ret;
+        int err = 0;
+        float cur_pos = 0;
+        // the gripper stays configured between the goals, until a command fails
+        if (!gripper_ready_) {
             ret = arm->get_gripper_err_code(&err);
-            RCLCPP_WARN(node_->get_logger(), "set_gripper_enable, ret=%d, err=%d, cur_pos=%f", ret, err, cur_pos);
-            return;
+            if (ret != 0 || err != 0) {
+                RCLCPP_ERROR(node_->get_logger(), "get_gripper_err_code, ret=%d, err=%d", ret, err);
+                finish(MotionActionEnd::ABORTED);
+                return;
+            }
+            ret = arm->set_gripper_mode(0);
+            if (ret == 0) ret = arm->set_gripper_enable(true);
+            if (ret == 0) ret = arm->set_gripper_speed(gripper_speed_);
+            if (ret != 0) {
+                arm->get_gripper_err_code(&err);
+                RCLCPP_WARN(node_->get_logger(), "gripper setup failed, ret=%d, err=%d", ret, err);
+                finish(MotionActionEnd::ABORTED);
+                return;
+            }
+            gripper_ready_ = true;
         }
-        ret = arm->set_gripper_speed(gripper_speed_);
+
+        float target_pos = _gripper_pos_convert(goal->command.position, true);
+        ret = arm->set_gripper_position(target_pos, false);
         if (ret != 0) {
-            gripper_result_->position = _gripper_pos_convert(cur_pos);
-            try {
-                goal_handle->canceled(gripper_result_);
-            } catch (std::exception &e) {
-                RCLCPP_ERROR(node_->get_logger(), "goal_handle canceled exception, ex=%s", e.what()); 
-            }
-            ret = arm->get_gripper_err_code(&err);
-            RCLCPP_WARN(node_->get_logger(), "set_gripper_speed, ret=%d, err=%d, cur_pos=%f", ret, err, cur_pos);
+            gripper_ready_ = false;
+            arm->get_gripper_err_code(&err);
+            RCLCPP_WARN(node_->get_logger(), "set_gripper_position, ret=%d, err=%d", ret, err);
+            finish(MotionActionEnd::ABORTED);
             return;
         }
+
+        auto start = std::chrono::steady_clock::now();
+        // polled at frequency while moving, up to 4 times faster when the target is about to be reached
+        // and backing off up to 4 times slower while the gripper is still
+        double base_period = 1.0 / (gripper_frequency_ > 0 ? gripper_frequency_ : 10);
+        double period = base_period;
+        auto prev_stamp = start;
+        float prev_pos = 0;
         float last_pos = -gripper_max_pos_;
-        float target_pos = _gripper_pos_convert(goal->command.position, true);
-        bool is_move = true;
-        std::thread([this, &target_pos, &is_move, &cur_pos]() {
-            is_move = true;
-            int ret2 = arm->set_gripper_position(target_pos, true, -1, false); // set wait_motion=false
-            int err;
-            arm->get_gripper_err_code(&err);
-            RCLCPP_INFO(node_->get_logger(), "set_gripper_position, ret=%d, err=%d, cur_pos=%f", ret2, err, cur_pos);
-            is_move = false;
-        }).detach();
-        int cnt = 0;
-        bool is_succeed = false;
-        auto sltime = std::chrono::nanoseconds(1000000000 / gripper_frequency_);
-        while (is_move && rclcpp::ok())
-        {
-            std::this_thread::sleep_for(sltime);
+        float start_pos = 0;
+        bool has_start = false;
+        bool moved = false;
+        double still_time = 0;
+        while (rclcpp::ok()) {
+            bool preempted = false;
+            {
+                // woken early by a cancel request
+                std::unique_lock<std::mutex> locker(gripper_mutex_);
+                gripper_cond_.wait_for(locker, std::chrono::duration<double>(period));
+                if (gripper_quit_) break;
+                preempted = gripper_preempt_ && !gripper_goals_.empty();
+            }
             ret = arm->get_gripper_position(&cur_pos);
             if (ret == 0) {
-                if (!is_succeed) {
-                    if (fabs(last_pos - cur_pos) < gripper_threshold_) {
-                        cnt += 1;
-                        if (cnt >= gripper_threshold_times_ && fabs(target_pos - cur_pos) < 15) {
-                            gripper_result_->position = _gripper_pos_convert(cur_pos);
-                            try {
-                                goal_handle->succeed(gripper_result_);
-                            } catch (std::exception &e) {
-                                RCLCPP_ERROR(node_->get_logger(), "goal_handle succeed exception, ex=%s", e.what()); 
-                            }
-                            is_succeed = true;
-                        }
-                    }
-                    else {
-                        cnt = 0;
-                        last_pos = cur_pos;
-                    }
-                }
-                gripper_feedback_->position = _gripper_pos_convert(cur_pos);
+                feedback->position = _gripper_pos_convert(cur_pos);
+                feedback->reached_goal = fabs(target_pos - cur_pos) < gripper_reached_tolerance_;
                 try {
-                    goal_handle->publish_feedback(gripper_feedback_);
+                    goal_handle->publish_feedback(feedback);
                 } catch (std::exception &e) {
                     RCLCPP_ERROR(node_->get_logger(), "goal_handle publish_feedback exception, ex=%s", e.what());
                 }
                 _pub_gripper_joint_states(cur_pos);
+                gripper_last_pos_ = cur_pos;
+                gripper_last_pos_valid_ = true;
+                result->position = feedback->position;
             }
-            // if (goal_handle->is_canceling()) {
-            //     gripper_result_->position = _gripper_pos_convert(cur_pos);
-            //     goal_handle->canceled(gripper_result_);
-            //     RCLCPP_INFO(this->get_logger(), "Goal canceled, cur_pos=%f", cur_pos);
-            //     return;
-            // }
-        }
-        arm->get_gripper_position(&cur_pos);
-        RCLCPP_INFO(node_->get_logger(), "move finish, cur_pos=%f", cur_pos);
-        if (rclcpp::ok() && !is_succeed) {
-            gripper_result_->position = _gripper_pos_convert(cur_pos);
-            try {
-                goal_handle->succeed(gripper_result_);
-            } catch (std::exception &e) {
-                RCLCPP_ERROR(node_->get_logger(), "goal_handle succeed exception, ex=%s", e.what());
+            if (goal_handle->is_canceling()) {
+                // hold the current position
+                if (ret == 0) arm->set_gripper_position(cur_pos, false);
+                finish(MotionActionEnd::CANCELED);
+                RCLCPP_INFO(node_->get_logger(), "gripper goal canceled, cur_pos=%f", cur_pos);
+                return;
+            }
+            if (preempted) {
+                // the next goal sends its own target
+                finish(MotionActionEnd::ABORTED);
+                RCLCPP_INFO(node_->get_logger(), "gripper goal preempted, cur_pos=%f", cur_pos);
+                return;
+            }
+            if (ret == 0) {
+                auto now = std::chrono::steady_clock::now();
+                double dt = std::chrono::duration<double>(now - prev_stamp).count();
+                prev_stamp = now;
+                if (!has_start) {
+                    start_pos = cur_pos;
+                    prev_pos = cur_pos;
+                    has_start = true;
+                }
+                double speed = dt > 0 ? fabs(cur_pos - prev_pos) / dt : 0;
+                prev_pos = cur_pos;
+                moved = moved || fabs(cur_pos - start_pos) >= gripper_threshold_;
+                // finished as soon as the target is reached, or once the gripper stopped on an object
+                if (fabs(target_pos - cur_pos) < gripper_reached_tolerance_) {
+                    result->reached_goal = true;
+                    finish(MotionActionEnd::SUCCEEDED);
+                    RCLCPP_INFO(node_->get_logger(), "gripper goal reached, cur_pos=%f", cur_pos);
+                    return;
+                }
+                if (fabs(last_pos - cur_pos) < gripper_threshold_) {
+                    // still for as long as threshold_times polls at frequency
+                    still_time += dt;
+                    period = std::min(period * 2, base_period * 4);
+                    if (still_time >= gripper_threshold_times_ * base_period) {
+                        result->stalled = true;
+                        if (moved) {
+                            finish(MotionActionEnd::SUCCEEDED);
+                            RCLCPP_INFO(node_->get_logger(), "gripper stalled, cur_pos=%f", cur_pos);
+                        }
+                        else {
+                            // e.g. disabled or in another mode, set it up again for the next goal
+                            gripper_ready_ = false;
+                            finish(MotionActionEnd::ABORTED);
+                            RCLCPP_WARN(node_->get_logger(), "gripper did not move, cur_pos=%f", cur_pos);
+                        }
+                        return;
+                    }
+                }
+                else {
+                    still_time = 0;
+                    last_pos = cur_pos;
+                    // the next poll when the target should be reached at the current speed
+                    period = base_period;
+                    if (speed > 0) period = std::max(base_period / 4, std::min(base_period, (fabs(target_pos - cur_pos) - gripper_reached_tolerance_) / speed));
+                }
+            }
+            else {
+                period = base_period;
+            }
+            if (std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count() > gripper_timeout_) {
+                RCLCPP_WARN(node_->get_logger(), "gripper goal timeout, cur_pos=%f", cur_pos);
+                gripper_ready_ = false;
+                break;
             }
-            RCLCPP_INFO(node_->get_logger(), "Goal succeeded");
         }
+        finish(MotionActionEnd::ABORTED);
     }
 
     void XArmDriver::pub_robot_msg(xarm_msgs::msg::RobotMsg &rm_msg)
     {
-        robot_state_pub_->publish(rm_msg);
+        _publish_report_msg(robot_state_pub_, rm_msg);
     }
     
     void XArmDriver::pub_joint_state(sensor_msgs::msg::JointState &js_msg)
     {
-        joint_state_pub_->publish(js_msg);
+        _publish_report_msg(joint_state_pub_, js_msg);
     }
 
     void XArmDriver::pub_cgpio_state(xarm_msgs::msg::CIOState &cio_msg)
     {
-        cgpio_state_pub_->publish(cio_msg);
+        _publish_report_msg(cgpio_state_pub_, cio_msg);
     }
 
     void XArmDriver::pub_ftsensor_ext_state(geometry_msgs::msg::WrenchStamped &wrench_msg)
     {
-        ftsensor_ext_state_pub_->publish(wrench_msg);
+        _publish_report_msg(ftsensor_ext_state_pub_, wrench_msg);
     }
 
     void XArmDriver::pub_ftsensor_raw_state(geometry_msgs::msg::WrenchStamped &wrench_msg)
     {
-        ftsensor_raw_state_pub_->publish(wrench_msg);
+        _publish_report_msg(ftsensor_raw_state_pub_, wrench_msg);
     }
 
     bool XArmDriver::is_connected(void) {
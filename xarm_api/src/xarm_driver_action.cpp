@@ -0,0 +1,440 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+#include <algorithm>
+#include "xarm_api/xarm_driver.h"
+
+#define PARAM_ERROR 997
+#define MOTION_INTERRUPTED 996  // the arm stopped or has an error before the motion finished
+
+namespace xarm_api
+{
+    template<typename ActionT>
+    typename rclcpp_action::Server<ActionT>::SharedPtr XArmDriver::_create_motion_action_server(const std::string &name,
+        std::function<int(const std::shared_ptr<const typename ActionT::Goal> &goal)> send)
+    {
+        using GoalHandle = rclcpp_action::ServerGoalHandle<ActionT>;
+        return rclcpp_action::create_server<ActionT>(
+            node_, hw_node_->get_sub_namespace() + "/" + name,
+            [this, name](const rclcpp_action::GoalUUID &uuid, std::shared_ptr<const typename ActionT::Goal> goal) {
+                (void)uuid;
+                (void)goal;
+                // both decide completion from the controller's queue, a waypoint stream would finish these goals early
+                std::lock_guard<std::mutex> locker(motion_action_mutex_);
+                std::string reason;
+                if (waypoint_goal_active_) reason = "a move_waypoints goal is active";
+                else if (motion_goal_cnt_ == 0) _other_motions_active(reason);
+                if (!reason.empty()) {
+                    RCLCPP_WARN(node_->get_logger(), "%s goal rejected, %s", name.c_str(), reason.c_str());
+                    return rclcpp_action::GoalResponse::REJECT;
+                }
+                motion_goal_cnt_++;
+                return rclcpp_action::GoalResponse::ACCEPT_AND_EXECUTE;
+            },
+            [this](const std::shared_ptr<GoalHandle> goal_handle) {
+                // the motion loop stops the arm once the goal is canceling
+                (void)goal_handle;
+                motion_action_cond_.notify_all();
+                return rclcpp_action::CancelResponse::ACCEPT;
+            },
+            [this, name, send](const std::shared_ptr<GoalHandle> goal_handle) {
+                std::shared_ptr<MotionActionGoal> goal = std::make_shared<MotionActionGoal>();
+                goal->name = name;
+                goal->moved = false;
+                goal->send = [goal_handle, send]() { return send(goal_handle->get_goal()); };
+                goal->is_canceling = [goal_handle]() { return goal_handle->is_canceling(); };
+                goal->publish_feedback = [this, goal_handle](const ReportSnapshot &snapshot, int queue_index) {
+                    auto feedback = std::make_shared<typename ActionT::Feedback>();
+                    feedback->state = snapshot.state;
+                    feedback->cmdnum = snapshot.cmdnum;
+                    feedback->angles.assign(snapshot.angle, snapshot.angle + std::min(dof_, 7));
+                    feedback->pose.assign(snapshot.pose, snapshot.pose + 6);
+                    feedback->queue_index = queue_index;
+                    goal_handle->publish_feedback(feedback);
+                };
+                goal->finish = [this, name, goal_handle](MotionActionEnd end, int ret, const std::string &message) {
+                    auto result = std::make_shared<typename ActionT::Result>();
+                    result->ret = ret;
+                    result->message = message;
+                    try {
+                        if (end == MotionActionEnd::SUCCEEDED) goal_handle->succeed(result);
+                        else if (end == MotionActionEnd::CANCELED) goal_handle->canceled(result);
+                        else goal_handle->abort(result);
+                    } catch (std::exception &e) {
+                        RCLCPP_ERROR(node_->get_logger(), "%s goal_handle finish exception, ex=%s", name.c_str(), e.what());
+                    }
+                    // may be called with motion_action_mutex_ held, hence atomic
+                    motion_goal_cnt_--;
+                };
+                {
+                    std::lock_guard<std::mutex> locker(motion_action_mutex_);
+                    motion_pending_goals_.push_back(goal);
+                }
+                motion_action_cond_.notify_all();
+            });
+    }
+
+    void XArmDriver::_init_motion_action(void)
+    {
+        bool enable;
+        node_->get_parameter_or("motion_action.enable", enable, true);
+        node_->get_parameter_or("motion_action.feedback_rate", motion_feedback_rate_, 10.0);
+        node_->get_parameter_or("motion_action.start_timeout", motion_start_timeout_, 0.5);
+        node_->get_parameter_or("motion_action.report_timeout", motion_report_timeout_, 1.0);
+        node_->get_parameter_or("motion_action.resume_after_stop", motion_resume_after_stop_, true);
+        node_->get_parameter_or("motion_action.waypoint_window", waypoint_window_, 64);
+        RCLCPP_INFO(node_->get_logger(), "motion_action: enable: %d, feedback_rate: %f, start_timeout: %f, report_timeout: %f, resume_after_stop: %d, waypoint_window: %d",
+            enable, motion_feedback_rate_, motion_start_timeout_, motion_report_timeout_, motion_resume_after_stop_, waypoint_window_);
+        if (!enable) return;
+
+        // the motions are only queued in the controller, the report tells when they are finished
+        set_position_action_server_ = _create_motion_action_server<xarm_msgs::action::MoveCartesian>("set_position",
+            [this](const std::shared_ptr<const xarm_msgs::action::MoveCartesian::Goal> &goal) {
+                if (goal->pose.size() < 6) return PARAM_ERROR;
+                float pose[6];
+                std::copy(goal->pose.begin(), goal->pose.begin() + 6, pose);
+                return arm->set_position(pose, goal->radius, goal->speed, goal->acc, goal->mvtime, false);
+            });
+        set_tool_position_action_server_ = _create_motion_action_server<xarm_msgs::action::MoveCartesian>("set_tool_position",
+            [this](const std::shared_ptr<const xarm_msgs::action::MoveCartesian::Goal> &goal) {
+                if (goal->pose.size() < 6) return PARAM_ERROR;
+                float pose[6];
+                std::copy(goal->pose.begin(), goal->pose.begin() + 6, pose);
+                return arm->set_tool_position(pose, goal->speed, goal->acc, goal->mvtime, false);
+            });
+        set_servo_angle_action_server_ = _create_motion_action_server<xarm_msgs::action::MoveJoint>("set_servo_angle",
+            [this](const std::shared_ptr<const xarm_msgs::action::MoveJoint::Goal> &goal) {
+                if (goal->angles.size() < dof_) return PARAM_ERROR;
+                float angles[7] = { 0 };
+                for (int i = 0; i < std::min((int)goal->angles.size(), 7); i++) {
+                    angles[i] = goal->angles[i];
+                }
+                return arm->set_servo_angle(angles, goal->speed, goal->acc, goal->mvtime, false, -1, goal->radius);
+            });
+        move_circle_action_server_ = _create_motion_action_server<xarm_msgs::action::MoveCircle>("move_circle",
+            [this](const std::shared_ptr<const xarm_msgs::action::MoveCircle::Goal> &goal) {
+                if (goal->pose1.size() < 6 || goal->pose2.size() < 6) return PARAM_ERROR;
+                float pose1[6], pose2[6];
+                std::copy(goal->pose1.begin(), goal->pose1.begin() + 6, pose1);
+                std::copy(goal->pose2.begin(), goal->pose2.begin() + 6, pose2);
+                return arm->move_circle(pose1, pose2, goal->percent, goal->speed, goal->acc, goal->mvtime, false);
+            });
+        move_gohome_action_server_ = _create_motion_action_server<xarm_msgs::action::MoveHome>("move_gohome",
+            [this](const std::shared_ptr<const xarm_msgs::action::MoveHome::Goal> &goal) {
+                return arm->move_gohome(goal->speed, goal->acc, goal->mvtime, false);
+            });
+        // one waypoint goal at a time, it streams its waypoints into the controller queue
+        move_waypoints_action_server_ = rclcpp_action::create_server<xarm_msgs::action::MoveWaypoints>(
+            node_, hw_node_->get_sub_namespace() + "/move_waypoints",
+            [this](const rclcpp_action::GoalUUID &uuid, std::shared_ptr<const xarm_msgs::action::MoveWaypoints::Goal> goal) {
+                (void)uuid;
+                if (goal->waypoints.empty()) return rclcpp_action::GoalResponse::REJECT;
+                // one waypoint goal at a time and never together with the other motion goals
+                std::lock_guard<std::mutex> locker(motion_action_mutex_);
+                std::string reason;
+                if (waypoint_goal_active_) reason = "a move_waypoints goal is active";
+                else if (motion_goal_cnt_ > 0) reason = "motion goals are active";
+                else _other_motions_active(reason);
+                if (!reason.empty()) {
+                    RCLCPP_WARN(node_->get_logger(), "move_waypoints goal rejected, %s", reason.c_str());
+                    return rclcpp_action::GoalResponse::REJECT;
+                }
+                waypoint_goal_active_ = true;
+                return rclcpp_action::GoalResponse::ACCEPT_AND_EXECUTE;
+            },
+            [](const std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> goal_handle) {
+                (void)goal_handle;
+                return rclcpp_action::CancelResponse::ACCEPT;
+            },
+            [this](const std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> goal_handle) {
+                // executed by the waypoint thread, the executor thread must not wait for the previous goal
+                {
+                    std::lock_guard<std::mutex> locker(motion_action_mutex_);
+                    waypoint_goal_ = goal_handle;
+                }
+                motion_action_cond_.notify_all();
+            });
+
+        motion_action_enable_ = true;
+        motion_action_thread_ = std::thread(&XArmDriver::_motion_action_loop, this);
+        waypoint_thread_ = std::thread(&XArmDriver::_waypoint_loop, this);
+    }
+
+    bool XArmDriver::_other_motions_active(std::string &reason)
+    {
+        // the goals tell their completion from the controller's queue, which must not hold the motions of others
+        std::shared_ptr<ServiceGroup> group = service_groups_["motion"];
+        {
+            std::lock_guard<std::mutex> locker(group->mutex);
+            if (group->running > 0) {
+                reason = "a motion service is running";
+                return true;
+            }
+        }
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, 1.0) && (snapshot.state == 1 || snapshot.cmdnum > 0)) {
+            reason = "the arm is executing other motions, state=" + std::to_string(snapshot.state) + ", cmdnum=" + std::to_string(snapshot.cmdnum);
+            return true;
+        }
+        return false;
+    }
+
+    void XArmDriver::_motion_action_loop(void)
+    {
+        // goals whose motion was sent, in the order of the controller's command queue
+        std::deque<std::shared_ptr<MotionActionGoal>> active_goals;
+        ReportWatchdog report_watchdog;
+        std::chrono::steady_clock::time_point feedback_stamp;
+        while (true) {
+            std::deque<std::shared_ptr<MotionActionGoal>> new_goals;
+            {
+                std::unique_lock<std::mutex> locker(motion_action_mutex_);
+                if (active_goals.empty())
+                    motion_action_cond_.wait(locker, [this] { return motion_action_quit_ || !motion_pending_goals_.empty(); });
+                else
+                    motion_action_cond_.wait_for(locker, std::chrono::milliseconds(20));
+                if (motion_action_quit_) break;
+                new_goals.swap(motion_pending_goals_);
+            }
+
+            // a canceled goal stops the arm, the stop drops all motions queued in the controller
+            bool canceling = false;
+            for (auto &goal : active_goals) canceling = canceling || goal->is_canceling();
+            if (canceling) {
+                int ret = arm->set_state(4);
+                RCLCPP_INFO(node_->get_logger(), "motion action canceled, stop the arm, ret=%d", ret);
+                for (auto &goal : active_goals) {
+                    if (goal->is_canceling())
+                        goal->finish(MotionActionEnd::CANCELED, ret, "canceled, the arm is stopped");
+                    else
+                        goal->finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, "stopped by the cancel of another goal");
+                }
+                active_goals.clear();
+                if (motion_resume_after_stop_) {
+                    ret = arm->set_state(0);
+                    if (ret != 0) RCLCPP_WARN(node_->get_logger(), "resume after stop failed, ret=%d", ret);
+                }
+            }
+
+            for (auto &goal : new_goals) {
+                if (goal->is_canceling()) {
+                    goal->finish(MotionActionEnd::CANCELED, 0, "canceled before it was sent");
+                    continue;
+                }
+                int ret = goal->send();
+                if (ret != 0) {
+                    goal->finish(MotionActionEnd::ABORTED, ret, "failed to send the motion");
+                    continue;
+                }
+                goal->sent_stamp = std::chrono::steady_clock::now();
+                if (active_goals.empty()) report_watchdog.start(motion_report_timeout_, goal->sent_stamp);
+                active_goals.push_back(goal);
+            }
+            if (active_goals.empty()) continue;
+
+            ReportSnapshot snapshot;
+            {
+                std::lock_guard<std::mutex> locker(report_snapshot_mutex_);
+                snapshot = report_snapshot_;
+            }
+            // only a report received after the last motion was sent knows about it
+            auto now = std::chrono::steady_clock::now();
+            if (!report_watchdog.fresh(snapshot.seq, snapshot.stamp, active_goals.back()->sent_stamp, now)) {
+                if (report_watchdog.expired(now)) {
+                    RCLCPP_WARN(node_->get_logger(), "motion action: no report for %f seconds, abort %d goals", motion_report_timeout_, (int)active_goals.size());
+                    for (auto &goal : active_goals) goal->finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, "no report received, the motion state is unknown");
+                    active_goals.clear();
+                }
+                continue;
+            }
+
+            if (snapshot.state == 4 || snapshot.state == 5 || snapshot.err != 0) {
+                std::string message = "interrupted, state=" + std::to_string(snapshot.state) + ", err=" + std::to_string(snapshot.err);
+                for (auto &goal : active_goals) goal->finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, message);
+                active_goals.clear();
+                continue;
+            }
+            // the controller holds more commands than the goals sent, another client queued motions in between
+            if (snapshot.cmdnum > (int)active_goals.size()) {
+                std::string message = "interrupted, motions of another client are queued, cmdnum=" + std::to_string(snapshot.cmdnum);
+                for (auto &goal : active_goals) goal->finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, message);
+                active_goals.clear();
+                continue;
+            }
+
+            if (motion_feedback_rate_ > 0 && std::chrono::duration<double>(now - feedback_stamp).count() >= 1.0 / motion_feedback_rate_) {
+                feedback_stamp = now;
+                for (int i = 0; i < active_goals.size(); i++) active_goals[i]->publish_feedback(snapshot, i);
+            }
+
+            std::shared_ptr<MotionActionGoal> front = active_goals.front();
+            if (snapshot.state == 1) front->moved = true;
+            // a motion too short to be seen moving is finished once the controller is idle for start_timeout
+            if (snapshot.state != 1 && snapshot.cmdnum == 0
+                && (front->moved || std::chrono::duration<double>(now - front->sent_stamp).count() > motion_start_timeout_)) {
+                for (auto &goal : active_goals) goal->finish(MotionActionEnd::SUCCEEDED, 0, "finished");
+                active_goals.clear();
+                continue;
+            }
+            // the controller executes its queue in order, fewer commands left than goals behind the front means it is finished
+            while (active_goals.size() > 1 && snapshot.cmdnum < (int)active_goals.size() - 1) {
+                active_goals.front()->finish(MotionActionEnd::SUCCEEDED, 0, "finished");
+                active_goals.pop_front();
+                active_goals.front()->moved = snapshot.state == 1;
+            }
+        }
+        std::lock_guard<std::mutex> locker(motion_action_mutex_);
+        active_goals.insert(active_goals.end(), motion_pending_goals_.begin(), motion_pending_goals_.end());
+        motion_pending_goals_.clear();
+        for (auto &goal : active_goals) goal->finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, "driver shutdown");
+    }
+
+    void XArmDriver::_waypoint_loop(void)
+    {
+        while (true) {
+            std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> goal_handle;
+            {
+                std::unique_lock<std::mutex> locker(motion_action_mutex_);
+                motion_action_cond_.wait(locker, [this] { return motion_action_quit_ || waypoint_goal_; });
+                if (motion_action_quit_) break;
+                goal_handle.swap(waypoint_goal_);
+            }
+            _move_waypoints_execute(goal_handle);
+        }
+        std::lock_guard<std::mutex> locker(motion_action_mutex_);
+        if (waypoint_goal_) {
+            auto result = std::make_shared<xarm_msgs::action::MoveWaypoints::Result>();
+            result->ret = MOTION_INTERRUPTED;
+            result->message = "driver shutdown";
+            try {
+                waypoint_goal_->abort(result);
+            } catch (std::exception &e) {
+                RCLCPP_ERROR(node_->get_logger(), "move_waypoints goal_handle abort exception, ex=%s", e.what());
+            }
+            waypoint_goal_.reset();
+        }
+    }
+
+    int XArmDriver::_send_waypoint(bool cartesian, const xarm_msgs::msg::Waypoint &waypoint)
+    {
+        if (cartesian) {
+            if (waypoint.target.size() < 6) return PARAM_ERROR;
+            float pose[6];
+            std::copy(waypoint.target.begin(), waypoint.target.begin() + 6, pose);
+            return arm->set_position(pose, waypoint.radius, waypoint.speed, waypoint.acc, waypoint.mvtime, false);
+        }
+        if (waypoint.target.size() < dof_) return PARAM_ERROR;
+        float angles[7] = { 0 };
+        for (int i = 0; i < std::min((int)waypoint.target.size(), 7); i++) {
+            angles[i] = waypoint.target[i];
+        }
+        return arm->set_servo_angle(angles, waypoint.speed, waypoint.acc, waypoint.mvtime, false, -1, waypoint.radius);
+    }
+
+    void XArmDriver::_move_waypoints_execute(const std::shared_ptr<rclcpp_action::ServerGoalHandle<xarm_msgs::action::MoveWaypoints>> goal_handle)
+    {
+        const auto goal = goal_handle->get_goal();
+        auto feedback = std::make_shared<xarm_msgs::action::MoveWaypoints::Feedback>();
+        auto result = std::make_shared<xarm_msgs::action::MoveWaypoints::Result>();
+        int total = goal->waypoints.size();
+        // the SDK refuses motions once max_cmdnum (512) commands are queued
+        int window = std::min(goal->window > 0 ? goal->window : waypoint_window_, 512);
+        int sent = 0;
+        int finished = 0;
+        bool moved = false;
+        ReportWatchdog report_watchdog;
+        report_watchdog.start(motion_report_timeout_, std::chrono::steady_clock::now());
+        std::chrono::steady_clock::time_point sent_stamp;
+        std::chrono::steady_clock::time_point feedback_stamp;
+        RCLCPP_INFO(node_->get_logger(), "move_waypoints: waypoints=%d, cartesian=%d, window=%d", total, goal->cartesian, window);
+
+        auto finish = [&](MotionActionEnd end, int ret, const std::string &message) {
+            result->ret = ret;
+            result->message = message;
+            result->finished = finished;
+            try {
+                if (end == MotionActionEnd::SUCCEEDED) goal_handle->succeed(result);
+                else if (end == MotionActionEnd::CANCELED) goal_handle->canceled(result);
+                else goal_handle->abort(result);
+            } catch (std::exception &e) {
+                RCLCPP_ERROR(node_->get_logger(), "move_waypoints goal_handle finish exception, ex=%s", e.what());
+            }
+            RCLCPP_INFO(node_->get_logger(), "move_waypoints: ret=%d, sent=%d, finished=%d, %s", ret, sent, finished, message.c_str());
+        };
+
+        while (true) {
+            {
+                std::unique_lock<std::mutex> locker(motion_action_mutex_);
+                if (motion_action_quit_) {
+                    finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, "driver shutdown");
+                    break;
+                }
+            }
+            if (goal_handle->is_canceling()) {
+                // the stop drops the waypoints queued in the controller
+                int ret = arm->set_state(4);
+                finish(MotionActionEnd::CANCELED, ret, "canceled, the arm is stopped");
+                if (motion_resume_after_stop_) arm->set_state(0);
+                break;
+            }
+
+            ReportSnapshot snapshot;
+            {
+                std::lock_guard<std::mutex> locker(report_snapshot_mutex_);
+                snapshot = report_snapshot_;
+            }
+            // only a report received after the last send knows about all the waypoints sent
+            if (report_watchdog.fresh(snapshot.seq, snapshot.stamp, sent_stamp, std::chrono::steady_clock::now())) {
+                if (snapshot.state == 4 || snapshot.state == 5 || snapshot.err != 0) {
+                    finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, 
+                        "interrupted, state=" + std::to_string(snapshot.state) + ", err=" + std::to_string(snapshot.err));
+                    break;
+                }
+                if (snapshot.state == 1) moved = true;
+                // cmdnum counts the waypoints still queued, the one being executed is not finished either
+                finished = std::max(finished, std::min(sent, sent - snapshot.cmdnum - (snapshot.state == 1 ? 1 : 0)));
+                auto now = std::chrono::steady_clock::now();
+                if (sent == total && snapshot.state != 1 && snapshot.cmdnum == 0
+                    && (moved || std::chrono::duration<double>(now - sent_stamp).count() > motion_start_timeout_)) {
+                    finished = total;
+                    finish(MotionActionEnd::SUCCEEDED, 0, "finished");
+                    break;
+                }
+                if (motion_feedback_rate_ > 0 && std::chrono::duration<double>(now - feedback_stamp).count() >= 1.0 / motion_feedback_rate_) {
+                    feedback_stamp = now;
+                    feedback->state = snapshot.state;
+                    feedback->cmdnum = snapshot.cmdnum;
+                    feedback->sent = sent;
+                    feedback->finished = finished;
+                    goal_handle->publish_feedback(feedback);
+                }
+
+                // keep the controller queue filled up to the window
+                int ret = 0;
+                while (sent < total && sent - finished < window) {
+                    ret = _send_waypoint(goal->cartesian, goal->waypoints[sent]);
+                    if (ret != 0) break;
+                    sent++;
+                    sent_stamp = std::chrono::steady_clock::now();
+                }
+                if (ret != 0) {
+                    // the waypoints already queued are still executed
+                    finish(MotionActionEnd::ABORTED, ret, "failed to send waypoint " + std::to_string(sent));
+                    break;
+                }
+            }
+            else if (report_watchdog.expired(std::chrono::steady_clock::now())) {
+                // the waypoints already queued are still executed
+                finish(MotionActionEnd::ABORTED, MOTION_INTERRUPTED, "no report received for " + std::to_string(motion_report_timeout_) + " seconds, the motion state is unknown");
+                break;
+            }
+
+            std::unique_lock<std::mutex> locker(motion_action_mutex_);
+            motion_action_cond_.wait_for(locker, std::chrono::milliseconds(20));
+        }
+        waypoint_goal_active_ = false;
+    }
+}
@@ -171,7 +171,12 @@ int main(int argc, char **argv)
     xarm_driver.init(node, robot_ip);
 
     signal(SIGINT, exit_sig_handler);
-    rclcpp::spin(node);
+    // a motion service called with wait must not block the other service groups
+    int threads = 0;
+    node->get_parameter_or("service_groups.threads", threads, 0);
+    rclcpp::executors::MultiThreadedExecutor executor(rclcpp::ExecutorOptions(), threads < 0 ? 0 : threads);
+    executor.add_node(node);
+    executor.spin();
     rclcpp::shutdown();
 
     RCLCPP_INFO(node->get_logger(), "xarm_driver_node over");
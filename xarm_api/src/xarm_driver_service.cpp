@@ -4,20 +4,91 @@
  *
  * Author: Vinman <vinman.cub@gmail.com>
  ============================================================================*/
+#include <algorithm>
 #include "xarm_api/xarm_driver.h"
 
 #define PARAM_ERROR 997
+#define SERVICE_IS_BUSY 995  // the callback group of the service is running its limit of calls (reject_when_full)
 #define BIND_CLS_CB(func) std::bind(func, this, std::placeholders::_1, std::placeholders::_2)
 
 namespace xarm_api
 {
+    void XArmDriver::_init_service_groups(void)
+    {
+        // a group of limit 1 is mutually exclusive, the others are reentrant and limited by _enter_service_group if reject_when_full
+        const std::vector<std::pair<std::string, int>> default_limits = { {"motion", 1}, {"io", 1}, {"gripper", 1}, {"query", 0} };
+        bool reject_when_full;
+        node_->get_parameter_or("service_groups.reject_when_full", reject_when_full, false);
+        for (auto &item : default_limits) {
+            std::shared_ptr<ServiceGroup> group = std::make_shared<ServiceGroup>();
+            node_->get_parameter_or("service_groups." + item.first + "_limit", group->limit, item.second);
+            group->reject = reject_when_full;
+            group->running = 0;
+            if (group->limit > 1 && !group->reject) {
+                RCLCPP_WARN(node_->get_logger(), "service_groups: %s_limit %d is only enforced with reject_when_full, the group is unlimited",
+                    item.first.c_str(), group->limit);
+            }
+            group->callback_group = node_->create_callback_group(
+                group->limit == 1 ? rclcpp::CallbackGroupType::MutuallyExclusive : rclcpp::CallbackGroupType::Reentrant);
+            service_groups_[item.first] = group;
+        }
+        RCLCPP_INFO(node_->get_logger(), "service_groups: motion_limit: %d, io_limit: %d, gripper_limit: %d, query_limit: %d, reject_when_full: %d",
+            service_groups_["motion"]->limit, service_groups_["io"]->limit, service_groups_["gripper"]->limit, service_groups_["query"]->limit, reject_when_full);
+    }
+
+    std::shared_ptr<XArmDriver::ServiceGroup> XArmDriver::_get_service_group(const std::string &service_name)
+    {
+        // services which block until the arm stops when called with wait
+        static const std::vector<std::string> motion_services = {
+            "set_position", "set_tool_position", "set_position_aa", "set_servo_cartesian", "set_servo_cartesian_aa",
+            "set_servo_angle", "set_servo_angle_j", "move_circle", "move_gohome", "vc_set_joint_velocity", "vc_set_cartesian_velocity",
+            "playback_trajectory", "iden_tcp_load", "ft_sensor_iden_load"
+        };
+        auto contains = [&service_name](const std::string &key) { return service_name.find(key) != std::string::npos; };
+        if (std::find(motion_services.begin(), motion_services.end(), service_name) != motion_services.end())
+            return service_groups_["motion"];
+        // the end effectors and the linear track share the modbus (rs485) of the tool or the controller
+        if (contains("gripper") || contains("robotiq") || contains("modbus") || contains("baud") || contains("linear_track"))
+            return service_groups_["gripper"];
+        if (contains("gpio"))
+            return service_groups_["io"];
+        // getters and the other short requests, e.g. set_state can stop a motion which is being waited for
+        return service_groups_["query"];
+    }
+
+    bool XArmDriver::_enter_service_group(const std::shared_ptr<ServiceGroup> &group)
+    {
+        // never wait for a slot here, a waiting callback would hold an executor thread which the other groups need
+        std::lock_guard<std::mutex> locker(group->mutex);
+        if (group->reject && group->limit > 1 && group->running >= group->limit) return false;
+        group->running++;
+        return true;
+    }
+
+    void XArmDriver::_leave_service_group(const std::shared_ptr<ServiceGroup> &group)
+    {
+        std::lock_guard<std::mutex> locker(group->mutex);
+        group->running--;
+    }
+
     template<typename ServiceT, typename CallbackT>
     typename rclcpp::Service<ServiceT>::SharedPtr XArmDriver::_create_service(const std::string & service_name, CallbackT && callback)
     {
         bool enable;
         node_->get_parameter_or("services." + service_name, enable, false);
         if (service_debug_ || enable) {
-            auto service = hw_node_->create_service<ServiceT>(service_name, BIND_CLS_CB(callback));
+            std::shared_ptr<ServiceGroup> group = _get_service_group(service_name);
+            auto cb = BIND_CLS_CB(callback);
+            auto service = hw_node_->create_service<ServiceT>(service_name, 
+                [this, group, cb](const std::shared_ptr<typename ServiceT::Request> req, std::shared_ptr<typename ServiceT::Response> res) {
+                    ServiceGroupGuard guard(this, group);
+                    if (!guard.entered()) {
+                        res->ret = SERVICE_IS_BUSY;
+                        res->message = "service is busy, too many concurrent calls";
+                        return;
+                    }
+                    cb(req, res);
+                }, rmw_qos_profile_services_default, group->callback_group);
             RCLCPP_DEBUG(node_->get_logger(), "create_service: %s", service->get_service_name());
             return service;
         }
@@ -27,6 +98,7 @@ namespace xarm_api
     void XArmDriver::_init_service(void)
     {
         node_->get_parameter_or("services.debug", service_debug_, false);
+        _init_service_groups();
 
         // Call
         service_clean_error_ = _create_service<xarm_msgs::srv::Call>("clean_error", &XArmDriver::_clean_error);
@@ -291,6 +363,8 @@ namespace xarm_api
     bool XArmDriver::_clean_gripper_error(const std::shared_ptr<xarm_msgs::srv::Call::Request> req, std::shared_ptr<xarm_msgs::srv::Call::Response> res)
     {
         res->ret = arm->clean_gripper_error();
+        // the gripper action sets the gripper up again before its next goal
+        gripper_ready_ = false;
         return true;
     }
 
@@ -350,14 +424,26 @@ namespace xarm_api
 
     bool XArmDriver::_get_state(const std::shared_ptr<xarm_msgs::srv::GetInt16::Request> req, std::shared_ptr<xarm_msgs::srv::GetInt16::Response> res)
     {
-        res->ret = arm->get_state((int *)&res->data);
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, req->max_age)) {
+            res->ret = 0;
+            res->data = snapshot.state;
+        }
+        else
+            res->ret = arm->get_state((int *)&res->data);
         res->message = "data=" + std::to_string(res->data);
         return true;
     }
     
     bool XArmDriver::_get_cmdnum(const std::shared_ptr<xarm_msgs::srv::GetInt16::Request> req, std::shared_ptr<xarm_msgs::srv::GetInt16::Response> res)
     {
-        res->ret = arm->get_cmdnum((int *)&res->data);
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, req->max_age)) {
+            res->ret = 0;
+            res->data = snapshot.cmdnum;
+        }
+        else
+            res->ret = arm->get_cmdnum((int *)&res->data);
         res->message = "data=" + std::to_string(res->data);
         return true; 
     }
@@ -470,7 +556,14 @@ namespace xarm_api
     bool XArmDriver::_get_err_warn_code(const std::shared_ptr<xarm_msgs::srv::GetInt16List::Request> req, std::shared_ptr<xarm_msgs::srv::GetInt16List::Response> res)
     {
         int err_warn[2];
-        res->ret = arm->get_err_warn_code(err_warn);
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, req->max_age, true)) {
+            res->ret = 0;
+            err_warn[0] = snapshot.err;
+            err_warn[1] = snapshot.war;
+        }
+        else
+            res->ret = arm->get_err_warn_code(err_warn);
         res->datas.resize(2);
         res->datas[0] = err_warn[0];
         res->datas[1]= err_warn[1];
@@ -523,12 +616,14 @@ namespace xarm_api
     {
         res->ret = arm->set_gripper_mode(req->data);
         res->message = "data=" + std::to_string(req->data);
+        gripper_ready_ = false;
         return true; 
     }
     bool XArmDriver::_set_gripper_enable(const std::shared_ptr<xarm_msgs::srv::SetInt16::Request> req, std::shared_ptr<xarm_msgs::srv::SetInt16::Response> res)
     {
         res->ret = arm->set_gripper_enable(req->data);
         res->message = "data=" + std::to_string(req->data);
+        gripper_ready_ = false;
         return true; 
     }
 
@@ -736,7 +831,13 @@ namespace xarm_api
     bool XArmDriver::_get_position(const std::shared_ptr<xarm_msgs::srv::GetFloat32List::Request> req, std::shared_ptr<xarm_msgs::srv::GetFloat32List::Response> res)
     {
         res->datas.resize(6);
-        res->ret = arm->get_position(&res->datas[0]);
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, req->max_age)) {
+            res->ret = 0;
+            res->datas.assign(snapshot.pose, snapshot.pose + 6);
+        }
+        else
+            res->ret = arm->get_position(&res->datas[0]);
         std::string tmp = "";
         for (int i = 0; i < res->datas.size(); i++) {
             tmp += (i == 0 ? "" : ", ") + std::to_string(res->datas[i]);
@@ -748,7 +849,13 @@ namespace xarm_api
     bool XArmDriver::_get_servo_angle(const std::shared_ptr<xarm_msgs::srv::GetFloat32List::Request> req, std::shared_ptr<xarm_msgs::srv::GetFloat32List::Response> res)
     {
         res->datas.resize(7);
-        res->ret = arm->get_servo_angle(&res->datas[0]);
+        ReportSnapshot snapshot;
+        if (_get_report_snapshot(snapshot, req->max_age)) {
+            res->ret = 0;
+            res->datas.assign(snapshot.angle, snapshot.angle + 7);
+        }
+        else
+            res->ret = arm->get_servo_angle(&res->datas[0]);
         std::string tmp = "";
         for (int i = 0; i < res->datas.size(); i++) {
             tmp += (i == 0 ? "" : ", ") + std::to_string(res->datas[i]);
@@ -820,6 +927,7 @@ namespace xarm_api
     {
         res->ret = arm->set_gripper_speed(req->data);
         res->message = "data=" + std::to_string(req->data);
+        gripper_ready_ = false;
         return true;  
     }
 
@@ -0,0 +1,104 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+#include <algorithm>
+#include "xarm_api/xarm_driver.h"
+
+#define PARAM_ERROR 997
+
+namespace xarm_api
+{
+    rclcpp::Subscription<xarm_msgs::msg::ServoCommand>::SharedPtr XArmDriver::_create_servo_subscription(const std::string &topic,
+        std::function<int(const xarm_msgs::msg::ServoCommand &cmd)> forward)
+    {
+        bool reliable;
+        int depth;
+        node_->get_parameter_or("servo_stream.reliable", reliable, false);
+        node_->get_parameter_or("servo_stream.depth", depth, 1);
+        rclcpp::QoS qos(rclcpp::KeepLast(depth < 1 ? 1 : depth));
+        if (reliable) qos.reliable();
+        else qos.best_effort();
+
+        std::shared_ptr<ServoStreamStats> stats = std::make_shared<ServoStreamStats>();
+        stats->received = 0;
+        stats->forwarded = 0;
+        stats->stale = 0;
+        stats->rate_limited = 0;
+        stats->failed = 0;
+        servo_stream_stats_[topic] = stats;
+
+        rclcpp::SubscriptionOptions options;
+        options.callback_group = servo_callback_group_;
+        return hw_node_->create_subscription<xarm_msgs::msg::ServoCommand>(topic, qos,
+            [this, stats, forward](const xarm_msgs::msg::ServoCommand::SharedPtr msg) {
+                stats->received++;
+                if (servo_max_age_ > 0 && (msg->header.stamp.sec != 0 || msg->header.stamp.nanosec != 0)
+                    && (node_->get_clock()->now() - rclcpp::Time(msg->header.stamp)).seconds() > servo_max_age_) {
+                    stats->stale++;
+                    return;
+                }
+                auto now = std::chrono::steady_clock::now();
+                if (servo_min_interval_ > 0 && std::chrono::duration<double>(now - stats->last_forward).count() < servo_min_interval_) {
+                    stats->rate_limited++;
+                    return;
+                }
+                stats->last_forward = now;
+                if (forward(*msg) == 0) stats->forwarded++;
+                else stats->failed++;
+            }, options);
+    }
+
+    void XArmDriver::_init_servo_stream(void)
+    {
+        bool enable;
+        double max_rate;
+        double stats_period;
+        node_->get_parameter_or("servo_stream.enable", enable, false);
+        node_->get_parameter_or("servo_stream.max_age", servo_max_age_, 0.05);
+        node_->get_parameter_or("servo_stream.max_rate", max_rate, 0.0);
+        node_->get_parameter_or("servo_stream.stats_period", stats_period, 0.0);
+        servo_min_interval_ = max_rate > 0 ? 1.0 / max_rate : 0;
+        RCLCPP_INFO(node_->get_logger(), "servo_stream: enable: %d, max_age: %f, max_rate: %f, stats_period: %f",
+            enable, servo_max_age_, max_rate, stats_period);
+        if (!enable) return;
+
+        // the samples are forwarded one at a time in the order they arrive, apart from the services
+        servo_callback_group_ = node_->create_callback_group(rclcpp::CallbackGroupType::MutuallyExclusive);
+        servo_angle_j_sub_ = _create_servo_subscription("servo_angle_j_command", [this](const xarm_msgs::msg::ServoCommand &cmd) {
+            if (cmd.target.size() < dof_) return PARAM_ERROR;
+            float angles[7] = { 0 };
+            for (int i = 0; i < std::min((int)cmd.target.size(), 7); i++) {
+                angles[i] = cmd.target[i];
+            }
+            return arm->set_servo_angle_j(angles, cmd.speed, cmd.acc, cmd.mvtime);
+        });
+        servo_cartesian_sub_ = _create_servo_subscription("servo_cartesian_command", [this](const xarm_msgs::msg::ServoCommand &cmd) {
+            if (cmd.target.size() < 6) return PARAM_ERROR;
+            float pose[6];
+            std::copy(cmd.target.begin(), cmd.target.begin() + 6, pose);
+            return arm->set_servo_cartesian(pose, cmd.speed, cmd.acc, cmd.mvtime, cmd.is_tool_coord);
+        });
+        servo_cartesian_aa_sub_ = _create_servo_subscription("servo_cartesian_aa_command", [this](const xarm_msgs::msg::ServoCommand &cmd) {
+            if (cmd.target.size() < 6) return PARAM_ERROR;
+            float pose[6];
+            std::copy(cmd.target.begin(), cmd.target.begin() + 6, pose);
+            return arm->set_servo_cartesian_aa(pose, cmd.speed, cmd.acc, cmd.is_tool_coord, cmd.relative);
+        });
+        if (stats_period > 0) {
+            servo_stats_timer_ = node_->create_wall_timer(std::chrono::duration<double>(stats_period),
+                std::bind(&XArmDriver::_log_servo_stream_stats, this), servo_callback_group_);
+        }
+    }
+
+    void XArmDriver::_log_servo_stream_stats(void)
+    {
+        for (auto &item : servo_stream_stats_) {
+            if (item.second->received == 0) continue;
+            RCLCPP_INFO(node_->get_logger(), "[%s] received: %ld, forwarded: %ld, stale: %ld, rate_limited: %ld, failed: %ld", item.first.c_str(),
+                item.second->received.load(), item.second->forwarded.load(), item.second->stale.load(), item.second->rate_limited.load(), item.second->failed.load());
+        }
+    }
+}
@@ -0,0 +1,68 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+/**
+ * The motion action goals and move_waypoints only finish from reports received after their last send,
+ * and are aborted once no such report arrives within motion_action.report_timeout.
+ * run with: colcon test --packages-select xarm_api
+ */
+
+#include <gtest/gtest.h>
+#include <chrono>
+#include "xarm_api/xarm_report_watchdog.h"
+
+using xarm_api::ReportWatchdog;
+
+static ReportWatchdog::TimePoint at(double sec)
+{
+    static const ReportWatchdog::TimePoint base = std::chrono::steady_clock::now();
+    return base + std::chrono::duration_cast<std::chrono::steady_clock::duration>(std::chrono::duration<double>(sec));
+}
+
+TEST(ReportWatchdogTest, expires_without_any_report)
+{
+    // the report socket is down, the snapshot stays at seq 0
+    ReportWatchdog watchdog;
+    watchdog.start(1.0, at(0));
+    EXPECT_FALSE(watchdog.fresh(0, ReportWatchdog::TimePoint(), at(0), at(0.5)));
+    EXPECT_FALSE(watchdog.expired(at(0.5)));
+    EXPECT_FALSE(watchdog.fresh(0, ReportWatchdog::TimePoint(), at(0), at(1.5)));
+    EXPECT_TRUE(watchdog.expired(at(1.5)));
+}
+
+TEST(ReportWatchdogTest, expires_when_reports_stop)
+{
+    ReportWatchdog watchdog;
+    watchdog.start(1.0, at(0));
+    EXPECT_TRUE(watchdog.fresh(1, at(0.01), at(0), at(0.01)));
+    EXPECT_TRUE(watchdog.fresh(2, at(0.8), at(0), at(0.8)));
+    // the last report is taken again and again
+    EXPECT_FALSE(watchdog.fresh(2, at(0.8), at(0), at(1.5)));
+    EXPECT_FALSE(watchdog.expired(at(1.5)));
+    EXPECT_FALSE(watchdog.fresh(2, at(0.8), at(0), at(1.9)));
+    EXPECT_TRUE(watchdog.expired(at(1.9)));
+}
+
+TEST(ReportWatchdogTest, reports_older_than_the_send_are_not_fresh)
+{
+    // the reports keep coming but were all taken before the last send
+    ReportWatchdog watchdog;
+    watchdog.start(1.0, at(0));
+    EXPECT_TRUE(watchdog.fresh(1, at(0.1), at(0), at(0.1)));
+    EXPECT_FALSE(watchdog.fresh(2, at(0.15), at(0.2), at(0.3)));
+    EXPECT_FALSE(watchdog.expired(at(1.0)));
+    EXPECT_TRUE(watchdog.expired(at(1.2)));
+    EXPECT_TRUE(watchdog.fresh(3, at(1.25), at(0.2), at(1.25)));
+    EXPECT_FALSE(watchdog.expired(at(1.3)));
+}
+
+TEST(ReportWatchdogTest, zero_timeout_waits_forever)
+{
+    ReportWatchdog watchdog;
+    watchdog.start(0, at(0));
+    EXPECT_FALSE(watchdog.expired(at(3600)));
+}
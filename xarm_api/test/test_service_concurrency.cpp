@@ -0,0 +1,177 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+/*
+ * Stress test of the service groups of xarm_driver_node: get_state/get_servo_angle are called in a loop
+ * while set_servo_angle (wait=true) moves joint1 slowly there and back, and the query latency during the
+ * motion is compared with the latency at rest. Run it against a robot in a free workspace or the controller
+ * box emulator (xarm_api/scripts/xarm_controller_box_emulator.py), get_state has to be enabled in xarm_user_params.yaml:
+ *   ros2 run xarm_api test_service_concurrency --ros-args -p hw_ns:=xarm -p max_latency:=0.1
+ * Exits with 1 if no query finished during the motion or the worst query took longer than max_latency.
+ */
+
+#include <signal.h>
+#include <chrono>
+#include <thread>
+#include <algorithm>
+#include <rclcpp/rclcpp.hpp>
+#include "xarm_api/xarm_msgs.h"
+
+
+void exit_sig_handler(int signum)
+{
+    fprintf(stderr, "[test_service_concurrency] Ctrl-C caught, exit process...\n");
+    exit(-1);
+}
+
+template<typename ServiceT>
+int call_service(const typename rclcpp::Client<ServiceT>::SharedPtr &client, const typename ServiceT::Request::SharedPtr &req,
+    typename ServiceT::Response::SharedPtr &res, double timeout = 10)
+{
+    auto future = client->async_send_request(req);
+    if (future.wait_for(std::chrono::duration<double>(timeout)) != std::future_status::ready) {
+        RCLCPP_ERROR(rclcpp::get_logger("test_service_concurrency"), "call %s timeout", client->get_service_name());
+        return -1;
+    }
+    res = future.get();
+    return res->ret;
+}
+
+struct LatencyStats
+{
+    std::vector<double> latencies;
+
+    void add(double latency) { latencies.push_back(latency); }
+    double percentile(double p)
+    {
+        if (latencies.empty()) return 0;
+        std::vector<double> sorted = latencies;
+        std::sort(sorted.begin(), sorted.end());
+        return sorted[std::min(sorted.size() - 1, (size_t)(p * sorted.size()))];
+    }
+    void log(const std::string &name)
+    {
+        RCLCPP_INFO(rclcpp::get_logger("test_service_concurrency"), "%s: calls=%d, p50=%.3fms, p99=%.3fms, max=%.3fms",
+            name.c_str(), (int)latencies.size(), percentile(0.5) * 1000, percentile(0.99) * 1000, percentile(1.0) * 1000);
+    }
+};
+
+int main(int argc, char **argv)
+{
+    rclcpp::init(argc, argv);
+    signal(SIGINT, exit_sig_handler);
+    rclcpp::NodeOptions node_options;
+    node_options.automatically_declare_parameters_from_overrides(true);
+    std::shared_ptr<rclcpp::Node> node = rclcpp::Node::make_shared("test_service_concurrency", node_options);
+
+    std::string hw_ns = "xarm";
+    double max_latency = 0.1;  // seconds
+    double distance = 0.5;  // rad, joint1 moves there and back
+    double speed = 0.2;  // rad/s
+    int baseline_calls = 100;
+    node->get_parameter_or("hw_ns", hw_ns, hw_ns);
+    node->get_parameter_or("max_latency", max_latency, max_latency);
+    node->get_parameter_or("distance", distance, distance);
+    node->get_parameter_or("speed", speed, speed);
+    node->get_parameter_or("baseline_calls", baseline_calls, baseline_calls);
+
+    // the responses are handled on a separate thread, the main thread waits on the futures
+    std::thread spin_thread([node]() { rclcpp::spin(node); });
+
+    auto motion_enable_client = node->create_client<xarm_msgs::srv::SetInt16ById>(hw_ns + "/motion_enable");
+    auto set_mode_client = node->create_client<xarm_msgs::srv::SetInt16>(hw_ns + "/set_mode");
+    auto set_state_client = node->create_client<xarm_msgs::srv::SetInt16>(hw_ns + "/set_state");
+    auto get_state_client = node->create_client<xarm_msgs::srv::GetInt16>(hw_ns + "/get_state");
+    auto get_servo_angle_client = node->create_client<xarm_msgs::srv::GetFloat32List>(hw_ns + "/get_servo_angle");
+    auto set_servo_angle_client = node->create_client<xarm_msgs::srv::MoveJoint>(hw_ns + "/set_servo_angle");
+    for (auto client : std::vector<rclcpp::ClientBase::SharedPtr>({ motion_enable_client, set_mode_client, set_state_client, get_state_client, get_servo_angle_client, set_servo_angle_client })) {
+        if (!client->wait_for_service(std::chrono::seconds(10))) {
+            RCLCPP_ERROR(node->get_logger(), "service %s is not available", client->get_service_name());
+            rclcpp::shutdown();
+            spin_thread.join();
+            return 1;
+        }
+    }
+
+    auto enable_req = std::make_shared<xarm_msgs::srv::SetInt16ById::Request>();
+    auto enable_res = std::make_shared<xarm_msgs::srv::SetInt16ById::Response>();
+    auto set_int16_req = std::make_shared<xarm_msgs::srv::SetInt16::Request>();
+    auto set_int16_res = std::make_shared<xarm_msgs::srv::SetInt16::Response>();
+    auto get_state_req = std::make_shared<xarm_msgs::srv::GetInt16::Request>();
+    auto get_state_res = std::make_shared<xarm_msgs::srv::GetInt16::Response>();
+    auto get_angle_req = std::make_shared<xarm_msgs::srv::GetFloat32List::Request>();
+    auto get_angle_res = std::make_shared<xarm_msgs::srv::GetFloat32List::Response>();
+    // always query the controller, the cached getters would hide a blocked service layer
+    get_state_req->max_age = -1;
+    get_angle_req->max_age = -1;
+
+    enable_req->id = 8;
+    enable_req->data = 1;
+    call_service<xarm_msgs::srv::SetInt16ById>(motion_enable_client, enable_req, enable_res);
+    set_int16_req->data = 0;
+    call_service<xarm_msgs::srv::SetInt16>(set_mode_client, set_int16_req, set_int16_res);
+    call_service<xarm_msgs::srv::SetInt16>(set_state_client, set_int16_req, set_int16_res);
+    if (call_service<xarm_msgs::srv::GetFloat32List>(get_servo_angle_client, get_angle_req, get_angle_res) != 0) {
+        RCLCPP_ERROR(node->get_logger(), "get_servo_angle failed");
+        rclcpp::shutdown();
+        spin_thread.join();
+        return 1;
+    }
+    std::vector<float> start_angles = get_angle_res->datas;
+
+    auto query = [&](LatencyStats &stats, bool state) {
+        auto start = std::chrono::steady_clock::now();
+        if (state)
+            call_service<xarm_msgs::srv::GetInt16>(get_state_client, get_state_req, get_state_res);
+        else
+            call_service<xarm_msgs::srv::GetFloat32List>(get_servo_angle_client, get_angle_req, get_angle_res);
+        stats.add(std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count());
+    };
+
+    LatencyStats baseline;
+    for (int i = 0; i < baseline_calls; i++) {
+        query(baseline, i % 2 == 0);
+    }
+
+    LatencyStats during_motion;
+    int motion_ret = 0;
+    double motion_time = 0;
+    for (int i = 0; i < 2; i++) {
+        auto move_req = std::make_shared<xarm_msgs::srv::MoveJoint::Request>();
+        move_req->angles = start_angles;
+        move_req->angles[0] += (i == 0 ? distance : 0);
+        move_req->speed = speed;
+        move_req->acc = 10;
+        move_req->wait = true;
+        auto start = std::chrono::steady_clock::now();
+        auto future = set_servo_angle_client->async_send_request(move_req);
+        int calls = 0;
+        while (future.wait_for(std::chrono::seconds(0)) != std::future_status::ready) {
+            if (std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count() > distance / speed * 3 + 10) {
+                RCLCPP_ERROR(node->get_logger(), "set_servo_angle timeout");
+                break;
+            }
+            query(during_motion, calls++ % 2 == 0);
+        }
+        motion_time += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+        if (future.wait_for(std::chrono::seconds(0)) == std::future_status::ready)
+            motion_ret = motion_ret ? motion_ret : future.get()->ret;
+        else
+            motion_ret = -1;
+    }
+
+    baseline.log("at rest");
+    during_motion.log("during motion");
+    RCLCPP_INFO(node->get_logger(), "set_servo_angle: ret=%d, time=%.3fs", motion_ret, motion_time);
+
+    bool ok = motion_ret == 0 && !during_motion.latencies.empty() && during_motion.percentile(1.0) <= max_latency;
+    RCLCPP_INFO(node->get_logger(), "test_service_concurrency %s", ok ? "passed" : "failed");
+
+    rclcpp::shutdown();
+    spin_thread.join();
+    return ok ? 0 : 1;
+}
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2021, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+from launch import LaunchDescription
+from launch.actions import OpaqueFunction, IncludeLaunchDescription, RegisterEventHandler, Shutdown
+from launch.event_handlers import OnProcessExit
+from launch.launch_description_sources import PythonLaunchDescriptionSource
+from launch.substitutions import LaunchConfiguration, PathJoinSubstitution
+from launch_ros.actions import Node
+from launch_ros.substitutions import FindPackageShare
+
+
+def launch_setup(context, *args, **kwargs):
+    # path: servo_angle_j (xarm_driver), traj (ros2_control) or servo_twist (moveit_servo)
+    path = LaunchConfiguration('path', default='traj').perform(context)
+    # empty robot_ip uses the fake hardware, 127.0.0.1 the controller box emulator of xarm_api
+    robot_ip = LaunchConfiguration('robot_ip', default='').perform(context)
+    robot_ip_2 = LaunchConfiguration('robot_ip_2', default='127.0.0.2').perform(context)
+    dual = LaunchConfiguration('dual', default=False).perform(context) in ('True', 'true')
+    report_type = LaunchConfiguration('report_type', default='normal').perform(context)
+    dof = LaunchConfiguration('dof', default=7).perform(context)
+    robot_type = LaunchConfiguration('robot_type', default='xarm').perform(context)
+    hw_ns = LaunchConfiguration('hw_ns', default='xarm').perform(context).strip('/')
+    samples = int(LaunchConfiguration('samples', default=200).perform(context))
+    rate = float(LaunchConfiguration('rate', default=5.0).perform(context))
+    output = LaunchConfiguration('output', default='').perform(context)
+    label = LaunchConfiguration('label', default='').perform(context)
+
+    scenario = '{}_{}_{}'.format(path, 'dual' if dual else 'single', report_type if robot_ip else 'fake')
+    ros2_control_plugin = 'uf_robot_hardware/UFRobotSystemHardware' if robot_ip else 'uf_robot_hardware/UFRobotFakeSystemHardware'
+    prefixes = ['L_', 'R_'] if dual else ['']
+
+    if path == 'servo_angle_j' and not robot_ip:
+        print('servo_angle_j is a service of xarm_driver, it needs robot_ip (e.g. the controller box emulator on 127.0.0.1)')
+        return []
+    if path == 'servo_twist' and dual:
+        print('servo_twist only supports a single arm')
+        return []
+
+    actions = []
+    controllers = []
+    if path == 'servo_angle_j':
+        # xarm_api/launch/_robot_driver.launch.py
+        for prefix, ip in zip(prefixes, [robot_ip, robot_ip_2]):
+            actions.append(IncludeLaunchDescription(
+                PythonLaunchDescriptionSource(PathJoinSubstitution([FindPackageShare('xarm_api'), 'launch', '_robot_driver.launch.py'])),
+                launch_arguments={
+                    'robot_ip': ip,
+                    'report_type': report_type,
+                    'dof': dof,
+                    'robot_type': robot_type,
+                    'hw_ns': hw_ns,
+                    'prefix': prefix,
+                }.items(),
+            ))
+        hw_namespaces = ['/{}{}'.format(prefix, hw_ns) for prefix in prefixes]
+    elif path == 'traj' and dual:
+        # xarm_controller/launch/_dual_ros2_control.launch.py
+        actions.append(IncludeLaunchDescription(
+            PythonLaunchDescriptionSource(PathJoinSubstitution([FindPackageShare('xarm_controller'), 'launch', '_dual_ros2_control.launch.py'])),
+            launch_arguments={
+                'robot_ip_1': robot_ip,
+                'robot_ip_2': robot_ip_2,
+                'report_type': report_type,
+                'dof': dof,
+                'robot_type': robot_type,
+                'hw_ns': hw_ns,
+                'prefix_1': prefixes[0],
+                'prefix_2': prefixes[1],
+                'ros2_control_plugin': ros2_control_plugin,
+            }.items(),
+        ))
+        controllers = ['{}{}{}_traj_controller'.format(prefix, robot_type, dof) for prefix in prefixes]
+        # the fake hardware publishes on /joint_states, the real hardware on <prefix><hw_ns>/joint_states
+        hw_namespaces = ['/{}{}'.format(prefix, hw_ns) if robot_ip else '' for prefix in prefixes]
+    elif path == 'traj':
+        # xarm_controller/launch/_ros2_control.launch.py
+        actions.append(IncludeLaunchDescription(
+            PythonLaunchDescriptionSource(PathJoinSubstitution([FindPackageShare('xarm_controller'), 'launch', '_ros2_control.launch.py'])),
+            launch_arguments={
+                'robot_ip': robot_ip,
+                'report_type': report_type,
+                'dof': dof,
+                'robot_type': robot_type,
+                'hw_ns': hw_ns,
+                'ros2_control_plugin': ros2_control_plugin,
+            }.items(),
+        ))
+        controllers = ['{}{}_traj_controller'.format(robot_type, dof)]
+        hw_namespaces = ['/{}'.format(hw_ns) if robot_ip else '']
+    else:
+        # xarm_moveit_servo/launch/_robot_moveit_servo.launch.py, spawns its own controllers
+        actions.append(IncludeLaunchDescription(
+            PythonLaunchDescriptionSource(PathJoinSubstitution([FindPackageShare('xarm_moveit_servo'), 'launch', '_robot_moveit_servo.launch.py'])),
+            launch_arguments={
+                'robot_ip': robot_ip,
+                'report_type': report_type,
+                'dof': dof,
+                'robot_type': robot_type,
+                'hw_ns': hw_ns,
+                'ros2_control_plugin': ros2_control_plugin,
+            }.items(),
+        ))
+        hw_namespaces = ['/{}'.format(hw_ns) if robot_ip else '']
+
+    for controller in controllers:
+        actions.append(Node(
+            package='controller_manager',
+            executable='spawner.py',
+            output='screen',
+            arguments=[
+                controller,
+                '--controller-manager', '{}/controller_manager'.format(LaunchConfiguration('ros_namespace', default='').perform(context))
+            ],
+        ))
+
+    benchmark_node = Node(
+        package='xarm_benchmark',
+        executable='latency_benchmark',
+        output='screen',
+        parameters=[{
+            'path': path,
+            'robot_type': robot_type,
+            'dof': int(dof),
+            'samples': samples,
+            'rate': rate,
+            # 'none' stands for the empty prefix
+            'prefixes': [prefix or 'none' for prefix in prefixes],
+            'hw_namespaces': hw_namespaces,
+            'output': output,
+            'label': label,
+            'scenario': scenario,
+            'report_type': report_type if robot_ip else 'fake',
+        }],
+    )
+    actions.append(benchmark_node)
+    # the launch ends with the benchmark
+    actions.append(RegisterEventHandler(OnProcessExit(target_action=benchmark_node, on_exit=[Shutdown()])))
+    return actions
+
+
+def generate_launch_description():
+    return LaunchDescription([
+        OpaqueFunction(function=launch_setup)
+    ])
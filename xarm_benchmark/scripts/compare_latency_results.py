@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2021, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Compare two latency benchmark results (json files or directories written by run_latency_suite.py).
+Exits with 1 if a p50/p99 latency grew, or the throughput dropped, by more than --threshold.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+def load_results(path):
+    files = [path] if os.path.isfile(path) else [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.json') and name != 'summary.json']
+    results = {}
+    for file in files:
+        with open(file, 'r') as f:
+            data = json.load(f)
+        for arm in data.get('arms', []):
+            results[(data['scenario'], arm['prefix'])] = arm
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two xarm latency benchmark results.')
+    parser.add_argument('base', help='result file or directory of the reference commit')
+    parser.add_argument('new', help='result file or directory to check')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression, default is 0.2 (20%%)')
+    parser.add_argument('--min-delta', type=float, default=1.0, help='ms, latency changes below this are never regressions')
+    args = parser.parse_args()
+
+    base = load_results(args.base)
+    new = load_results(args.new)
+    regressions = []
+    print('{:<32} {:<4} {:<12} {:>10} {:>10} {:>10} {:>10}'.format('scenario', 'arm', 'hop', 'p50 base', 'p50 new', 'p99 base', 'p99 new'))
+    for key in sorted(set(base) & set(new)):
+        scenario, prefix = key
+        for hop, new_stats in sorted(new[key]['hops'].items()):
+            base_stats = base[key]['hops'].get(hop)
+            if base_stats is None:
+                continue
+            print('{:<32} {:<4} {:<12} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                scenario, prefix, hop, base_stats['p50_ms'], new_stats['p50_ms'], base_stats['p99_ms'], new_stats['p99_ms']))
+            for metric in ('p50_ms', 'p99_ms'):
+                delta = new_stats[metric] - base_stats[metric]
+                if delta > args.min_delta and delta > base_stats[metric] * args.threshold:
+                    regressions.append('{} {} {} {}: {:.3f} -> {:.3f}'.format(scenario, prefix, hop, metric, base_stats[metric], new_stats[metric]))
+        base_throughput = base[key]['throughput_hz']
+        new_throughput = new[key]['throughput_hz']
+        if new_throughput < base_throughput * (1 - args.threshold):
+            regressions.append('{} {} throughput_hz: {:.3f} -> {:.3f}'.format(scenario, prefix, base_throughput, new_throughput))
+        if new[key]['timeouts'] + new[key]['failed'] > base[key]['timeouts'] + base[key]['failed']:
+            regressions.append('{} {} timeouts/failed: {} -> {}'.format(
+                scenario, prefix, base[key]['timeouts'] + base[key]['failed'], new[key]['timeouts'] + new[key]['failed']))
+    for key in sorted(set(base) ^ set(new)):
+        print('only in {}: {} {}'.format('base' if key in base else 'new', *key))
+
+    if regressions:
+        print('\n{} regressions:'.format(len(regressions)))
+        for item in regressions:
+            print('  {}'.format(item))
+    else:
+        print('\nno regressions')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
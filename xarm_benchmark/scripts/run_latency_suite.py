@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2021, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Run the latency benchmark scenarios one after another and collect their json results in one directory.
+
+Scenarios:
+    fake hardware: traj single/dual, servo_twist single
+    controller box emulator, for every report_type: servo_angle_j single/dual, traj single/dual
+The emulators (127.0.0.1 and 127.0.0.2) are started by this script and need root for port 502,
+use --no-emulator to skip those scenarios. Compare two result directories with compare_latency_results.py.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+EMULATOR_HOSTS = ['127.0.0.1', '127.0.0.2']
+
+
+def get_label():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return time.strftime('%Y%m%d-%H%M%S')
+
+
+def get_scenarios(args):
+    scenarios = []
+    for path in args.paths:
+        for dual in ([False, True] if path != 'servo_twist' else [False]):
+            if not dual or not args.single_only:
+                if path != 'servo_angle_j':
+                    scenarios.append({'path': path, 'dual': dual, 'robot_ip': '', 'report_type': 'normal'})
+                if not args.no_emulator and path != 'servo_twist':
+                    for report_type in args.report_types:
+                        scenarios.append({'path': path, 'dual': dual, 'robot_ip': EMULATOR_HOSTS[0], 'report_type': report_type})
+    return scenarios
+
+
+def start_emulators(args):
+    emulator = os.path.join(subprocess.check_output(['ros2', 'pkg', 'prefix', 'xarm_api']).decode().strip(), 'lib', 'xarm_api', 'xarm_controller_box_emulator.py')
+    procs = []
+    for host in EMULATOR_HOSTS:
+        procs.append(subprocess.Popen([
+            sys.executable, emulator, '--host', host, '--dof', str(args.dof),
+            '--latency', str(args.emulator_latency), '--latency-jitter', str(args.emulator_latency_jitter)
+        ]))
+    time.sleep(1)
+    for proc in procs:
+        if proc.poll() is not None:
+            raise RuntimeError('the controller box emulator exited, port 502 needs root')
+    return procs
+
+
+def run_scenario(scenario, args, output):
+    cmds = [
+        'ros2', 'launch', 'xarm_benchmark', 'latency_benchmark.launch.py',
+        'path:={}'.format(scenario['path']),
+        'dual:={}'.format('true' if scenario['dual'] else 'false'),
+        'robot_ip:={}'.format(scenario['robot_ip']),
+        'robot_ip_2:={}'.format(EMULATOR_HOSTS[1]),
+        'report_type:={}'.format(scenario['report_type']),
+        'dof:={}'.format(args.dof),
+        'samples:={}'.format(args.samples),
+        'rate:={}'.format(args.rate),
+        'output:={}'.format(output),
+        'label:={}'.format(args.label),
+    ]
+    try:
+        ret = subprocess.call(cmds, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        ret = 'timeout'
+    return ret == 0 and os.path.exists(output), ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the xarm latency benchmark scenarios.')
+    parser.add_argument('--output-dir', default='', help='directory of the results, default is ~/.ros/xarm_benchmark/<label>')
+    parser.add_argument('--label', default='', help='label of the results, default is the git commit of the current directory')
+    parser.add_argument('--paths', nargs='+', default=['servo_angle_j', 'traj', 'servo_twist'])
+    parser.add_argument('--report-types', nargs='+', default=['normal', 'rich', 'dev'])
+    parser.add_argument('--dof', type=int, default=7)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=5.0, help='samples per second')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds, timeout of one scenario')
+    parser.add_argument('--single-only', action='store_true', help='skip the dual-arm scenarios')
+    parser.add_argument('--no-emulator', action='store_true', help='only run the fake hardware scenarios')
+    parser.add_argument('--emulator-latency', type=float, default=0.0, help='ms')
+    parser.add_argument('--emulator-latency-jitter', type=float, default=0.0, help='ms')
+    args = parser.parse_args()
+
+    args.label = args.label or get_label()
+    output_dir = args.output_dir or os.path.join(os.path.expanduser('~'), '.ros', 'xarm_benchmark', args.label)
+    os.makedirs(output_dir, exist_ok=True)
+
+    scenarios = get_scenarios(args)
+    emulators = []
+    if any(scenario['robot_ip'] for scenario in scenarios):
+        emulators = start_emulators(args)
+    summary = {'label': args.label, 'scenarios': []}
+    try:
+        for scenario in scenarios:
+            name = '{}_{}_{}'.format(scenario['path'], 'dual' if scenario['dual'] else 'single', scenario['report_type'] if scenario['robot_ip'] else 'fake')
+            output = os.path.join(output_dir, '{}.json'.format(name))
+            print('==== {} ===='.format(name), flush=True)
+            ok, ret = run_scenario(scenario, args, output)
+            summary['scenarios'].append({'scenario': name, 'ok': ok, 'ret': ret, 'result': os.path.basename(output) if ok else ''})
+    finally:
+        for proc in emulators:
+            proc.terminate()
+            proc.wait()
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    failed = [item['scenario'] for item in summary['scenarios'] if not item['ok']]
+    print('results in {}, {} scenarios, {} failed {}'.format(output_dir, len(scenarios), len(failed), failed if failed else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
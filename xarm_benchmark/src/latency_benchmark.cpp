@@ -0,0 +1,478 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+/**
+ * Measures the latency from a command on a ROS interface to the change it causes on joint_states.
+ * Paths (parameter "path"):
+ *   servo_angle_j: call <hw_ns>/set_servo_angle_j of xarm_driver
+ *   traj: send a one-point goal to <prefix><robot_type><dof>_traj_controller/follow_joint_trajectory
+ *   servo_twist: publish TwistStamped to moveit_servo until the joints move
+ * Every sample moves one joint by +-step and timestamps each hop:
+ *   ack: service response / goal accepted (not for servo_twist)
+ *   state_stamp: header.stamp of the first joint_states showing the change
+ *   state_recv: reception of that joint_states message
+ *   reached: reception of the first joint_states within reach_tolerance of the target (not for servo_twist)
+ *   result: action result (traj only)
+ * All arms listed in "prefixes" are measured at the same time, the results are written as json to "output".
+ */
+
+#include <cmath>
+#include <mutex>
+#include <thread>
+#include <chrono>
+#include <algorithm>
+#include <condition_variable>
+#include <map>
+#include <rclcpp/rclcpp.hpp>
+#include <rclcpp_action/rclcpp_action.hpp>
+#include <sensor_msgs/msg/joint_state.hpp>
+#include <geometry_msgs/msg/twist_stamped.hpp>
+#include <control_msgs/action/follow_joint_trajectory.hpp>
+#include <xarm_msgs/srv/move_joint.hpp>
+#include <xarm_msgs/srv/set_int16.hpp>
+#include <xarm_msgs/srv/set_int16_by_id.hpp>
+
+static const rclcpp::Logger LOGGER = rclcpp::get_logger("xarm_latency_benchmark");
+static const char *HOPS[] = {"ack", "state_stamp", "state_recv", "reached", "result"};
+
+typedef control_msgs::action::FollowJointTrajectory FollowJointTrajectory;
+
+struct BenchmarkConfig
+{
+    std::string path;
+    std::string robot_type;
+    int dof;
+    int samples;
+    double rate;
+    double step;
+    double change_threshold;
+    double reach_tolerance;
+    double timeout;
+    double traj_duration;
+    double twist_speed;
+    double twist_rate;
+    std::string twist_topic;
+    std::string twist_frame;
+};
+
+class ArmBenchmark
+{
+public:
+    ArmBenchmark(rclcpp::Node::SharedPtr node, const BenchmarkConfig &config, const std::string &prefix, const std::string &hw_ns)
+        : node_(node), config_(config), prefix_(prefix), hw_ns_(hw_ns), joint_index_(-1),
+          have_state_(false), probing_(false), msg_count_(0), joint_states_count_(0), completed_(0), timeouts_(0), failed_(0), elapsed_(0)
+    {
+        for (int i = 0; i < config_.dof; i++) {
+            joint_names_.push_back(prefix_ + "joint" + std::to_string(i + 1));
+        }
+        // move the last joint, the smallest motion of the arm
+        joint_index_ = config_.dof - 1;
+        position_.resize(config_.dof, 0);
+        for (auto hop : HOPS) hops_[hop] = std::vector<double>();
+
+        joint_state_sub_ = node_->create_subscription<sensor_msgs::msg::JointState>(
+            hw_ns_ + "/joint_states", rclcpp::SensorDataQoS(),
+            std::bind(&ArmBenchmark::_joint_states_callback, this, std::placeholders::_1));
+        if (config_.path == "servo_angle_j") {
+            servo_j_client_ = node_->create_client<xarm_msgs::srv::MoveJoint>(hw_ns_ + "/set_servo_angle_j");
+            motion_enable_client_ = node_->create_client<xarm_msgs::srv::SetInt16ById>(hw_ns_ + "/motion_enable");
+            set_mode_client_ = node_->create_client<xarm_msgs::srv::SetInt16>(hw_ns_ + "/set_mode");
+            set_state_client_ = node_->create_client<xarm_msgs::srv::SetInt16>(hw_ns_ + "/set_state");
+        }
+        else if (config_.path == "traj") {
+            std::string controller = prefix_ + config_.robot_type + std::to_string(config_.dof) + "_traj_controller";
+            traj_client_ = rclcpp_action::create_client<FollowJointTrajectory>(node_, controller + "/follow_joint_trajectory");
+        }
+        else if (config_.path == "servo_twist") {
+            twist_pub_ = node_->create_publisher<geometry_msgs::msg::TwistStamped>(config_.twist_topic, 10);
+        }
+    }
+
+    bool prepare(void)
+    {
+        if (!_wait_state(std::chrono::seconds(10))) {
+            RCLCPP_ERROR(LOGGER, "[%s] no joint_states on %s/joint_states", prefix_.c_str(), hw_ns_.c_str());
+            return false;
+        }
+        if (config_.path == "servo_angle_j") {
+            if (!servo_j_client_->wait_for_service(std::chrono::seconds(10))) {
+                RCLCPP_ERROR(LOGGER, "[%s] service %s not available", prefix_.c_str(), servo_j_client_->get_service_name());
+                return false;
+            }
+            auto enable_req = std::make_shared<xarm_msgs::srv::SetInt16ById::Request>();
+            enable_req->id = 8;
+            enable_req->data = 1;
+            auto mode_req = std::make_shared<xarm_msgs::srv::SetInt16::Request>();
+            mode_req->data = 1;
+            auto state_req = std::make_shared<xarm_msgs::srv::SetInt16::Request>();
+            state_req->data = 0;
+            std::chrono::duration<double> timeout(config_.timeout);
+            if (motion_enable_client_->async_send_request(enable_req).wait_for(timeout) != std::future_status::ready
+                || set_mode_client_->async_send_request(mode_req).wait_for(timeout) != std::future_status::ready
+                || set_state_client_->async_send_request(state_req).wait_for(timeout) != std::future_status::ready) {
+                RCLCPP_ERROR(LOGGER, "[%s] enable servo mode failed", prefix_.c_str());
+                return false;
+            }
+            std::this_thread::sleep_for(std::chrono::milliseconds(500));
+        }
+        else if (config_.path == "traj") {
+            if (!traj_client_->wait_for_action_server(std::chrono::seconds(10))) {
+                RCLCPP_ERROR(LOGGER, "[%s] action server not available", prefix_.c_str());
+                return false;
+            }
+        }
+        else if (config_.path != "servo_twist") {
+            RCLCPP_ERROR(LOGGER, "unknown path %s", config_.path.c_str());
+            return false;
+        }
+        return true;
+    }
+
+    void run(void)
+    {
+        double direction = 1;
+        auto period = std::chrono::duration<double>(config_.rate > 0 ? 1.0 / config_.rate : 0.0);
+        auto start = std::chrono::steady_clock::now();
+        unsigned long long start_msg_count = _msg_count();
+        for (int n = 0; n < config_.samples && rclcpp::ok(); n++) {
+            auto sample_start = std::chrono::steady_clock::now();
+            int ret = _sample(direction);
+            direction = -direction;
+            if (ret == 0) completed_ += 1;
+            else if (ret == 1) timeouts_ += 1;
+            else failed_ += 1;
+            std::this_thread::sleep_until(sample_start + std::chrono::duration_cast<std::chrono::steady_clock::duration>(period));
+        }
+        elapsed_ = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+        joint_states_count_ = _msg_count() - start_msg_count;
+    }
+
+    void write_json(FILE *fp)
+    {
+        fprintf(fp, "    {\n");
+        fprintf(fp, "      \"prefix\": \"%s\",\n", prefix_.c_str());
+        fprintf(fp, "      \"hw_ns\": \"%s\",\n", hw_ns_.c_str());
+        fprintf(fp, "      \"completed\": %d,\n", completed_);
+        fprintf(fp, "      \"timeouts\": %d,\n", timeouts_);
+        fprintf(fp, "      \"failed\": %d,\n", failed_);
+        fprintf(fp, "      \"elapsed_s\": %.6f,\n", elapsed_);
+        fprintf(fp, "      \"throughput_hz\": %.3f,\n", elapsed_ > 0 ? completed_ / elapsed_ : 0.0);
+        fprintf(fp, "      \"joint_states_hz\": %.3f,\n", elapsed_ > 0 ? joint_states_count_ / elapsed_ : 0.0);
+        fprintf(fp, "      \"hops\": {");
+        bool first = true;
+        for (auto hop : HOPS) {
+            std::vector<double> &values = hops_[hop];
+            if (values.empty()) continue;
+            std::sort(values.begin(), values.end());
+            double sum = 0;
+            for (double v : values) sum += v;
+            fprintf(fp, "%s\n        \"%s\": {\"count\": %d, \"mean_ms\": %.4f, \"p50_ms\": %.4f, \"p99_ms\": %.4f, \"max_ms\": %.4f}",
+                first ? "" : ",", hop, (int)values.size(), sum / values.size() * 1000,
+                _percentile(values, 50) * 1000, _percentile(values, 99) * 1000, values.back() * 1000);
+            first = false;
+        }
+        fprintf(fp, "\n      }\n    }");
+    }
+
+    void log_summary(void)
+    {
+        RCLCPP_INFO(LOGGER, "[%s] completed=%d, timeouts=%d, failed=%d, %.2f samples/s", prefix_.c_str(), completed_, timeouts_, failed_, elapsed_ > 0 ? completed_ / elapsed_ : 0.0);
+        for (auto hop : HOPS) {
+            std::vector<double> &values = hops_[hop];
+            if (values.empty()) continue;
+            std::sort(values.begin(), values.end());
+            RCLCPP_INFO(LOGGER, "[%s] %-12s p50=%.3fms, p99=%.3fms, max=%.3fms", prefix_.c_str(), hop,
+                _percentile(values, 50) * 1000, _percentile(values, 99) * 1000, values.back() * 1000);
+        }
+    }
+
+private:
+    // returns 0 on success, 1 on timeout, -1 if the command failed
+    int _sample(double direction)
+    {
+        std::vector<double> target;
+        {
+            std::lock_guard<std::mutex> locker(mutex_);
+            target = position_;
+            base_ = position_;
+            target[joint_index_] += direction * config_.step;
+            target_ = target[joint_index_];
+            change_seen_ = false;
+            reached_seen_ = false;
+            change_stamp_ = rclcpp::Time(0, 0, RCL_ROS_TIME);
+            change_recv_ = rclcpp::Time(0, 0, RCL_ROS_TIME);
+            probing_ = config_.path != "servo_twist";
+            check_reached_ = config_.path != "servo_twist";
+            send_time_ = node_->now();
+        }
+        auto timeout = std::chrono::duration<double>(config_.timeout);
+        auto deadline = std::chrono::steady_clock::now() + std::chrono::duration_cast<std::chrono::steady_clock::duration>(timeout);
+        int ret = 0;
+
+        if (config_.path == "servo_angle_j") {
+            auto req = std::make_shared<xarm_msgs::srv::MoveJoint::Request>();
+            for (double v : target) req->angles.push_back((float)v);
+            auto future = servo_j_client_->async_send_request(req);
+            if (future.wait_until(deadline) != std::future_status::ready) ret = 1;
+            else if (future.get()->ret != 0) ret = -1;
+            else _add_hop("ack", node_->now());
+            if (ret == 0) ret = _wait_probe(deadline, true);
+        }
+        else if (config_.path == "traj") {
+            FollowJointTrajectory::Goal goal;
+            goal.trajectory.joint_names = joint_names_;
+            trajectory_msgs::msg::JointTrajectoryPoint point;
+            point.positions = target;
+            point.velocities.resize(target.size(), 0);
+            point.time_from_start = rclcpp::Duration::from_seconds(config_.traj_duration);
+            goal.trajectory.points.push_back(point);
+            auto goal_future = traj_client_->async_send_goal(goal);
+            rclcpp_action::ClientGoalHandle<FollowJointTrajectory>::SharedPtr goal_handle;
+            if (goal_future.wait_until(deadline) != std::future_status::ready) ret = 1;
+            else if (!(goal_handle = goal_future.get())) ret = -1;
+            else _add_hop("ack", node_->now());
+            if (ret == 0) {
+                auto result_future = traj_client_->async_get_result(goal_handle);
+                ret = _wait_probe(deadline, true);
+                if (ret == 0) {
+                    if (result_future.wait_until(deadline) != std::future_status::ready) ret = 1;
+                    else if (result_future.get().code != rclcpp_action::ResultCode::SUCCEEDED) ret = -1;
+                    else _add_hop("result", node_->now());
+                }
+            }
+        }
+        else {
+            // moveit_servo needs a continuous command stream, publish until the joints move, then stop them
+            auto interval = std::chrono::duration<double>(1.0 / std::max(config_.twist_rate, 1.0));
+            geometry_msgs::msg::TwistStamped twist;
+            twist.header.frame_id = config_.twist_frame;
+            {
+                std::lock_guard<std::mutex> locker(mutex_);
+                probing_ = true;
+                send_time_ = node_->now();
+            }
+            ret = 1;
+            while (std::chrono::steady_clock::now() < deadline && rclcpp::ok()) {
+                twist.header.stamp = node_->now();
+                twist.twist.angular.z = direction * config_.twist_speed;
+                twist_pub_->publish(twist);
+                if (_wait_probe(std::chrono::steady_clock::now() + std::chrono::duration_cast<std::chrono::steady_clock::duration>(interval), false) == 0) {
+                    ret = 0;
+                    break;
+                }
+            }
+            auto stop_deadline = std::chrono::steady_clock::now() + std::chrono::milliseconds(300);
+            while (std::chrono::steady_clock::now() < stop_deadline && rclcpp::ok()) {
+                twist.header.stamp = node_->now();
+                twist.twist.angular.z = 0;
+                twist_pub_->publish(twist);
+                std::this_thread::sleep_for(interval);
+            }
+        }
+        std::lock_guard<std::mutex> locker(mutex_);
+        probing_ = false;
+        return ret;
+    }
+
+    int _wait_probe(std::chrono::steady_clock::time_point deadline, bool wait_reached)
+    {
+        std::unique_lock<std::mutex> locker(mutex_);
+        bool ok = cond_.wait_until(locker, deadline, [this, wait_reached] {
+            return wait_reached ? reached_seen_ : change_seen_;
+        });
+        if (!ok) return 1;
+        if (change_stamp_.nanoseconds() > 0) hops_["state_stamp"].push_back((change_stamp_ - send_time_).seconds());
+        hops_["state_recv"].push_back((change_recv_ - send_time_).seconds());
+        if (wait_reached) hops_["reached"].push_back((reached_recv_ - send_time_).seconds());
+        return 0;
+    }
+
+    void _add_hop(const char *hop, const rclcpp::Time &stamp)
+    {
+        std::lock_guard<std::mutex> locker(mutex_);
+        hops_[hop].push_back((stamp - send_time_).seconds());
+    }
+
+    unsigned long long _msg_count(void)
+    {
+        std::lock_guard<std::mutex> locker(mutex_);
+        return msg_count_;
+    }
+
+    bool _wait_state(std::chrono::steady_clock::duration timeout)
+    {
+        std::unique_lock<std::mutex> locker(mutex_);
+        return cond_.wait_for(locker, timeout, [this] { return have_state_; });
+    }
+
+    void _joint_states_callback(const sensor_msgs::msg::JointState::SharedPtr msg)
+    {
+        rclcpp::Time recv = node_->now();
+        std::lock_guard<std::mutex> locker(mutex_);
+        int found = 0;
+        for (int i = 0; i < msg->name.size() && i < msg->position.size(); i++) {
+            auto it = std::find(joint_names_.begin(), joint_names_.end(), msg->name[i]);
+            if (it == joint_names_.end()) continue;
+            position_[it - joint_names_.begin()] = msg->position[i];
+            found += 1;
+        }
+        if (found != joint_names_.size()) return;
+        have_state_ = true;
+        msg_count_ += 1;
+        if (!probing_) return;
+        // a twist may move any joint
+        for (int i = 0; i < position_.size() && !change_seen_; i++) {
+            change_seen_ = std::fabs(position_[i] - base_[i]) > config_.change_threshold;
+        }
+        if (change_seen_ && change_recv_.nanoseconds() == 0) {
+            change_stamp_ = rclcpp::Time(msg->header.stamp, RCL_ROS_TIME);
+            change_recv_ = recv;
+        }
+        if (check_reached_ && change_seen_ && !reached_seen_ && std::fabs(position_[joint_index_] - target_) < config_.reach_tolerance) {
+            reached_seen_ = true;
+            reached_recv_ = recv;
+        }
+        cond_.notify_all();
+    }
+
+    static double _percentile(const std::vector<double> &sorted, double p)
+    {
+        int index = (int)std::ceil(p / 100.0 * sorted.size()) - 1;
+        return sorted[std::min(std::max(index, 0), (int)sorted.size() - 1)];
+    }
+
+    rclcpp::Node::SharedPtr node_;
+    BenchmarkConfig config_;
+    std::string prefix_;
+    std::string hw_ns_;
+    std::vector<std::string> joint_names_;
+    int joint_index_;
+
+    std::mutex mutex_;
+    std::condition_variable cond_;
+    bool have_state_;
+    std::vector<double> position_;
+    bool probing_;
+    bool check_reached_;
+    bool change_seen_;
+    bool reached_seen_;
+    std::vector<double> base_;
+    double target_;
+    rclcpp::Time send_time_;
+    rclcpp::Time change_stamp_;
+    rclcpp::Time change_recv_;
+    rclcpp::Time reached_recv_;
+    unsigned long long msg_count_;
+    unsigned long long joint_states_count_;
+
+    std::map<std::string, std::vector<double>> hops_;
+    int completed_;
+    int timeouts_;
+    int failed_;
+    double elapsed_;
+
+    rclcpp::Subscription<sensor_msgs::msg::JointState>::SharedPtr joint_state_sub_;
+    rclcpp::Client<xarm_msgs::srv::MoveJoint>::SharedPtr servo_j_client_;
+    rclcpp::Client<xarm_msgs::srv::SetInt16ById>::SharedPtr motion_enable_client_;
+    rclcpp::Client<xarm_msgs::srv::SetInt16>::SharedPtr set_mode_client_;
+    rclcpp::Client<xarm_msgs::srv::SetInt16>::SharedPtr set_state_client_;
+    rclcpp_action::Client<FollowJointTrajectory>::SharedPtr traj_client_;
+    rclcpp::Publisher<geometry_msgs::msg::TwistStamped>::SharedPtr twist_pub_;
+};
+
+int main(int argc, char **argv)
+{
+    rclcpp::init(argc, argv);
+    rclcpp::NodeOptions options;
+    options.allow_undeclared_parameters(true);
+    options.automatically_declare_parameters_from_overrides(true);
+    rclcpp::Node::SharedPtr node = rclcpp::Node::make_shared("xarm_latency_benchmark", options);
+
+    BenchmarkConfig config;
+    std::vector<std::string> prefixes;
+    std::vector<std::string> hw_namespaces;
+    std::string output, label, scenario, report_type;
+    node->get_parameter_or("path", config.path, std::string("traj"));
+    node->get_parameter_or("robot_type", config.robot_type, std::string("xarm"));
+    node->get_parameter_or("dof", config.dof, 7);
+    node->get_parameter_or("samples", config.samples, 200);
+    node->get_parameter_or("rate", config.rate, 5.0);
+    node->get_parameter_or("step", config.step, 0.02);
+    node->get_parameter_or("change_threshold", config.change_threshold, 0.0005);
+    node->get_parameter_or("reach_tolerance", config.reach_tolerance, 0.002);
+    node->get_parameter_or("timeout", config.timeout, 3.0);
+    node->get_parameter_or("traj_duration", config.traj_duration, 0.1);
+    node->get_parameter_or("twist_speed", config.twist_speed, 0.3);
+    node->get_parameter_or("twist_rate", config.twist_rate, 100.0);
+    node->get_parameter_or("twist_topic", config.twist_topic, std::string("/servo_server/delta_twist_cmds"));
+    node->get_parameter_or("twist_frame", config.twist_frame, std::string("link_eef"));
+    node->get_parameter_or("prefixes", prefixes, std::vector<std::string>({""}));
+    node->get_parameter_or("hw_namespaces", hw_namespaces, std::vector<std::string>({"xarm"}));
+    node->get_parameter_or("output", output, std::string(""));
+    node->get_parameter_or("label", label, std::string(""));
+    node->get_parameter_or("scenario", scenario, config.path);
+    node->get_parameter_or("report_type", report_type, std::string(""));
+
+    if (prefixes.size() != hw_namespaces.size()) {
+        RCLCPP_ERROR(LOGGER, "prefixes and hw_namespaces must have the same size");
+        rclcpp::shutdown();
+        return 1;
+    }
+    // the empty prefix can not be given as a parameter from the command line
+    for (auto &prefix : prefixes) if (prefix == "none") prefix = "";
+
+    std::vector<std::shared_ptr<ArmBenchmark>> arms;
+    for (int i = 0; i < prefixes.size(); i++) {
+        arms.push_back(std::make_shared<ArmBenchmark>(node, config, prefixes[i], hw_namespaces[i]));
+    }
+
+    rclcpp::executors::MultiThreadedExecutor executor;
+    executor.add_node(node);
+    std::thread spin_thread([&executor]() { executor.spin(); });
+
+    RCLCPP_INFO(LOGGER, "latency benchmark %s, path=%s, arms=%d, samples=%d, rate=%.1f", scenario.c_str(), config.path.c_str(), (int)arms.size(), config.samples, config.rate);
+    bool success = true;
+    for (auto &arm : arms) success = success && arm->prepare();
+    if (success) {
+        std::vector<std::thread> threads;
+        for (auto &arm : arms) threads.emplace_back([arm]() { arm->run(); });
+        for (auto &th : threads) th.join();
+        for (auto &arm : arms) arm->log_summary();
+
+        FILE *fp = output.empty() ? stdout : fopen(output.c_str(), "w");
+        if (fp == NULL) {
+            RCLCPP_ERROR(LOGGER, "open %s failed", output.c_str());
+            success = false;
+        }
+        else {
+            fprintf(fp, "{\n");
+            fprintf(fp, "  \"benchmark\": \"xarm_latency\",\n");
+            fprintf(fp, "  \"scenario\": \"%s\",\n", scenario.c_str());
+            fprintf(fp, "  \"label\": \"%s\",\n", label.c_str());
+            fprintf(fp, "  \"path\": \"%s\",\n", config.path.c_str());
+            fprintf(fp, "  \"report_type\": \"%s\",\n", report_type.c_str());
+            fprintf(fp, "  \"dof\": %d,\n", config.dof);
+            fprintf(fp, "  \"samples\": %d,\n", config.samples);
+            fprintf(fp, "  \"rate\": %.3f,\n", config.rate);
+            fprintf(fp, "  \"arms\": [\n");
+            for (int i = 0; i < arms.size(); i++) {
+                arms[i]->write_json(fp);
+                fprintf(fp, i + 1 < arms.size() ? ",\n" : "\n");
+            }
+            fprintf(fp, "  ]\n}\n");
+            if (fp != stdout) {
+                fclose(fp);
+                RCLCPP_INFO(LOGGER, "results written to %s", output.c_str());
+            }
+        }
+    }
+
+    executor.cancel();
+    spin_thread.join();
+    rclcpp::shutdown();
+    return success ? 0 : 1;
+}
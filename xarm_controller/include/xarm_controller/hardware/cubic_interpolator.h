@@ -0,0 +1,102 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __UF_ROBOT_CUBIC_INTERPOLATOR_H__
+#define __UF_ROBOT_CUBIC_INTERPOLATOR_H__
+
+#include <chrono>
+
+namespace uf_robot_hardware
+{
+    /**
+     * Cubic Hermite interpolation between the last two position commands of the controller.
+     * The segment from the previous to the latest command starts when the latest command arrives and lasts
+     * one controller period, so every command is reached one controller period after the controller sent it.
+     * The segment ends on the slope of the last two commands and starts on the end slope of the previous
+     * segment (from rest for the first one), which keeps the velocity continuous at the commands.
+     * The output holds at the latest command once the segment is finished.
+     * Not thread-safe.
+     */
+    class CubicInterpolator
+    {
+    public:
+        typedef std::chrono::steady_clock::time_point TimePoint;
+        static const int MAX_DOF = 7;
+
+        CubicInterpolator() { reset(); }
+
+        void reset(int dof = MAX_DOF)
+        {
+            count_ = 0;
+            dof_ = dof;
+            duration_ = 0;
+            for (int i = 0; i < MAX_DOF; i++) tangents_[1][i] = 0;
+        }
+
+        bool empty(void) const { return count_ == 0; }
+
+        void push(TimePoint stamp, const float *cmds)
+        {
+            for (int i = 0; i < dof_; i++) {
+                points_[0][i] = points_[1][i];
+                points_[1][i] = points_[2][i];
+                points_[2][i] = cmds[i];
+            }
+            stamps_[0] = stamps_[1];
+            stamps_[1] = stamps_[2];
+            stamps_[2] = stamp;
+            if (count_ < 3) count_ += 1;
+            _update_segment();
+        }
+
+        // returns false if there is no command yet
+        bool sample(TimePoint stamp, float *out) const
+        {
+            if (count_ == 0) return false;
+            if (count_ == 1 || duration_ <= 0) {
+                for (int i = 0; i < dof_; i++) out[i] = points_[2][i];
+                return true;
+            }
+            double s = std::chrono::duration<double>(stamp - stamps_[2]).count() / duration_;
+            if (s < 0) s = 0;
+            if (s > 1) s = 1;
+            double s2 = s * s;
+            double s3 = s2 * s;
+            double h00 = 2 * s3 - 3 * s2 + 1;
+            double h10 = s3 - 2 * s2 + s;
+            double h01 = -2 * s3 + 3 * s2;
+            double h11 = s3 - s2;
+            for (int i = 0; i < dof_; i++) {
+                out[i] = (float)(h00 * points_[1][i] + h10 * duration_ * tangents_[0][i]
+                    + h01 * points_[2][i] + h11 * duration_ * tangents_[1][i]);
+            }
+            return true;
+        }
+
+    private:
+        void _update_segment(void)
+        {
+            if (count_ < 2) return;
+            duration_ = std::chrono::duration<double>(stamps_[2] - stamps_[1]).count();
+            if (duration_ <= 0) return;
+            for (int i = 0; i < dof_; i++) {
+                // the previous segment ended on tangents_[1]
+                tangents_[0][i] = count_ > 2 ? tangents_[1][i] : 0;
+                tangents_[1][i] = (points_[2][i] - points_[1][i]) / duration_;
+            }
+        }
+
+        int count_;
+        int dof_;
+        double duration_;
+        float points_[3][MAX_DOF];
+        TimePoint stamps_[3];
+        double tangents_[2][MAX_DOF];
+    };
+}
+
+#endif // __UF_ROBOT_CUBIC_INTERPOLATOR_H__
@@ -0,0 +1,149 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __UF_ROBOT_FAKE_ARM_SIM_H__
+#define __UF_ROBOT_FAKE_ARM_SIM_H__
+
+#include <cmath>
+#include <deque>
+#include <random>
+#include <vector>
+#include <algorithm>
+
+namespace uf_robot_hardware
+{
+    struct FakeJointLimits
+    {
+        FakeJointLimits() : max_velocity(0), max_acceleration(0) {}
+        double max_velocity;  // <= 0 means unlimited
+        double max_acceleration;  // <= 0 means unlimited
+    };
+
+    struct FakeArmSimConfig
+    {
+        FakeArmSimConfig()
+            : tracking_time_constant(0), command_delay(0), write_loss(0), read_loss(0),
+              inertia(0.05), damping(2.0), seed(0) {}
+        double tracking_time_constant;  // seconds, first-order lag towards the position command, 0 for none
+        double command_delay;  // seconds of simulated time before a command reaches the joints
+        double write_loss;  // probability that a command is lost
+        double read_loss;  // probability that a read returns nothing
+        double inertia;  // synthetic effort = inertia * acceleration + damping * velocity
+        double damping;
+        unsigned int seed;
+    };
+
+    /**
+     * Simulated arm of the fake hardware: joints follow the commands with a first-order lag
+     * under per-joint velocity/acceleration limits, commands reach the joints after a delay and may be lost.
+     * Only simulated time is used, the same seed and the same steps always give the same motion.
+     * Not thread-safe.
+     */
+    class FakeArmSim
+    {
+    public:
+        void configure(const FakeArmSimConfig &config, const std::vector<FakeJointLimits> &limits)
+        {
+            config_ = config;
+            limits_ = limits;
+            size_t dof = limits.size();
+            position_.assign(dof, 0);
+            velocity_.assign(dof, 0);
+            effort_.assign(dof, 0);
+            target_position_.assign(dof, 0);
+            target_velocity_.assign(dof, 0);
+            pending_.clear();
+            time_ = 0;
+            velocity_mode_ = false;
+            rng_.seed(config.seed);
+        }
+
+        void reset(const std::vector<double> &position)
+        {
+            position_ = position;
+            target_position_ = position;
+            std::fill(velocity_.begin(), velocity_.end(), 0);
+            std::fill(effort_.begin(), effort_.end(), 0);
+            std::fill(target_velocity_.begin(), target_velocity_.end(), 0);
+            pending_.clear();
+        }
+
+        // returns false if the command was lost
+        bool command(const std::vector<double> &position, const std::vector<double> &velocity, bool velocity_mode)
+        {
+            if (_chance(config_.write_loss)) return false;
+            Command cmd;
+            cmd.stamp = time_ + config_.command_delay;
+            cmd.position = position;
+            cmd.velocity = velocity;
+            cmd.velocity_mode = velocity_mode;
+            pending_.push_back(cmd);
+            return true;
+        }
+
+        // returns false if this read is lost, the caller keeps its previous states
+        bool read_ok(void) { return !_chance(config_.read_loss); }
+
+        void step(double dt)
+        {
+            if (dt <= 0) return;
+            time_ += dt;
+            while (!pending_.empty() && pending_.front().stamp <= time_ + 1e-12) {
+                target_position_ = pending_.front().position;
+                target_velocity_ = pending_.front().velocity;
+                velocity_mode_ = pending_.front().velocity_mode;
+                pending_.pop_front();
+            }
+            double tau = std::max(config_.tracking_time_constant, dt);
+            for (size_t i = 0; i < position_.size(); i++) {
+                double desired = velocity_mode_ ? target_velocity_[i] : (target_position_[i] - position_[i]) / tau;
+                double max_vel = limits_[i].max_velocity;
+                if (max_vel > 0) desired = std::min(std::max(desired, -max_vel), max_vel);
+                double accel = (desired - velocity_[i]) / dt;
+                double max_acc = limits_[i].max_acceleration;
+                if (max_acc > 0) accel = std::min(std::max(accel, -max_acc), max_acc);
+                velocity_[i] += accel * dt;
+                position_[i] += velocity_[i] * dt;
+                effort_[i] = config_.inertia * accel + config_.damping * velocity_[i];
+            }
+        }
+
+        double time(void) const { return time_; }
+        const std::vector<double> &position(void) const { return position_; }
+        const std::vector<double> &velocity(void) const { return velocity_; }
+        const std::vector<double> &effort(void) const { return effort_; }
+
+    private:
+        struct Command
+        {
+            double stamp;
+            std::vector<double> position;
+            std::vector<double> velocity;
+            bool velocity_mode;
+        };
+
+        bool _chance(double probability)
+        {
+            if (probability <= 0) return false;
+            return std::uniform_real_distribution<double>(0, 1)(rng_) < probability;
+        }
+
+        FakeArmSimConfig config_;
+        std::vector<FakeJointLimits> limits_;
+        std::vector<double> position_;
+        std::vector<double> velocity_;
+        std::vector<double> effort_;
+        std::vector<double> target_position_;
+        std::vector<double> target_velocity_;
+        bool velocity_mode_;
+        std::deque<Command> pending_;
+        double time_;
+        std::mt19937 rng_;
+    };
+}
+
+#endif // __UF_ROBOT_FAKE_ARM_SIM_H__
@@ -0,0 +1,104 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __UF_ROBOT_LATENCY_HISTOGRAM_H__
+#define __UF_ROBOT_LATENCY_HISTOGRAM_H__
+
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+
+namespace uf_robot_hardware
+{
+    /**
+     * HDR-style latency histogram, durations are recorded in nanoseconds with 16 log-linear sub-buckets
+     * per power of two (relative error < 6.25%) from 1ns up to ~18 minutes.
+     * record() is lock-free and can be called from one or more threads while another thread reads it.
+     */
+    class LatencyHistogram
+    {
+    public:
+        LatencyHistogram() { reset(); }
+
+        void record(std::chrono::steady_clock::duration duration)
+        {
+            int64_t ns = std::chrono::duration_cast<std::chrono::nanoseconds>(duration).count();
+            uint64_t value = ns > 0 ? (uint64_t)ns : 0;
+            buckets_[_index(value)].fetch_add(1, std::memory_order_relaxed);
+            count_.fetch_add(1, std::memory_order_relaxed);
+            total_.fetch_add(value, std::memory_order_relaxed);
+            uint64_t max = max_.load(std::memory_order_relaxed);
+            while (value > max && !max_.compare_exchange_weak(max, value, std::memory_order_relaxed)) {}
+        }
+
+        void reset(void)
+        {
+            for (int i = 0; i < BUCKET_COUNT; i++) buckets_[i].store(0, std::memory_order_relaxed);
+            count_.store(0, std::memory_order_relaxed);
+            total_.store(0, std::memory_order_relaxed);
+            max_.store(0, std::memory_order_relaxed);
+        }
+
+        uint64_t count(void) const { return count_.load(std::memory_order_relaxed); }
+
+        // seconds
+        double max(void) const { return max_.load(std::memory_order_relaxed) / 1e9; }
+        double mean(void) const
+        {
+            uint64_t cnt = count();
+            return cnt > 0 ? total_.load(std::memory_order_relaxed) / 1e9 / cnt : 0.0;
+        }
+        // percentile in [0, 100], returns the upper bound of the bucket it falls in
+        double percentile(double percent) const
+        {
+            uint64_t cnt = count();
+            if (cnt == 0) return 0.0;
+            uint64_t target = (uint64_t)(percent / 100.0 * cnt + 0.5);
+            if (target < 1) target = 1;
+            uint64_t sum = 0;
+            for (int i = 0; i < BUCKET_COUNT; i++) {
+                sum += buckets_[i].load(std::memory_order_relaxed);
+                if (sum >= target) {
+                    uint64_t upper = _upper_bound(i);
+                    uint64_t max = max_.load(std::memory_order_relaxed);
+                    return (upper < max ? upper : max) / 1e9;
+                }
+            }
+            return max();
+        }
+
+    private:
+        static const int SUB_BITS = 4;
+        static const int SUB_COUNT = 1 << SUB_BITS;
+        static const int MAX_EXPONENT = 40;
+        static const int BUCKET_COUNT = SUB_COUNT * (MAX_EXPONENT - SUB_BITS + 2);
+
+        static int _index(uint64_t value)
+        {
+            if (value < (uint64_t)SUB_COUNT) return (int)value;
+            int exponent = 63 - __builtin_clzll(value);
+            if (exponent > MAX_EXPONENT) return BUCKET_COUNT - 1;
+            int sub = (int)((value >> (exponent - SUB_BITS)) & (SUB_COUNT - 1));
+            return SUB_COUNT * (exponent - SUB_BITS + 1) + sub;
+        }
+
+        static uint64_t _upper_bound(int index)
+        {
+            if (index < SUB_COUNT) return (uint64_t)index;
+            int exponent = index / SUB_COUNT + SUB_BITS - 1;
+            int sub = index % SUB_COUNT;
+            return (((uint64_t)(SUB_COUNT + sub + 1)) << (exponent - SUB_BITS)) - 1;
+        }
+
+        std::atomic<uint64_t> buckets_[BUCKET_COUNT];
+        std::atomic<uint64_t> count_;
+        std::atomic<uint64_t> total_;
+        std::atomic<uint64_t> max_;
+    };
+}
+
+#endif // __UF_ROBOT_LATENCY_HISTOGRAM_H__
@@ -0,0 +1,99 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+#ifndef __UF_ROBOT_READINESS_TRACKER_H__
+#define __UF_ROBOT_READINESS_TRACKER_H__
+
+#include <atomic>
+#include <functional>
+
+namespace uf_robot_hardware
+{
+    struct RobotStatus
+    {
+        int err;
+        int state;
+        int mode;
+    };
+
+    // the current status of one arm, e.g. the last report of its XArmDriver
+    typedef std::function<RobotStatus(void)> StatusSource;
+
+    /**
+     * Last error/state/mode seen by one hardware instance, used to only log transitions.
+     * Every update is a single atomic exchange, so it can be called from read() and write() without locking.
+     */
+    class ReadinessTracker
+    {
+    public:
+        ReadinessTracker() { reset(0, 0, 0); }
+
+        void reset(int err, int state, int mode)
+        {
+            last_err_.store(err, std::memory_order_relaxed);
+            last_state_.store(state, std::memory_order_relaxed);
+            last_mode_.store(mode, std::memory_order_relaxed);
+            not_ready_.store(false, std::memory_order_relaxed);
+        }
+
+        // the update_* functions return true if the value differs from the last one
+        bool update_err(int err) { return last_err_.exchange(err, std::memory_order_relaxed) != err; }
+        bool update_state(int state) { return last_state_.exchange(state, std::memory_order_relaxed) != state; }
+        bool update_mode(int mode) { return last_mode_.exchange(mode, std::memory_order_relaxed) != mode; }
+
+        // returns true if the instance was not ready before
+        bool set_not_ready(bool not_ready) { return not_ready_.exchange(not_ready, std::memory_order_relaxed); }
+
+        int last_err(void) const { return last_err_.load(std::memory_order_relaxed); }
+        int last_state(void) const { return last_state_.load(std::memory_order_relaxed); }
+        int last_mode(void) const { return last_mode_.load(std::memory_order_relaxed); }
+        bool not_ready(void) const { return not_ready_.load(std::memory_order_relaxed); }
+
+    private:
+        std::atomic<int> last_err_;
+        std::atomic<int> last_state_;
+        std::atomic<int> last_mode_;
+        std::atomic<bool> not_ready_;
+    };
+
+    // the transitions worth logging, reported once when they happen
+    enum class ReadinessEvent { ERROR_DETECTED, STATE_DETECTED, MODE_DETECTED, READY };
+    typedef std::function<void(ReadinessEvent event, const RobotStatus &status)> ReadinessEventCallback;
+
+    // ready to read: no error
+    inline bool check_ready_read(ReadinessTracker &tracker, const StatusSource &source, const ReadinessEventCallback &on_event)
+    {
+        RobotStatus status = source();
+        if (tracker.update_err(status.err) && status.err != 0) on_event(ReadinessEvent::ERROR_DETECTED, status);
+        return status.err == 0;
+    }
+
+    // ready to write: no error, not stopped and in expected_mode
+    inline bool check_ready_write(ReadinessTracker &tracker, const StatusSource &source, int expected_mode, const ReadinessEventCallback &on_event)
+    {
+        RobotStatus status = source();
+        if (tracker.update_err(status.err) && status.err != 0) on_event(ReadinessEvent::ERROR_DETECTED, status);
+        if (status.err != 0) {
+            tracker.set_not_ready(true);
+            return false;
+        }
+        if (tracker.update_state(status.state) && status.state > 2) on_event(ReadinessEvent::STATE_DETECTED, status);
+        if (status.state > 2) {
+            tracker.set_not_ready(true);
+            return false;
+        }
+        if (tracker.update_mode(status.mode) && status.mode != expected_mode) on_event(ReadinessEvent::MODE_DETECTED, status);
+        if (status.mode != expected_mode) {
+            tracker.set_not_ready(true);
+            return false;
+        }
+        if (tracker.set_not_ready(false)) on_event(ReadinessEvent::READY, status);
+        return true;
+    }
+}
+
+#endif // __UF_ROBOT_READINESS_TRACKER_H__
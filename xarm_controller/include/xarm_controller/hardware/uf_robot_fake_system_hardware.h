@@ -12,6 +12,7 @@
 #include <vector>
 #include <thread>
 #include <queue>
+#include <random>
 #include <rclcpp/rclcpp.hpp>
 #include <std_msgs/msg/string.hpp>
 #include <sensor_msgs/msg/joint_state.hpp>
@@ -21,6 +22,7 @@
 #include "hardware_interface/types/hardware_interface_status_values.hpp"
 #include "hardware_interface/types/hardware_interface_type_values.hpp"
 #include "hardware_interface/visibility_control.h"
+#include "xarm_controller/hardware/fake_arm_sim.h"
 
 
 namespace uf_robot_hardware
@@ -30,6 +32,8 @@ namespace uf_robot_hardware
     public:
         RCLCPP_SHARED_PTR_DEFINITIONS(UFRobotFakeSystemHardware)
 
+        ~UFRobotFakeSystemHardware();
+
         hardware_interface::return_type configure(const hardware_interface::HardwareInfo & info) override;
 
         std::vector<hardware_interface::StateInterface> export_state_interfaces() override;
@@ -62,8 +66,35 @@ namespace uf_robot_hardware
         std::vector<double> velocity_cmds_;
         std::vector<double> position_states_;
         std::vector<double> velocity_states_;
+        std::vector<double> effort_states_;
+        // velocity derived from the position commands, drives the synthetic effort
+        std::vector<double> motion_velocity_;
+        rclcpp::Time prev_write_time_;
+
+        // simulated arm, see the sim section of fake_hardware_params.yaml
+        bool sim_enabled_;
+        bool velocity_control_;
+        FakeArmSim sim_;
+        double sim_fixed_step_;
+        double read_latency_;
+        double read_latency_jitter_;
+        double write_latency_;
+        double write_latency_jitter_;
+        std::mt19937 latency_rng_;
+        std::chrono::steady_clock::time_point prev_step_time_;
+        rclcpp::Time sim_start_time_;
+        long int sim_write_lost_cnts_;
+        long int sim_read_lost_cnts_;
+
+        double joint_states_interval_;
+        double last_publish_time_;
+
+        void _init_sim(void);
+        void _inject_latency(double mean, double jitter);
+        void _publish_joint_states(void);
 
         std::shared_ptr<rclcpp::Node> node_;
+        rclcpp::executors::SingleThreadedExecutor::SharedPtr executor_;
         std::thread node_thread_;
         rclcpp::Publisher<sensor_msgs::msg::JointState>::SharedPtr joint_state_pub_;
         sensor_msgs::msg::JointState joint_state_msg_;
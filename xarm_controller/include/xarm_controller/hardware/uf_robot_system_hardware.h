@@ -10,11 +10,16 @@
 #define __UF_ROBOT_SYSTEM_HARDWARE_INTERFACE_H__
 
 #include <vector>
+#include <algorithm>
 #include <thread>
 #include <queue>
+#include <mutex>
+#include <atomic>
+#include <condition_variable>
 #include <rclcpp/rclcpp.hpp>
 #include <std_msgs/msg/string.hpp>
 #include <sensor_msgs/msg/joint_state.hpp>
+#include <diagnostic_msgs/msg/diagnostic_array.hpp>
 #include "hardware_interface/hardware_info.hpp"
 #include "hardware_interface/system_interface.hpp"
 #include "hardware_interface/types/hardware_interface_return_values.hpp"
@@ -26,6 +31,9 @@
 #include "controller_manager_msgs/srv/reload_controller_libraries.hpp"
 #include "controller_manager_msgs/srv/switch_controller.hpp"
 #include "xarm_api/xarm_driver.h"
+#include "xarm_controller/hardware/latency_histogram.h"
+#include "xarm_controller/hardware/readiness_tracker.h"
+#include "xarm_controller/hardware/cubic_interpolator.h"
 
 
 namespace uf_robot_hardware
@@ -35,6 +43,8 @@ namespace uf_robot_hardware
     public:
         RCLCPP_SHARED_PTR_DEFINITIONS(UFRobotSystemHardware)
 
+        ~UFRobotSystemHardware();
+
         hardware_interface::return_type configure(const hardware_interface::HardwareInfo & info) override;
 
         std::vector<hardware_interface::StateInterface> export_state_interfaces() override;
@@ -74,16 +84,92 @@ namespace uf_robot_hardware
         std::vector<double> velocity_cmds_;
         std::vector<double> position_states_;
         std::vector<double> velocity_states_;
+        std::vector<double> effort_states_;
 
         bool velocity_control_;
         bool initialized_;
         bool read_ready_;
+        // per instance, several arms can share one controller_manager
+        ReadinessTracker readiness_;
+        StatusSource status_source_;
+        ReadinessEventCallback readiness_event_cb_;
         bool reload_controller_;
 
-        long int read_cnts_;
-        long int read_failed_cnts_;
-        double read_max_time_;
-        double read_total_time_;
+        // controller recovery runs on its own thread, read() only requests it and polls the state
+        enum RecoveryState { RECOVERY_IDLE, RECOVERY_REQUESTED, RECOVERY_LIST_CONTROLLERS, RECOVERY_SWITCH_CONTROLLERS, RECOVERY_DONE, RECOVERY_FAILED };
+        std::atomic<int> recovery_state_;
+        bool recovery_running_;
+        std::mutex recovery_mutex_;
+        std::condition_variable recovery_cond_;
+        std::thread recovery_thread_;
+
+        bool read_from_report_;
+        double report_max_age_;
+        std::atomic<long> read_report_stale_cnts_;
+        xarm_api::ReportJointStates report_states_;
+
+        // async write: write() only posts the latest command, the writer thread sends it
+        bool async_write_;
+        bool write_cmd_pending_;
+        bool writer_running_;
+        float write_cmd_[7];
+        std::chrono::steady_clock::time_point write_cmd_stamp_;
+        std::atomic<bool> write_cmd_failed_;
+        std::mutex write_mutex_;
+        std::condition_variable write_cond_;
+        std::thread writer_thread_;
+        std::atomic<long> write_cnts_;
+        std::atomic<long> write_dropped_cnts_;
+
+        // interpolation: write() only feeds the position commands, the sender thread streams interpolated ones
+        double interpolate_rate_;
+        bool interp_running_;
+        CubicInterpolator interpolator_;
+        std::mutex interp_mutex_;
+        std::condition_variable interp_cond_;
+        std::thread interp_thread_;
+        std::atomic<long> interp_send_cnts_;
+        std::atomic<long> interp_failed_cnts_;
+        std::atomic<long> interp_overrun_cnts_;
+
+        // parallel io: a reader thread per arm, the arms of one controller_manager query concurrently
+        enum ReadIOState { READ_IO_IDLE, READ_IO_PENDING, READ_IO_DONE };
+        bool parallel_io_;
+        double parallel_io_timeout_;
+        std::atomic<long> parallel_io_timeout_cnts_;
+        bool reader_running_;
+        ReadIOState read_io_state_;
+        // every request gets a new generation, the result of a timed out request is dropped
+        unsigned long read_io_generation_;
+        bool read_io_busy_;
+        int read_io_code_;
+        float read_io_position_[7];
+        float read_io_velocity_[7];
+        float read_io_effort_[7];
+        std::mutex read_io_mutex_;
+        std::condition_variable read_io_cond_;
+        std::thread reader_thread_;
+        static std::mutex io_group_mutex_;
+        static std::vector<UFRobotSystemHardware *> io_group_;
+
+        std::atomic<long> read_cnts_;
+        std::atomic<long> read_failed_cnts_;
+
+        // timing statistics, published on diagnostics
+        // the counters above are written by the control/writer/interpolator/reader threads and read by the diagnostics timer
+        LatencyHistogram read_time_hist_;
+        LatencyHistogram read_sdk_time_hist_;
+        LatencyHistogram write_time_hist_;
+        LatencyHistogram write_sdk_time_hist_;
+        LatencyHistogram write_latency_hist_;
+        LatencyHistogram cycle_period_hist_;
+        LatencyHistogram cycle_jitter_hist_;
+        std::chrono::steady_clock::time_point prev_read_start_;
+        std::chrono::steady_clock::duration prev_cycle_period_;
+        std::atomic<bool> reset_statistics_;
+        rclcpp::Publisher<diagnostic_msgs::msg::DiagnosticArray>::SharedPtr diagnostics_pub_;
+        rclcpp::TimerBase::SharedPtr diagnostics_timer_;
+        rclcpp::Service<xarm_msgs::srv::Call>::SharedPtr reset_statistics_service_;
         
         float prev_read_position_[7];
 		float curr_read_position_[7];
@@ -111,10 +197,38 @@ namespace uf_robot_hardware
         bool _xarm_is_ready_read(void);
         bool _xarm_is_ready_write(void);
         bool _firmware_version_is_ge(int major, int minor, int revision);
+        bool _read_report_joint_states(void);
+        int _query_joint_states(bool use_new, float *position, float *velocity, float *effort);
+
+        void _start_reader(void);
+        void _stop_reader(void);
+        void _request_read(void);
+        bool _wait_parallel_read(bool &in_flight);
+        void _reader_loop(void);
+
+        int _send_cmds(float *cmds);
+        void _post_cmds(float *cmds);
+        void _start_writer(void);
+        void _stop_writer(void);
+        void _writer_loop(void);
+
+        void _feed_interpolator(float *cmds);
+        void _start_interpolator(void);
+        void _stop_interpolator(void);
+        void _interpolator_loop(void);
+
+        void _init_statistics(const std::string &hw_ns);
+        void _reset_statistics(void);
+        void _publish_diagnostics(void);
 
         bool _need_reset(void);
 
-        void _reload_controller(void);
+        bool _reload_controller(void);
+        void _start_recovery_worker(void);
+        void _stop_recovery_worker(void);
+        void _request_recovery(void);
+        void _poll_recovery(void);
+        void _recovery_loop(void);
 
         void _init_ufactory_driver(void);
 
@@ -101,6 +101,7 @@ def launch_setup(context, *args, **kwargs):
     # xarm_controller/launch/lib/robot_controller_lib.py
     mod = load_python_launch_file_as_module(os.path.join(get_package_share_directory('xarm_controller'), 'launch', 'lib', 'robot_controller_lib.py'))
     generate_dual_ros2_control_params_temp_file = getattr(mod, 'generate_dual_ros2_control_params_temp_file')
+    generate_fake_hardware_params_file = getattr(mod, 'generate_fake_hardware_params_file')
     ros2_control_params = generate_dual_ros2_control_params_temp_file(
         os.path.join(get_package_share_directory('xarm_controller'), 'config', '{}{}_controllers.yaml'.format(robot_type_1.perform(context), dof_1.perform(context))),
         os.path.join(get_package_share_directory('xarm_controller'), 'config', '{}{}_controllers.yaml'.format(robot_type_2.perform(context), dof_2.perform(context))),
@@ -182,6 +183,15 @@ def launch_setup(context, *args, **kwargs):
         LaunchConfiguration('ros_namespace', default='').perform(context), node_name='ufactory_driver'
     )
 
+    # the grippers always use the fake hardware
+    fake_hardware_params = generate_fake_hardware_params_file(
+        [
+            (robot_type_1.perform(context), dof_1.perform(context), prefix_1.perform(context), add_gripper_1.perform(context) in ('True', 'true')),
+            (robot_type_2.perform(context), dof_2.perform(context), prefix_2.perform(context), add_gripper_2.perform(context) in ('True', 'true')),
+        ],
+        ros_namespace=LaunchConfiguration('ros_namespace', default='').perform(context)
+    )
+
     # ros2 control node
     ros2_control_node = Node(
         package='controller_manager',
@@ -190,6 +200,7 @@ def launch_setup(context, *args, **kwargs):
             robot_description,
             ros2_control_params,
             robot_params,
+            fake_hardware_params,
         ],
         output='screen',
     )
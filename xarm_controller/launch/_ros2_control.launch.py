@@ -50,6 +50,7 @@ def launch_setup(context, *args, **kwargs):
     # xarm_controller/launch/lib/robot_controller_lib.py
     mod = load_python_launch_file_as_module(os.path.join(get_package_share_directory('xarm_controller'), 'launch', 'lib', 'robot_controller_lib.py'))
     generate_ros2_control_params_temp_file = getattr(mod, 'generate_ros2_control_params_temp_file')
+    generate_fake_hardware_params_file = getattr(mod, 'generate_fake_hardware_params_file')
     ros2_control_params = generate_ros2_control_params_temp_file(
         os.path.join(get_package_share_directory('xarm_controller'), 'config', '{}{}_controllers.yaml'.format(robot_type.perform(context), dof.perform(context))),
         prefix=prefix.perform(context), 
@@ -105,6 +106,12 @@ def launch_setup(context, *args, **kwargs):
         LaunchConfiguration('ros_namespace', default='').perform(context), node_name='ufactory_driver'
     )
 
+    # the gripper always uses the fake hardware
+    fake_hardware_params = generate_fake_hardware_params_file(
+        [(robot_type.perform(context), dof.perform(context), prefix.perform(context), add_gripper.perform(context) in ('True', 'true'))],
+        ros_namespace=LaunchConfiguration('ros_namespace', default='').perform(context)
+    )
+
     # ros2 control node
     ros2_control_node = Node(
         package='controller_manager',
@@ -113,6 +120,7 @@ def launch_setup(context, *args, **kwargs):
             robot_description,
             ros2_control_params,
             robot_params,
+            fake_hardware_params,
         ],
         output='screen',
     )
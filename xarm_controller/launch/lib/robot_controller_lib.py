@@ -8,8 +8,48 @@
 
 import os
 import yaml
-from tempfile import NamedTemporaryFile
 from ament_index_python import get_package_share_directory
+from launch.launch_description_sources import load_python_launch_file_as_module
+
+
+def generate_params_file(params_yaml):
+    # xarm_api/launch/lib/robot_api_lib.py
+    mod = load_python_launch_file_as_module(os.path.join(get_package_share_directory('xarm_api'), 'launch', 'lib', 'robot_api_lib.py'))
+    return getattr(mod, 'generate_params_file')(params_yaml)
+
+
+def generate_fake_hardware_params_file(robots, ros_namespace=''):
+    """
+    Parameters of the fake hardware: config/fake_hardware_params.yaml plus the joint limits of the robots.
+
+    robots: list of (robot_type, dof, prefix, add_gripper)
+    """
+    with open(os.path.join(get_package_share_directory('xarm_controller'), 'config', 'fake_hardware_params.yaml'), 'r') as f:
+        params_yaml = yaml.safe_load(f)
+    try:
+        moveit_config_dir = get_package_share_directory('xarm_moveit_config')
+    except Exception:
+        moveit_config_dir = ''
+    if moveit_config_dir:
+        joint_limits = {}
+        for robot_type, dof, prefix, add_gripper in robots:
+            names = ['{}{}'.format(robot_type, dof)]
+            if add_gripper and robot_type == 'xarm':
+                names.append('xarm_gripper')
+            for name in names:
+                try:
+                    with open(os.path.join(moveit_config_dir, 'config', name, 'joint_limits.yaml'), 'r') as f:
+                        limits = yaml.safe_load(f).get('joint_limits', {})
+                except Exception:
+                    continue
+                for joint, value in limits.items():
+                    joint_limits['{}{}'.format(prefix, joint)] = value
+        params_yaml['uf_robot_fake_hw']['ros__parameters']['joint_limits'] = joint_limits
+    if ros_namespace:
+        params_yaml = {
+            ros_namespace: params_yaml
+        }
+    return generate_params_file(params_yaml)
 
 
 def add_prefix_to_ros2_control_params(prefix, ros2_control_params):
@@ -56,9 +96,7 @@ def generate_ros2_control_params_temp_file(ros2_control_params_path, prefix='',
             ros2_control_params_yaml = {
                 ros_namespace: ros2_control_params_yaml
             }
-        with NamedTemporaryFile(mode='w', prefix='launch_params_', delete=False) as h:
-            yaml.dump(ros2_control_params_yaml, h, default_flow_style=False)
-            return h.name
+        return generate_params_file(ros2_control_params_yaml)
     return ros2_control_params_path
 
 
@@ -109,6 +147,4 @@ def generate_dual_ros2_control_params_temp_file(
         ros2_control_params_yaml = {
             ros_namespace: ros2_control_params_yaml
         }
-    with NamedTemporaryFile(mode='w', prefix='launch_params_', delete=False) as h:
-        yaml.dump(ros2_control_params_yaml, h, default_flow_style=False)
-        return h.name
\ No newline at end of file
+    return generate_params_file(ros2_control_params_yaml)
\ No newline at end of file
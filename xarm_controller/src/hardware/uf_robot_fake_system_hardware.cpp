@@ -12,15 +12,42 @@ namespace uf_robot_hardware
 {
     static const rclcpp::Logger LOGGER = rclcpp::get_logger("UFACTORY.RobotFakeHW");
 
+    // synthetic joint effort = inertia * acceleration + damping * velocity
+    static const double FAKE_JOINT_INERTIA = 0.05;
+    static const double FAKE_JOINT_DAMPING = 2.0;
+
+    // accepts both integer and floating point values
+    static double _get_double_param(const rclcpp::Node::SharedPtr &node, const std::string &name, double default_val)
+    {
+        rclcpp::Parameter param;
+        if (!node->get_parameter(name, param)) return default_val;
+        if (param.get_type() == rclcpp::ParameterType::PARAMETER_INTEGER) return (double)param.as_int();
+        if (param.get_type() == rclcpp::ParameterType::PARAMETER_DOUBLE) return param.as_double();
+        return default_val;
+    }
+
+    UFRobotFakeSystemHardware::~UFRobotFakeSystemHardware()
+    {
+        if (executor_) executor_->cancel();
+        if (node_thread_.joinable()) node_thread_.join();
+    }
+
     hardware_interface::return_type UFRobotFakeSystemHardware::configure(const hardware_interface::HardwareInfo & info)
     {
         info_ = info;
 
-        node_ = rclcpp::Node::make_shared("uf_robot_fake_hw");
-        joint_state_pub_ = node_->create_publisher<sensor_msgs::msg::JointState>("joint_states", 1000);
-        node_thread_ = std::thread([this]() {
-            rclcpp::spin(node_);
-        });
+        if (!node_) {
+            // the sim and joint_limits parameters come from the parameter files of the controller_manager process
+            node_ = rclcpp::Node::make_shared("uf_robot_fake_hw",
+                rclcpp::NodeOptions().allow_undeclared_parameters(true).automatically_declare_parameters_from_overrides(true));
+            joint_state_pub_ = node_->create_publisher<sensor_msgs::msg::JointState>("joint_states", 1000);
+            // own executor so that every instance can be stopped on its own
+            executor_ = std::make_shared<rclcpp::executors::SingleThreadedExecutor>();
+            executor_->add_node(node_);
+            node_thread_ = std::thread([this]() {
+                executor_->spin();
+            });
+        }
         
         joint_state_msg_.header.frame_id = "joint-state data";
         joint_state_msg_.name.resize(info_.joints.size());
@@ -34,6 +61,8 @@ namespace uf_robot_hardware
         
         position_states_.resize(info_.joints.size(), 0);
         velocity_states_.resize(info_.joints.size(), 0);
+        effort_states_.resize(info_.joints.size(), 0);
+        motion_velocity_.resize(info_.joints.size(), 0);
         position_cmds_.resize(info_.joints.size(), 0);
         velocity_cmds_.resize(info_.joints.size(), 0);
 
@@ -67,11 +96,86 @@ namespace uf_robot_hardware
             }
         }
 
+        _init_sim();
+
         RCLCPP_INFO(LOGGER, "System Sucessfully configured!");
         status_ = hardware_interface::status::CONFIGURED;
         return hardware_interface::return_type::OK;
     }
 
+    void UFRobotFakeSystemHardware::_init_sim(void)
+    {
+        velocity_control_ = false;
+        auto it = info_.hardware_parameters.find("velocity_control");
+        if (it != info_.hardware_parameters.end()) {
+            velocity_control_ = (it->second == "True" || it->second == "true");
+        }
+
+        FakeArmSimConfig config;
+        int seed = 0;
+        node_->get_parameter_or("sim.enabled", sim_enabled_, false);
+        node_->get_parameter_or("sim.seed", seed, 0);
+        sim_fixed_step_ = _get_double_param(node_, "sim.fixed_step", 0.0);
+        config.tracking_time_constant = _get_double_param(node_, "sim.tracking_time_constant", 0.0);
+        config.command_delay = _get_double_param(node_, "sim.command_delay", 0.0);
+        config.write_loss = _get_double_param(node_, "sim.write_loss", 0.0);
+        config.read_loss = _get_double_param(node_, "sim.read_loss", 0.0);
+        config.inertia = _get_double_param(node_, "sim.inertia", FAKE_JOINT_INERTIA);
+        config.damping = _get_double_param(node_, "sim.damping", FAKE_JOINT_DAMPING);
+        config.seed = (unsigned int)seed;
+        read_latency_ = _get_double_param(node_, "sim.read_latency", 0.0);
+        read_latency_jitter_ = _get_double_param(node_, "sim.read_latency_jitter", 0.0);
+        write_latency_ = _get_double_param(node_, "sim.write_latency", 0.0);
+        write_latency_jitter_ = _get_double_param(node_, "sim.write_latency_jitter", 0.0);
+        latency_rng_.seed(config.seed + 1);
+
+        double joint_states_rate = _get_double_param(node_, "sim.joint_states_rate", 0.0);
+        joint_states_interval_ = joint_states_rate > 0 ? 1.0 / joint_states_rate : joint_states_rate;
+        last_publish_time_ = -1;
+        sim_write_lost_cnts_ = 0;
+        sim_read_lost_cnts_ = 0;
+
+        // same format as joint_limits.yaml of xarm_moveit_config
+        std::vector<FakeJointLimits> limits(info_.joints.size());
+        for (int i = 0; i < info_.joints.size(); i++) {
+            std::string name = "joint_limits." + info_.joints[i].name + ".";
+            bool has_limits = false;
+            node_->get_parameter_or(name + "has_velocity_limits", has_limits, true);
+            if (has_limits) limits[i].max_velocity = _get_double_param(node_, name + "max_velocity", 0.0);
+            node_->get_parameter_or(name + "has_acceleration_limits", has_limits, false);
+            if (has_limits) limits[i].max_acceleration = _get_double_param(node_, name + "max_acceleration", 0.0);
+        }
+        sim_.configure(config, limits);
+
+        if (sim_enabled_) {
+            RCLCPP_INFO(LOGGER, "Simulated arm: fixed_step: %f, tracking_time_constant: %f, command_delay: %f, "
+                "read_latency: %f/%f, write_latency: %f/%f, write_loss: %f, read_loss: %f, seed: %d", 
+                sim_fixed_step_, config.tracking_time_constant, config.command_delay, read_latency_, read_latency_jitter_,
+                write_latency_, write_latency_jitter_, config.write_loss, config.read_loss, seed);
+        }
+    }
+
+    void UFRobotFakeSystemHardware::_inject_latency(double mean, double jitter)
+    {
+        // blocking like the SDK call it stands in for, never in fixed step mode
+        if (sim_fixed_step_ > 0 || (mean <= 0 && jitter <= 0)) return;
+        double latency = jitter > 0 ? std::normal_distribution<double>(mean, jitter)(latency_rng_) : mean;
+        if (latency > 0) std::this_thread::sleep_for(std::chrono::duration<double>(latency));
+    }
+
+    void UFRobotFakeSystemHardware::_publish_joint_states(void)
+    {
+        if (joint_states_interval_ < 0) return;
+        rclcpp::Time now = node_->get_clock()->now();
+        // in fixed step mode the stamps follow the simulated time
+        rclcpp::Time stamp = (sim_enabled_ && sim_fixed_step_ > 0) ? sim_start_time_ + rclcpp::Duration::from_seconds(sim_.time()) : now;
+        double t = stamp.seconds();
+        if (joint_states_interval_ > 0 && last_publish_time_ >= 0 && t - last_publish_time_ < joint_states_interval_) return;
+        last_publish_time_ = t;
+        joint_state_msg_.header.stamp = stamp;
+        joint_state_pub_->publish(joint_state_msg_);
+    }
+
     std::vector<hardware_interface::StateInterface> UFRobotFakeSystemHardware::export_state_interfaces()
     {
         std::vector<hardware_interface::StateInterface> state_interfaces;
@@ -80,6 +184,8 @@ namespace uf_robot_hardware
                 info_.joints[i].name, hardware_interface::HW_IF_POSITION, &position_states_[i]));
             state_interfaces.emplace_back(hardware_interface::StateInterface(
                 info_.joints[i].name, hardware_interface::HW_IF_VELOCITY, &velocity_states_[i]));
+            state_interfaces.emplace_back(hardware_interface::StateInterface(
+                info_.joints[i].name, hardware_interface::HW_IF_EFFORT, &effort_states_[i]));
         }
 
         return state_interfaces;
@@ -100,6 +206,10 @@ namespace uf_robot_hardware
 
     hardware_interface::return_type UFRobotFakeSystemHardware::start()
     {
+        prev_write_time_ = node_->get_clock()->now();
+        sim_start_time_ = prev_write_time_;
+        prev_step_time_ = std::chrono::steady_clock::now();
+        if (sim_enabled_) sim_.reset(position_states_);
         status_ = hardware_interface::status::STARTED;
         
         RCLCPP_INFO(LOGGER, "System Sucessfully started!");
@@ -110,6 +220,9 @@ namespace uf_robot_hardware
     {
         RCLCPP_INFO(LOGGER, "Stopping ...please wait...");
         status_ = hardware_interface::status::STOPPED;
+        if (sim_enabled_) {
+            RCLCPP_INFO(LOGGER, "Simulated arm: time: %fs, lost writes: %ld, lost reads: %ld", sim_.time(), sim_write_lost_cnts_, sim_read_lost_cnts_);
+        }
 
 
         RCLCPP_INFO(LOGGER, "System sucessfully stopped!");
@@ -118,8 +231,29 @@ namespace uf_robot_hardware
 
     hardware_interface::return_type UFRobotFakeSystemHardware::read()
     {
-        joint_state_msg_.header.stamp = node_->get_clock()->now();
-        joint_state_pub_->publish(joint_state_msg_);
+        if (sim_enabled_) {
+            _inject_latency(read_latency_, read_latency_jitter_);
+            double dt = sim_fixed_step_;
+            if (dt <= 0) {
+                std::chrono::steady_clock::time_point now = std::chrono::steady_clock::now();
+                dt = std::min(std::chrono::duration<double>(now - prev_step_time_).count(), 1.0);
+                prev_step_time_ = now;
+            }
+            sim_.step(dt);
+            if (!sim_.read_ok()) {
+                sim_read_lost_cnts_ += 1;
+                return hardware_interface::return_type::OK;
+            }
+            for (int i = 0; i < position_states_.size(); i++) {
+                position_states_[i] = sim_.position()[i];
+                velocity_states_[i] = sim_.velocity()[i];
+                effort_states_[i] = sim_.effort()[i];
+                joint_state_msg_.position[i] = position_states_[i];
+                joint_state_msg_.velocity[i] = velocity_states_[i];
+                joint_state_msg_.effort[i] = effort_states_[i];
+            }
+        }
+        _publish_joint_states();
         return hardware_interface::return_type::OK;
     }
 
@@ -137,7 +271,26 @@ namespace uf_robot_hardware
         // vel_str += "]";
         // RCLCPP_INFO(LOGGER, "positon: %s, velocity: %s", pos_str.c_str(), vel_str.c_str());
 
+        if (sim_enabled_) {
+            _inject_latency(write_latency_, write_latency_jitter_);
+            if (!sim_.command(position_cmds_, velocity_cmds_, velocity_control_)) sim_write_lost_cnts_ += 1;
+            return hardware_interface::return_type::OK;
+        }
+
+        rclcpp::Time curr_write_time = node_->get_clock()->now();
+        double dt = curr_write_time.seconds() - prev_write_time_.seconds();
+        prev_write_time_ = curr_write_time;
         for (int i = 0; i < position_cmds_.size(); i++) { 
+            if (dt > 0 && dt < 1) {
+                double velocity = (position_cmds_[i] - position_states_[i]) / dt;
+                effort_states_[i] = FAKE_JOINT_INERTIA * (velocity - motion_velocity_[i]) / dt + FAKE_JOINT_DAMPING * velocity;
+                motion_velocity_[i] = velocity;
+            }
+            else {
+                effort_states_[i] = 0;
+                motion_velocity_[i] = 0;
+            }
+            joint_state_msg_.effort[i] = effort_states_[i];
             position_states_[i] = position_cmds_[i];
             joint_state_msg_.position[i] = position_cmds_[i];
         }
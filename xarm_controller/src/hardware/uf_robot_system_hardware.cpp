@@ -53,8 +53,15 @@ namespace uf_robot_hardware
         node_ = rclcpp::Node::make_shared("ufactory_driver", node_options);
         hw_node_ = rclcpp::Node::make_shared("ufactory_robot_hw", node_options);
 
-        std::thread th([this]() -> void {
-            rclcpp::spin(node_);
+        // the services of the driver are in callback groups, see service_groups in xarm_params.yaml,
+        // a few threads are enough here and do not compete with the control loop like one per cpu core
+        int threads = 2;
+        node_->get_parameter_or("robot_hw.executor_threads", threads, 2);
+        if (threads <= 0) threads = 2;
+        std::thread th([this, threads]() -> void {
+            rclcpp::executors::MultiThreadedExecutor executor(rclcpp::ExecutorOptions(), threads);
+            executor.add_node(node_);
+            executor.spin();
             rclcpp::shutdown();
         });
         th.detach();
@@ -153,6 +160,164 @@ namespace uf_robot_hardware
         }
         
         xarm_driver_.init(node_, robot_ip_);
+
+        node_->get_parameter_or("robot_hw.read_from_report", read_from_report_, false);
+        node_->get_parameter_or("robot_hw.report_max_age", report_max_age_, 0.05);
+        node_->get_parameter_or("robot_hw.async_write", async_write_, false);
+        node_->get_parameter_or("robot_hw.parallel_io", parallel_io_, false);
+        node_->get_parameter_or("robot_hw.parallel_io_timeout", parallel_io_timeout_, 0.1);
+        node_->get_parameter_or("robot_hw.interpolate_rate", interpolate_rate_, 0.0);
+        // the writes of the arms only overlap when write() does not wait for the SDK
+        if (parallel_io_) async_write_ = true;
+        if (interpolate_rate_ > 0 && velocity_control_) {
+            RCLCPP_WARN(LOGGER, "[%s] interpolate_rate is only used for position control, ignored", robot_ip_.c_str());
+            interpolate_rate_ = 0;
+        }
+        RCLCPP_INFO(LOGGER, "[%s] read_from_report: %d, report_max_age: %f, async_write: %d, parallel_io: %d, interpolate_rate: %f", 
+            robot_ip_.c_str(), read_from_report_, report_max_age_, async_write_, parallel_io_, interpolate_rate_);
+
+        _init_statistics(hw_ns);
+        readiness_.reset(xarm_driver_.curr_err, xarm_driver_.curr_state, xarm_driver_.curr_mode);
+        status_source_ = [this]() {
+            return RobotStatus{xarm_driver_.curr_err, xarm_driver_.curr_state, xarm_driver_.curr_mode};
+        };
+        readiness_event_cb_ = [this](ReadinessEvent event, const RobotStatus &status) {
+            switch (event) {
+            case ReadinessEvent::ERROR_DETECTED:
+                RCLCPP_ERROR(LOGGER, "[%s] UFACTORY Error detected! Code C%d -> [ %s ] ", robot_ip_.c_str(), status.err, xarm_driver_.controller_error_interpreter(status.err).c_str());
+                break;
+            case ReadinessEvent::STATE_DETECTED:
+                RCLCPP_ERROR(LOGGER, "[%s] Robot State detected! State: %d", robot_ip_.c_str(), status.state);
+                break;
+            case ReadinessEvent::MODE_DETECTED:
+                RCLCPP_ERROR(LOGGER, "[%s] Robot Mode detected! Mode: %d", robot_ip_.c_str(), status.mode);
+                break;
+            case ReadinessEvent::READY:
+                RCLCPP_INFO(LOGGER, "[%s] Robot is Ready", robot_ip_.c_str());
+                break;
+            }
+        };
+    }
+
+    void UFRobotSystemHardware::_init_statistics(const std::string &hw_ns)
+    {
+        double diagnostics_period = 1.0;
+        node_->get_parameter_or("robot_hw.diagnostics_period", diagnostics_period, 1.0);
+        if (diagnostics_period > 0) {
+            diagnostics_pub_ = node_->create_publisher<diagnostic_msgs::msg::DiagnosticArray>("diagnostics", 1);
+            diagnostics_timer_ = node_->create_wall_timer(
+                std::chrono::duration<double>(diagnostics_period), std::bind(&UFRobotSystemHardware::_publish_diagnostics, this));
+        }
+        reset_statistics_service_ = node_->create_service<xarm_msgs::srv::Call>(hw_ns + "/reset_hw_statistics",
+            [this](const std::shared_ptr<xarm_msgs::srv::Call::Request> req, std::shared_ptr<xarm_msgs::srv::Call::Response> res) {
+                // applied by the next read(), the counters belong to the control loop
+                reset_statistics_ = true;
+                res->ret = 0;
+                res->message = "reset_hw_statistics";
+            });
+    }
+
+    void UFRobotSystemHardware::_reset_statistics(void)
+    {
+        read_cnts_ = 0;
+        read_failed_cnts_ = 0;
+        read_report_stale_cnts_ = 0;
+        parallel_io_timeout_cnts_ = 0;
+        {
+            std::lock_guard<std::mutex> lock(write_mutex_);
+            write_cnts_ = 0;
+            write_dropped_cnts_ = 0;
+        }
+        read_time_hist_.reset();
+        read_sdk_time_hist_.reset();
+        write_time_hist_.reset();
+        write_sdk_time_hist_.reset();
+        write_latency_hist_.reset();
+        cycle_period_hist_.reset();
+        cycle_jitter_hist_.reset();
+        prev_cycle_period_ = std::chrono::steady_clock::duration::zero();
+    }
+
+    static void _add_histogram_values(diagnostic_msgs::msg::DiagnosticStatus &status, const std::string &name, const LatencyHistogram &hist)
+    {
+        static const double PERCENTILES[] = {50, 90, 99, 99.9};
+        static const char *PERCENTILE_NAMES[] = {"p50", "p90", "p99", "p99.9"};
+        diagnostic_msgs::msg::KeyValue kv;
+        kv.key = name + ".count";
+        kv.value = std::to_string(hist.count());
+        status.values.push_back(kv);
+        kv.key = name + ".mean_ms";
+        kv.value = std::to_string(hist.mean() * 1000);
+        status.values.push_back(kv);
+        for (int i = 0; i < 4; i++) {
+            kv.key = name + "." + PERCENTILE_NAMES[i] + "_ms";
+            kv.value = std::to_string(hist.percentile(PERCENTILES[i]) * 1000);
+            status.values.push_back(kv);
+        }
+        kv.key = name + ".max_ms";
+        kv.value = std::to_string(hist.max() * 1000);
+        status.values.push_back(kv);
+    }
+
+    void UFRobotSystemHardware::_publish_diagnostics(void)
+    {
+        diagnostic_msgs::msg::DiagnosticArray msg;
+        diagnostic_msgs::msg::DiagnosticStatus status;
+        msg.header.stamp = node_->get_clock()->now();
+        status.name = info_.name + ": robot_hw";
+        status.hardware_id = robot_ip_;
+        long int read_failed_cnts = read_failed_cnts_;
+        if (read_failed_cnts > 0) {
+            status.level = diagnostic_msgs::msg::DiagnosticStatus::WARN;
+            status.message = "read failed " + std::to_string(read_failed_cnts) + " times";
+        }
+        else {
+            status.level = diagnostic_msgs::msg::DiagnosticStatus::OK;
+            status.message = "OK";
+        }
+        diagnostic_msgs::msg::KeyValue kv;
+        kv.key = "read.failed";
+        kv.value = std::to_string(read_failed_cnts);
+        status.values.push_back(kv);
+        kv.key = "read.report_stale";
+        kv.value = std::to_string(read_report_stale_cnts_.load());
+        status.values.push_back(kv);
+        kv.key = "read.parallel_timeout";
+        kv.value = std::to_string(parallel_io_timeout_cnts_.load());
+        status.values.push_back(kv);
+        kv.key = "write.dropped";
+        kv.value = std::to_string(write_dropped_cnts_.load());
+        status.values.push_back(kv);
+        if (interpolate_rate_ > 0) {
+            kv.key = "interpolate.sent";
+            kv.value = std::to_string(interp_send_cnts_.load());
+            status.values.push_back(kv);
+            kv.key = "interpolate.failed";
+            kv.value = std::to_string(interp_failed_cnts_.load());
+            status.values.push_back(kv);
+            kv.key = "interpolate.overruns";
+            kv.value = std::to_string(interp_overrun_cnts_.load());
+            status.values.push_back(kv);
+        }
+        _add_histogram_values(status, "read", read_time_hist_);
+        _add_histogram_values(status, "read.sdk", read_sdk_time_hist_);
+        _add_histogram_values(status, "write", write_time_hist_);
+        _add_histogram_values(status, "write.sdk", write_sdk_time_hist_);
+        if (async_write_) {
+            _add_histogram_values(status, "write.latency", write_latency_hist_);
+        }
+        _add_histogram_values(status, "cycle.period", cycle_period_hist_);
+        _add_histogram_values(status, "cycle.jitter", cycle_jitter_hist_);
+        msg.status.push_back(status);
+        diagnostics_pub_->publish(msg);
+    }
+
+    UFRobotSystemHardware::~UFRobotSystemHardware()
+    {
+        _stop_recovery_worker();
+        _stop_reader();
+        _stop_writer();
+        _stop_interpolator();
     }
 
     hardware_interface::return_type UFRobotSystemHardware::configure(const hardware_interface::HardwareInfo & info)
@@ -164,16 +329,36 @@ namespace uf_robot_hardware
 
         initialized_ = false;
         reload_controller_ = false;
+        recovery_running_ = false;
+        recovery_state_ = RECOVERY_IDLE;
 
         read_cnts_ = 0;
-        read_max_time_ = 0;
-        read_total_time_ = 0;
         read_failed_cnts_ = 0;
+        read_report_stale_cnts_ = 0;
+
+        async_write_ = false;
+        write_cmd_pending_ = false;
+        writer_running_ = false;
+        write_cmd_failed_ = false;
+        write_cnts_ = 0;
+        write_dropped_cnts_ = 0;
+        interpolate_rate_ = 0;
+        interp_running_ = false;
+        interp_send_cnts_ = 0;
+        interp_failed_cnts_ = 0;
+        interp_overrun_cnts_ = 0;
+        parallel_io_ = false;
+        reader_running_ = false;
+        read_io_state_ = READ_IO_IDLE;
+        parallel_io_timeout_cnts_ = 0;
+        reset_statistics_ = false;
+        prev_cycle_period_ = std::chrono::steady_clock::duration::zero();
 
         _init_ufactory_driver();
         
         position_states_.resize(info_.joints.size(), std::numeric_limits<double>::quiet_NaN());
         velocity_states_.resize(info_.joints.size(), std::numeric_limits<double>::quiet_NaN());
+        effort_states_.resize(info_.joints.size(), std::numeric_limits<double>::quiet_NaN());
         position_cmds_.resize(info_.joints.size(), std::numeric_limits<double>::quiet_NaN());
         velocity_cmds_.resize(info_.joints.size(), std::numeric_limits<double>::quiet_NaN());
 
@@ -220,6 +405,8 @@ namespace uf_robot_hardware
                 info_.joints[i].name, hardware_interface::HW_IF_POSITION, &position_states_[i]));
             state_interfaces.emplace_back(hardware_interface::StateInterface(
                 info_.joints[i].name, hardware_interface::HW_IF_VELOCITY, &velocity_states_[i]));
+            state_interfaces.emplace_back(hardware_interface::StateInterface(
+                info_.joints[i].name, hardware_interface::HW_IF_EFFORT, &effort_states_[i]));
         }
 
         return state_interfaces;
@@ -268,6 +455,14 @@ namespace uf_robot_hardware
                 velocity_cmds_[i] = velocity_states_[i];
             }
         }
+        for (uint i = 0; i < effort_states_.size(); i++) {
+            if (std::isnan(effort_states_[i])) effort_states_[i] = 0;
+        }
+
+        _start_recovery_worker();
+        if (async_write_) _start_writer();
+        if (parallel_io_) _start_reader();
+        if (interpolate_rate_ > 0) _start_interpolator();
 
         status_ = hardware_interface::status::STARTED;
         
@@ -280,15 +475,21 @@ namespace uf_robot_hardware
         RCLCPP_INFO(LOGGER, "[%s] Stopping ...please wait...", robot_ip_.c_str());
         status_ = hardware_interface::status::STOPPED;
 
+        _stop_recovery_worker();
+        _stop_reader();
+        _stop_writer();
+        _stop_interpolator();
         xarm_driver_.arm->set_mode(XARM_MODE::POSE);
 
         RCLCPP_INFO(LOGGER, "[%s] System sucessfully stopped!", robot_ip_.c_str());
         return hardware_interface::return_type::OK;
     }
 
-    void UFRobotSystemHardware::_reload_controller(void) {
+    bool UFRobotSystemHardware::_reload_controller(void) {
+        recovery_state_ = RECOVERY_LIST_CONTROLLERS;
         int ret = _call_request(client_list_controller_, req_list_controller_, res_list_controller_);
         if (ret == 0 && res_list_controller_->controller.size() > 0) {
+            recovery_state_ = RECOVERY_SWITCH_CONTROLLERS;
             req_switch_controller_->start_controllers.resize(res_list_controller_->controller.size());
             req_switch_controller_->stop_controllers.resize(res_list_controller_->controller.size());
             for (uint i = 0; i < res_list_controller_->controller.size(); i++) {
@@ -298,43 +499,116 @@ namespace uf_robot_hardware
             req_switch_controller_->strictness = controller_manager_msgs::srv::SwitchController::Request::BEST_EFFORT;
             _call_request(client_switch_controller_, req_switch_controller_, res_switch_controller_);
         }
-        if (ret == 0) {
+        return ret == 0;
+    }
+
+    void UFRobotSystemHardware::_start_recovery_worker(void)
+    {
+        if (recovery_thread_.joinable()) return;
+        recovery_state_ = RECOVERY_IDLE;
+        recovery_running_ = true;
+        recovery_thread_ = std::thread(&UFRobotSystemHardware::_recovery_loop, this);
+    }
+
+    void UFRobotSystemHardware::_stop_recovery_worker(void)
+    {
+        if (!recovery_thread_.joinable()) return;
+        {
+            std::lock_guard<std::mutex> lock(recovery_mutex_);
+            recovery_running_ = false;
+        }
+        recovery_cond_.notify_all();
+        recovery_thread_.join();
+    }
+
+    void UFRobotSystemHardware::_request_recovery(void)
+    {
+        {
+            std::lock_guard<std::mutex> lock(recovery_mutex_);
+            int expected = RECOVERY_IDLE;
+            if (!recovery_state_.compare_exchange_strong(expected, RECOVERY_REQUESTED)) return;
+        }
+        recovery_cond_.notify_all();
+    }
+
+    void UFRobotSystemHardware::_poll_recovery(void)
+    {
+        // only the control loop moves the state out of DONE/FAILED
+        int state = recovery_state_;
+        if (state == RECOVERY_DONE) {
             reload_controller_ = false;
+            recovery_state_ = RECOVERY_IDLE;
+        }
+        else if (state == RECOVERY_FAILED) {
+            recovery_state_ = RECOVERY_IDLE;
+        }
+    }
+
+    void UFRobotSystemHardware::_recovery_loop(void)
+    {
+        // the service calls wait for the controller_manager, which can only answer while the control loop runs,
+        // so they must not be made from read()/write()
+        while (true) {
+            {
+                std::unique_lock<std::mutex> lock(recovery_mutex_);
+                recovery_cond_.wait(lock, [this] { return recovery_state_ == RECOVERY_REQUESTED || !recovery_running_; });
+                if (!recovery_running_) break;
+            }
+            RCLCPP_INFO(LOGGER, "[%s] Reloading controllers ...", robot_ip_.c_str());
+            bool ok = _reload_controller();
+            RCLCPP_INFO(LOGGER, "[%s] Reload controllers %s", robot_ip_.c_str(), ok ? "done" : "failed");
+            recovery_state_ = ok ? RECOVERY_DONE : RECOVERY_FAILED;
         }
     }
 
     hardware_interface::return_type UFRobotSystemHardware::read()
     {
+        std::chrono::steady_clock::time_point read_start = std::chrono::steady_clock::now();
+        if (reset_statistics_.exchange(false)) {
+            _reset_statistics();
+        }
+        // read() is called once per controller_manager cycle
+        else if (read_cnts_ > 0) {
+            std::chrono::steady_clock::duration period = read_start - prev_read_start_;
+            cycle_period_hist_.record(period);
+            if (prev_cycle_period_ != std::chrono::steady_clock::duration::zero()) {
+                cycle_jitter_hist_.record(period > prev_cycle_period_ ? period - prev_cycle_period_ : prev_cycle_period_ - period);
+            }
+            prev_cycle_period_ = period;
+        }
+        prev_read_start_ = read_start;
+
         read_cnts_ += 1;
+        _poll_recovery();
         read_ready_ = _xarm_is_ready_read();
-        rclcpp::Time start = node_->get_clock()->now();
 
         bool use_new = _firmware_version_is_ge(1, 8, 103);
-        if (use_new)
-			read_code_ = xarm_driver_.arm->get_joint_states(curr_read_position_, curr_read_velocity_, curr_read_effort_);
-		else
-			read_code_ = xarm_driver_.arm->get_servo_angle(curr_read_position_);
+        bool from_report = read_from_report_ && _read_report_joint_states();
+        bool in_flight = false;
+        if (from_report) {
+            read_code_ = 0;
+        }
+        else if (!parallel_io_ || !_wait_parallel_read(in_flight)) {
+            if (in_flight) {
+                // the reader thread still waits for the timed out query, the SDK must not be called concurrently, keep the last states
+                read_time_hist_.record(std::chrono::steady_clock::now() - read_start);
+                return hardware_interface::return_type::OK;
+            }
+            read_code_ = _query_joint_states(use_new, curr_read_position_, curr_read_velocity_, curr_read_effort_);
+        }
         
         curr_read_time_ = node_->get_clock()->now();
         read_ready_ = read_ready_ && _xarm_is_ready_read();
-        double time_sec = curr_read_time_.seconds() - start.seconds();
-        read_total_time_ += time_sec;
-        if (time_sec > read_max_time_) {
-            read_max_time_ = time_sec;
-        }
-        // if (read_cnts_ % 6000 == 0) {
-        //     RCLCPP_INFO(LOGGER, "[%s] [READ] cnt: %ld, max: %f, mean: %f, failed: %ld", robot_ip_.c_str(), read_cnts_, read_max_time_, read_total_time_ / read_cnts_, read_failed_cnts_);
-        // }
         if (read_code_ == 0 && read_ready_) {
             for (int j = 0; j < info_.joints.size(); j++) {
                 position_states_[j] = curr_read_position_[j];
-				if (use_new) {
+				if (use_new || from_report) {
 					velocity_states_[j] = curr_read_velocity_[j];
-					// effort_states_[j] = curr_read_effort_[j];
+					effort_states_[j] = curr_read_effort_[j];
 				}
 				else {
 					velocity_states_[j] = !initialized_ ? 0.0 : (curr_read_position_[j] - prev_read_position_[j]) / (curr_read_time_.seconds() - prev_read_time_.seconds());
-					// effort_states_[j] = 0.0;
+					effort_states_[j] = 0.0;
 				}
             }
             if (!initialized_) {
@@ -343,7 +617,7 @@ namespace uf_robot_hardware
                     velocity_cmds_[i] = 0.0;
                 }
                 if (reload_controller_ && _check_cmds_is_change(curr_read_position_, prev_read_position_)) {
-                    _reload_controller();
+                    _request_recovery();
                 }
             }
             memcpy(prev_read_position_, curr_read_position_, sizeof(float) * 7);
@@ -362,14 +636,22 @@ namespace uf_robot_hardware
             }
         }
 
+        read_time_hist_.record(std::chrono::steady_clock::now() - read_start);
         return hardware_interface::return_type::OK;
     }
 
     hardware_interface::return_type UFRobotSystemHardware::write()
     {
+        std::chrono::steady_clock::time_point write_start = std::chrono::steady_clock::now();
         if (_need_reset()) {
             if (initialized_) reload_controller_ = true;
             initialized_ = false;
+            if (interpolate_rate_ > 0) {
+                // start over from the next command instead of interpolating across the stop
+                std::lock_guard<std::mutex> lock(interp_mutex_);
+                interpolator_.reset(position_cmds_.size());
+            }
+            write_time_hist_.record(std::chrono::steady_clock::now() - write_start);
             return hardware_interface::return_type::OK;
         }
         initialized_ = true;
@@ -392,22 +674,29 @@ namespace uf_robot_hardware
                 cmds_float_[i] = (float)velocity_cmds_[i];
             }
             // RCLCPP_INFO(LOGGER, "[%s] velocity: %s", robot_ip_.c_str(), vel_str.c_str());
-            cmd_ret = xarm_driver_.arm->vc_set_joint_velocity(cmds_float_, true, VELO_DURATION);
-            if (cmd_ret != 0) {
-                RCLCPP_WARN(LOGGER, "[%s] vc_set_joint_velocity, ret=%d", robot_ip_.c_str(), cmd_ret);
-            }
+            if (async_write_)
+                _post_cmds(cmds_float_);
+            else
+                cmd_ret = _send_cmds(cmds_float_);
         }
         else {
             for (int i = 0; i < position_cmds_.size(); i++) { 
                 cmds_float_[i] = (float)position_cmds_[i];
             }
+            if (interpolate_rate_ > 0) {
+                _feed_interpolator(cmds_float_);
+                write_time_hist_.record(std::chrono::steady_clock::now() - write_start);
+                return hardware_interface::return_type::OK;
+            }
             curr_write_time_ = node_->get_clock()->now();
-            if (curr_write_time_.seconds() - prev_write_time_.seconds() > 1 || _check_cmds_is_change(prev_cmds_float_, cmds_float_)) {
+            // a failed async send is retried with the latest command
+            bool resend = async_write_ && write_cmd_failed_.exchange(false);
+            if (resend || curr_write_time_.seconds() - prev_write_time_.seconds() > 1 || _check_cmds_is_change(prev_cmds_float_, cmds_float_)) {
                 // RCLCPP_INFO(LOGGER, "[%s] positon: %s", robot_ip_.c_str(), pos_str.c_str());
-                cmd_ret = xarm_driver_.arm->set_servo_angle_j(cmds_float_, 0, 0, 0);
-                if (cmd_ret != 0) {
-                    RCLCPP_WARN(LOGGER, "[%s] set_servo_angle_j, ret= %d", robot_ip_.c_str(), cmd_ret);
-                }
+                if (async_write_)
+                    _post_cmds(cmds_float_);
+                else
+                    cmd_ret = _send_cmds(cmds_float_);
                 if (cmd_ret == 0) {
                     prev_write_time_ = curr_write_time_;
                     for (int i = 0; i < 7; i++) { 
@@ -417,9 +706,150 @@ namespace uf_robot_hardware
             }
         }
 
+        write_time_hist_.record(std::chrono::steady_clock::now() - write_start);
         return hardware_interface::return_type::OK;
     }
 
+    int UFRobotSystemHardware::_send_cmds(float *cmds)
+    {
+        int cmd_ret = 0;
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+        if (velocity_control_) {
+            cmd_ret = xarm_driver_.arm->vc_set_joint_velocity(cmds, true, VELO_DURATION);
+            if (cmd_ret != 0) {
+                RCLCPP_WARN(LOGGER, "[%s] vc_set_joint_velocity, ret=%d", robot_ip_.c_str(), cmd_ret);
+            }
+        }
+        else {
+            cmd_ret = xarm_driver_.arm->set_servo_angle_j(cmds, 0, 0, 0);
+            if (cmd_ret != 0) {
+                RCLCPP_WARN(LOGGER, "[%s] set_servo_angle_j, ret= %d", robot_ip_.c_str(), cmd_ret);
+            }
+        }
+        write_sdk_time_hist_.record(std::chrono::steady_clock::now() - start);
+        return cmd_ret;
+    }
+
+    void UFRobotSystemHardware::_post_cmds(float *cmds)
+    {
+        {
+            std::lock_guard<std::mutex> lock(write_mutex_);
+            // depth-1 mailbox, the latest command wins
+            if (write_cmd_pending_) write_dropped_cnts_ += 1;
+            memcpy(write_cmd_, cmds, sizeof(float) * 7);
+            write_cmd_stamp_ = std::chrono::steady_clock::now();
+            write_cmd_pending_ = true;
+        }
+        write_cond_.notify_one();
+    }
+
+    void UFRobotSystemHardware::_start_writer(void)
+    {
+        if (writer_thread_.joinable()) return;
+        write_cmd_pending_ = false;
+        writer_running_ = true;
+        writer_thread_ = std::thread(&UFRobotSystemHardware::_writer_loop, this);
+    }
+
+    void UFRobotSystemHardware::_stop_writer(void)
+    {
+        if (!writer_thread_.joinable()) return;
+        {
+            std::lock_guard<std::mutex> lock(write_mutex_);
+            writer_running_ = false;
+        }
+        write_cond_.notify_one();
+        writer_thread_.join();
+        RCLCPP_INFO(LOGGER, "[%s] [WRITE] cnt: %ld, dropped: %ld, send max: %f, send mean: %f, latency max: %f", robot_ip_.c_str(), 
+            write_cnts_.load(), write_dropped_cnts_.load(), write_sdk_time_hist_.max(), write_sdk_time_hist_.mean(), write_latency_hist_.max());
+    }
+
+    void UFRobotSystemHardware::_writer_loop(void)
+    {
+        float cmds[7];
+        std::chrono::steady_clock::time_point stamp;
+        while (true) {
+            {
+                std::unique_lock<std::mutex> lock(write_mutex_);
+                write_cond_.wait(lock, [this] { return write_cmd_pending_ || !writer_running_; });
+                if (!writer_running_) break;
+                memcpy(cmds, write_cmd_, sizeof(float) * 7);
+                stamp = write_cmd_stamp_;
+                write_cmd_pending_ = false;
+                write_cnts_ += 1;
+            }
+            int cmd_ret = _send_cmds(cmds);
+            if (cmd_ret != 0) write_cmd_failed_ = true;
+            // from write() posting the command until it is sent
+            write_latency_hist_.record(std::chrono::steady_clock::now() - stamp);
+        }
+    }
+
+    void UFRobotSystemHardware::_feed_interpolator(float *cmds)
+    {
+        // every cycle, the interpolator needs evenly spaced commands even if they do not change
+        std::lock_guard<std::mutex> lock(interp_mutex_);
+        interpolator_.push(std::chrono::steady_clock::now(), cmds);
+    }
+
+    void UFRobotSystemHardware::_start_interpolator(void)
+    {
+        if (interp_thread_.joinable()) return;
+        interpolator_.reset(position_cmds_.size());
+        interp_running_ = true;
+        interp_thread_ = std::thread(&UFRobotSystemHardware::_interpolator_loop, this);
+    }
+
+    void UFRobotSystemHardware::_stop_interpolator(void)
+    {
+        if (!interp_thread_.joinable()) return;
+        {
+            std::lock_guard<std::mutex> lock(interp_mutex_);
+            interp_running_ = false;
+        }
+        interp_cond_.notify_one();
+        interp_thread_.join();
+        RCLCPP_INFO(LOGGER, "[%s] [INTERPOLATE] sent: %ld, failed: %ld, overruns: %ld", robot_ip_.c_str(), 
+            interp_send_cnts_.load(), interp_failed_cnts_.load(), interp_overrun_cnts_.load());
+    }
+
+    void UFRobotSystemHardware::_interpolator_loop(void)
+    {
+        std::chrono::steady_clock::duration period = std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+            std::chrono::duration<double>(1.0 / interpolate_rate_));
+        std::chrono::steady_clock::time_point next = std::chrono::steady_clock::now();
+        std::chrono::steady_clock::time_point last_send = next;
+        float cmds[7] = {0};
+        float sent_cmds[7] = {0};
+        bool has_sent = false;
+        while (true) {
+            next += period;
+            {
+                std::unique_lock<std::mutex> lock(interp_mutex_);
+                interp_cond_.wait_until(lock, next, [this] { return !interp_running_; });
+                if (!interp_running_) break;
+                if (!interpolator_.sample(next, cmds)) continue;
+            }
+            std::chrono::steady_clock::time_point now = std::chrono::steady_clock::now();
+            if (now - next > period) {
+                // fell behind, skip the missed ticks instead of sending them in a burst
+                interp_overrun_cnts_ += 1;
+                next = now;
+            }
+            // same keep-alive as the direct path, an unchanged command is resent after 1s
+            if (has_sent && now - last_send < std::chrono::seconds(1) && !_check_cmds_is_change(sent_cmds, cmds)) continue;
+            interp_send_cnts_ += 1;
+            if (_send_cmds(cmds) != 0) {
+                interp_failed_cnts_ += 1;
+                has_sent = false;
+                continue;
+            }
+            memcpy(sent_cmds, cmds, sizeof(float) * 7);
+            last_send = now;
+            has_sent = true;
+        }
+    }
+
     bool UFRobotSystemHardware::_check_cmds_is_change(float *prev, float *cur, double threshold)
 	{
 		for (int i = 0; i < 7; i++) {
@@ -430,54 +860,141 @@ namespace uf_robot_hardware
 
     bool UFRobotSystemHardware::_xarm_is_ready_read(void)
     {
-        static int last_err = xarm_driver_.curr_err;
-		int curr_err = xarm_driver_.curr_err;
-        if (curr_err != 0) {
-            if (last_err != curr_err) {
-                RCLCPP_ERROR(LOGGER, "[%s] UFACTORY Error detected! Code C%d -> [ %s ] ", robot_ip_.c_str(), curr_err, xarm_driver_.controller_error_interpreter(curr_err).c_str());
-            }
-        }
-        last_err = curr_err;
-        return last_err == 0;
+        return check_ready_read(readiness_, status_source_, readiness_event_cb_);
     }
 
     bool UFRobotSystemHardware::_xarm_is_ready_write(void)
     {
-        static bool last_not_ready = false;
-        static int last_state = xarm_driver_.curr_state;
-        static int last_mode = xarm_driver_.curr_mode;
-        int curr_mode = xarm_driver_.curr_mode;
-		int curr_state = xarm_driver_.curr_state;
+        return check_ready_write(readiness_, status_source_, velocity_control_ ? XARM_MODE::VELO_JOINT : XARM_MODE::SERVO, readiness_event_cb_);
+    }
+
+    int UFRobotSystemHardware::_query_joint_states(bool use_new, float *position, float *velocity, float *effort)
+    {
+        int ret;
+        std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+        if (use_new)
+            ret = xarm_driver_.arm->get_joint_states(position, velocity, effort);
+        else
+            ret = xarm_driver_.arm->get_servo_angle(position);
+        read_sdk_time_hist_.record(std::chrono::steady_clock::now() - start);
+        return ret;
+    }
 
-        if (!_xarm_is_ready_read()) {
-            last_not_ready = true;
-            return false;
+    std::mutex UFRobotSystemHardware::io_group_mutex_;
+    std::vector<UFRobotSystemHardware *> UFRobotSystemHardware::io_group_;
+
+    void UFRobotSystemHardware::_start_reader(void)
+    {
+        if (reader_thread_.joinable()) return;
+        read_io_state_ = READ_IO_IDLE;
+        read_io_generation_ = 0;
+        read_io_busy_ = false;
+        reader_running_ = true;
+        reader_thread_ = std::thread(&UFRobotSystemHardware::_reader_loop, this);
+        std::lock_guard<std::mutex> lock(io_group_mutex_);
+        io_group_.push_back(this);
+    }
+
+    void UFRobotSystemHardware::_stop_reader(void)
+    {
+        {
+            std::lock_guard<std::mutex> lock(io_group_mutex_);
+            io_group_.erase(std::remove(io_group_.begin(), io_group_.end(), this), io_group_.end());
+        }
+        if (!reader_thread_.joinable()) return;
+        {
+            std::lock_guard<std::mutex> lock(read_io_mutex_);
+            reader_running_ = false;
         }
+        read_io_cond_.notify_all();
+        reader_thread_.join();
+    }
 
-        if (curr_state > 2) {
-            if (last_state != curr_state) {
-                last_state = curr_state;
-                RCLCPP_ERROR(LOGGER, "[%s] Robot State detected! State: %d", robot_ip_.c_str(), curr_state);
-            }
-            last_not_ready = true;
+    void UFRobotSystemHardware::_request_read(void)
+    {
+        {
+            std::lock_guard<std::mutex> lock(read_io_mutex_);
+            if (read_io_state_ == READ_IO_PENDING) return;
+            read_io_state_ = READ_IO_PENDING;
+            read_io_generation_ += 1;
+        }
+        read_io_cond_.notify_all();
+    }
+
+    bool UFRobotSystemHardware::_wait_parallel_read(bool &in_flight)
+    {
+        // the first arm to read in a cycle starts the queries of all arms of this controller_manager,
+        // so the arms wait for the controller box in parallel instead of one after the other
+        bool idle;
+        {
+            std::lock_guard<std::mutex> lock(read_io_mutex_);
+            idle = read_io_state_ == READ_IO_IDLE;
+        }
+        if (idle) {
+            std::lock_guard<std::mutex> lock(io_group_mutex_);
+            for (auto hw : io_group_) hw->_request_read();
+        }
+        std::unique_lock<std::mutex> lock(read_io_mutex_);
+        if (!read_io_cond_.wait_for(lock, std::chrono::duration<double>(parallel_io_timeout_), [this] { return read_io_state_ == READ_IO_DONE; })) {
+            // abandon the running query, its result would be older than the next request and is dropped by its generation
+            in_flight = read_io_busy_;
+            read_io_state_ = READ_IO_IDLE;
+            parallel_io_timeout_cnts_ += 1;
+            RCLCPP_WARN_THROTTLE(LOGGER, *node_->get_clock(), 5000, "[%s] Parallel read timeout (%ld)", robot_ip_.c_str(), parallel_io_timeout_cnts_.load());
             return false;
         }
-        last_state = curr_state;
+        read_code_ = read_io_code_;
+        memcpy(curr_read_position_, read_io_position_, sizeof(float) * 7);
+        memcpy(curr_read_velocity_, read_io_velocity_, sizeof(float) * 7);
+        memcpy(curr_read_effort_, read_io_effort_, sizeof(float) * 7);
+        read_io_state_ = READ_IO_IDLE;
+        return true;
+    }
 
-        if (!(velocity_control_ ? curr_mode == XARM_MODE::VELO_JOINT : curr_mode == XARM_MODE::SERVO)) {
-            if (last_mode != curr_mode) {
-                last_mode = curr_mode;
-                RCLCPP_ERROR(LOGGER, "[%s] Robot Mode detected! Mode: %d", robot_ip_.c_str(), curr_mode);
+    void UFRobotSystemHardware::_reader_loop(void)
+    {
+        float position[7];
+        float velocity[7];
+        float effort[7];
+        bool use_new = _firmware_version_is_ge(1, 8, 103);
+        unsigned long generation;
+        while (true) {
+            {
+                std::unique_lock<std::mutex> lock(read_io_mutex_);
+                read_io_cond_.wait(lock, [this] { return read_io_state_ == READ_IO_PENDING || !reader_running_; });
+                if (!reader_running_) break;
+                generation = read_io_generation_;
+                read_io_busy_ = true;
             }
-            last_not_ready = true;
-            return false;
+            int ret = _query_joint_states(use_new, position, velocity, effort);
+            {
+                std::lock_guard<std::mutex> lock(read_io_mutex_);
+                read_io_busy_ = false;
+                // a timed out request may already be followed by a new one, which needs a new query
+                if (read_io_state_ == READ_IO_PENDING && read_io_generation_ == generation) {
+                    read_io_code_ = ret;
+                    memcpy(read_io_position_, position, sizeof(float) * 7);
+                    memcpy(read_io_velocity_, velocity, sizeof(float) * 7);
+                    memcpy(read_io_effort_, effort, sizeof(float) * 7);
+                    read_io_state_ = READ_IO_DONE;
+                }
+            }
+            read_io_cond_.notify_all();
         }
-        last_mode = curr_mode;
+    }
 
-        if (last_not_ready) {
-            RCLCPP_INFO(LOGGER, "[%s] Robot is Ready", robot_ip_.c_str());
+    bool UFRobotSystemHardware::_read_report_joint_states(void)
+    {
+        // the report socket pushes the joint states, no request/response round trip in the control loop
+        if (!xarm_driver_.get_report_joint_states(report_states_, report_max_age_)) {
+            read_report_stale_cnts_ += 1;
+            RCLCPP_WARN_THROTTLE(LOGGER, *node_->get_clock(), 5000, "[%s] No report data within %fs, query joint states instead (stale: %ld)", 
+                robot_ip_.c_str(), report_max_age_, read_report_stale_cnts_.load());
+            return false;
         }
-        last_not_ready = false;
+        memcpy(curr_read_position_, report_states_.position, sizeof(float) * 7);
+        memcpy(curr_read_velocity_, report_states_.velocity, sizeof(float) * 7);
+        memcpy(curr_read_effort_, report_states_.effort, sizeof(float) * 7);
         return true;
     }
 
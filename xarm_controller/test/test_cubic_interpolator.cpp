@@ -0,0 +1,98 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+/**
+ * The interpolated position stream of UFRobotSystemHardware (robot_hw.interpolate_rate) must pass through
+ * the commands, keep the velocity continuous at them and hold once a segment is finished.
+ * run with: colcon test --packages-select xarm_controller
+ */
+
+#include <gtest/gtest.h>
+#include <chrono>
+#include "xarm_controller/hardware/cubic_interpolator.h"
+
+using uf_robot_hardware::CubicInterpolator;
+
+static CubicInterpolator::TimePoint at(double sec)
+{
+    static const CubicInterpolator::TimePoint base = std::chrono::steady_clock::now();
+    return base + std::chrono::duration_cast<std::chrono::steady_clock::duration>(std::chrono::duration<double>(sec));
+}
+
+static float sample(const CubicInterpolator &interpolator, double sec)
+{
+    float out[1];
+    EXPECT_TRUE(interpolator.sample(at(sec), out));
+    return out[0];
+}
+
+static double velocity(const CubicInterpolator &interpolator, double from, double to)
+{
+    return (sample(interpolator, to) - sample(interpolator, from)) / (to - from);
+}
+
+TEST(CubicInterpolatorTest, empty_until_first_command)
+{
+    CubicInterpolator interpolator;
+    interpolator.reset(1);
+    float out[1];
+    EXPECT_TRUE(interpolator.empty());
+    EXPECT_FALSE(interpolator.sample(at(0), out));
+    float cmd = 2;
+    interpolator.push(at(0), &cmd);
+    EXPECT_FALSE(interpolator.empty());
+    EXPECT_FLOAT_EQ(sample(interpolator, 0), 2);
+    EXPECT_FLOAT_EQ(sample(interpolator, 5), 2);
+}
+
+TEST(CubicInterpolatorTest, passes_knots_with_continuous_velocity)
+{
+    const float cmds[] = {0, 1, 4, 9, 16};
+    const double eps = 1e-3;
+    CubicInterpolator interpolator;
+    interpolator.reset(1);
+    interpolator.push(at(0), &cmds[0]);
+    double end_velocity = 0;
+    for (int k = 1; k < 5; k++) {
+        // the segment to cmds[k] runs from its arrival (t=k) for one period
+        interpolator.push(at(k), &cmds[k]);
+        EXPECT_NEAR(sample(interpolator, k), cmds[k - 1], 1e-4) << "knot " << k;
+        EXPECT_NEAR(sample(interpolator, k + 1), cmds[k], 1e-4) << "knot " << k;
+        EXPECT_NEAR(velocity(interpolator, k, k + eps), end_velocity, 0.02) << "knot " << k;
+        end_velocity = velocity(interpolator, k + 1 - eps, k + 1);
+        // ends on the slope of the last two commands
+        EXPECT_NEAR(end_velocity, cmds[k] - cmds[k - 1], 0.02) << "knot " << k;
+        // never swings back behind the previous command
+        EXPECT_GE(sample(interpolator, k + 0.5), cmds[k - 1]);
+    }
+}
+
+TEST(CubicInterpolatorTest, holds_after_segment)
+{
+    const float cmds[] = {0, 1, 3};
+    CubicInterpolator interpolator;
+    interpolator.reset(1);
+    for (int k = 0; k < 3; k++) interpolator.push(at(k * 0.01), &cmds[k]);
+    EXPECT_NEAR(sample(interpolator, 0.03), 3, 1e-4);
+    EXPECT_FLOAT_EQ(sample(interpolator, 0.05), sample(interpolator, 1.0));
+    EXPECT_NEAR(sample(interpolator, 1.0), 3, 1e-4);
+}
+
+TEST(CubicInterpolatorTest, joints_are_independent)
+{
+    const float cmds[3][2] = {{0, 5}, {1, 5}, {2, 4}};
+    CubicInterpolator interpolator;
+    interpolator.reset(2);
+    for (int k = 0; k < 3; k++) interpolator.push(at(k), cmds[k]);
+    float out[2];
+    ASSERT_TRUE(interpolator.sample(at(2), out));
+    EXPECT_NEAR(out[0], 1, 1e-4);
+    EXPECT_NEAR(out[1], 5, 1e-4);
+    ASSERT_TRUE(interpolator.sample(at(3), out));
+    EXPECT_NEAR(out[0], 2, 1e-4);
+    EXPECT_NEAR(out[1], 4, 1e-4);
+}
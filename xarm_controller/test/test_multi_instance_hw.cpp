@@ -0,0 +1,164 @@
+/* Copyright 2021 UFACTORY Inc. All Rights Reserved.
+ *
+ * Software License Agreement (BSD License)
+ *
+ * Author: Vinman <vinman.cub@gmail.com>
+ ============================================================================*/
+
+/**
+ * Several arms share one controller_manager, every UFRobotSystemHardware decides its readiness with
+ * check_ready_read/check_ready_write on its own tracker and must only ever see its own transitions.
+ * run with: colcon test --packages-select xarm_controller
+ */
+
+#include <gtest/gtest.h>
+#include <atomic>
+#include <memory>
+#include <thread>
+#include <vector>
+#include "xarm_controller/hardware/readiness_tracker.h"
+
+using uf_robot_hardware::ReadinessEvent;
+using uf_robot_hardware::ReadinessTracker;
+using uf_robot_hardware::RobotStatus;
+
+static const int SERVO_MODE = 1;
+
+// the status of all arms of one controller_manager, every arm reads its own status from it
+class SharedStatusSource
+{
+public:
+    explicit SharedStatusSource(int arm_count) : err_(arm_count), state_(arm_count), mode_(arm_count)
+    {
+        for (int k = 0; k < arm_count; k++) set(k, 0, 0, SERVO_MODE);
+    }
+
+    void set(int arm_id, int err, int state, int mode)
+    {
+        err_[arm_id] = err;
+        state_[arm_id] = state;
+        mode_[arm_id] = mode;
+    }
+
+    void set_err(int arm_id, int err) { err_[arm_id] = err; }
+
+    uf_robot_hardware::StatusSource source(int arm_id)
+    {
+        return [this, arm_id]() {
+            return RobotStatus{err_[arm_id].load(), state_[arm_id].load(), mode_[arm_id].load()};
+        };
+    }
+
+private:
+    std::vector<std::atomic<int>> err_;
+    std::vector<std::atomic<int>> state_;
+    std::vector<std::atomic<int>> mode_;
+};
+
+// the readiness of one arm as UFRobotSystemHardware runs it, with the events it would log
+struct Arm
+{
+    Arm(SharedStatusSource &controller, int arm_id) : source(controller.source(arm_id))
+    {
+        on_event = [this](ReadinessEvent event, const RobotStatus &status) { events.push_back(event); };
+    }
+
+    bool ready_read(void) { return uf_robot_hardware::check_ready_read(tracker, source, on_event); }
+    bool ready_write(void) { return uf_robot_hardware::check_ready_write(tracker, source, SERVO_MODE, on_event); }
+    std::vector<ReadinessEvent> take_events(void)
+    {
+        std::vector<ReadinessEvent> taken;
+        taken.swap(events);
+        return taken;
+    }
+
+    ReadinessTracker tracker;
+    uf_robot_hardware::StatusSource source;
+    uf_robot_hardware::ReadinessEventCallback on_event;
+    std::vector<ReadinessEvent> events;
+};
+
+TEST(MultiInstanceHwTest, error_of_one_arm_does_not_gate_the_other)
+{
+    SharedStatusSource controller(2);
+    Arm arm0(controller, 0);
+    Arm arm1(controller, 1);
+
+    EXPECT_TRUE(arm0.ready_write());
+    EXPECT_TRUE(arm1.ready_write());
+    EXPECT_TRUE(arm0.take_events().empty());
+    EXPECT_TRUE(arm1.take_events().empty());
+
+    // arm0 reports an error, logged once by arm0 only, arm1 keeps running
+    controller.set_err(0, 22);
+    EXPECT_FALSE(arm0.ready_read());
+    EXPECT_TRUE(arm1.ready_read());
+    EXPECT_FALSE(arm0.ready_write());
+    EXPECT_TRUE(arm1.ready_write());
+    EXPECT_EQ(arm0.take_events(), std::vector<ReadinessEvent>({ReadinessEvent::ERROR_DETECTED}));
+    EXPECT_TRUE(arm1.take_events().empty());
+    EXPECT_TRUE(arm0.tracker.not_ready());
+    EXPECT_FALSE(arm1.tracker.not_ready());
+
+    // arm1 is stopped while arm0 recovers
+    controller.set(1, 0, 4, SERVO_MODE);
+    controller.set_err(0, 0);
+    EXPECT_FALSE(arm1.ready_write());
+    EXPECT_TRUE(arm0.ready_write());
+    EXPECT_FALSE(arm1.ready_write());
+    EXPECT_TRUE(arm0.ready_write());
+    EXPECT_EQ(arm0.take_events(), std::vector<ReadinessEvent>({ReadinessEvent::READY}));
+    EXPECT_EQ(arm1.take_events(), std::vector<ReadinessEvent>({ReadinessEvent::STATE_DETECTED}));
+
+    // a wrong mode of arm0 does not touch arm1's recovery
+    controller.set(0, 0, 0, 4);
+    controller.set(1, 0, 0, SERVO_MODE);
+    EXPECT_FALSE(arm0.ready_write());
+    EXPECT_TRUE(arm1.ready_write());
+    EXPECT_EQ(arm0.take_events(), std::vector<ReadinessEvent>({ReadinessEvent::MODE_DETECTED}));
+    EXPECT_EQ(arm1.take_events(), std::vector<ReadinessEvent>({ReadinessEvent::READY}));
+}
+
+// every arm toggles its own error code with its own period, returns the number of wrong results and events
+int run_readiness(Arm &arm, SharedStatusSource &controller, int arm_id, int cycles)
+{
+    int period = arm_id + 2;
+    int wrong = 0;
+    int last = 0;
+    for (int n = 0; n < cycles; n++) {
+        int err = (n / period) % 2 ? arm_id + 1 : 0;
+        controller.set_err(arm_id, err);
+        if (arm.ready_read() != (err == 0)) wrong += 1;
+        if (arm.ready_write() != (err == 0)) wrong += 1;
+        // an error is logged once when it appears, the arm is ready again once it is cleared
+        std::vector<ReadinessEvent> expected;
+        if (err != 0 && last == 0) expected.push_back(ReadinessEvent::ERROR_DETECTED);
+        if (err == 0 && last != 0) expected.push_back(ReadinessEvent::READY);
+        if (arm.take_events() != expected) wrong += 1;
+        last = err;
+    }
+    return wrong;
+}
+
+TEST(MultiInstanceHwTest, concurrent_readiness_is_per_instance)
+{
+    const int arm_count = 4;
+    const int cycles = 100000;
+    SharedStatusSource controller(arm_count);
+    std::vector<std::unique_ptr<Arm>> arms;
+    for (int k = 0; k < arm_count; k++) arms.emplace_back(new Arm(controller, k));
+    std::vector<int> wrong(arm_count, 0);
+    std::vector<std::thread> threads;
+    std::atomic<bool> go(false);
+    for (int k = 0; k < arm_count; k++) {
+        threads.emplace_back([&, k]() {
+            while (!go) std::this_thread::yield();
+            wrong[k] = run_readiness(*arms[k], controller, k, cycles);
+        });
+    }
+    go = true;
+    for (auto &th : threads) th.join();
+    for (int k = 0; k < arm_count; k++) {
+        EXPECT_EQ(wrong[k], 0) << "arm" << k;
+    }
+}
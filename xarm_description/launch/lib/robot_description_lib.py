@@ -6,24 +6,232 @@
 #
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
-from launch.substitutions import Command, FindExecutable, PathJoinSubstitution
+import os
+import re
+import json
+import shlex
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from tempfile import NamedTemporaryFile
+import launch.logging
+from ament_index_python import get_package_share_directory
+from launch.substitution import Substitution
+from launch.substitutions import PathJoinSubstitution
+from launch.substitutions.substitution_failure import SubstitutionFailure
+from launch.utilities import normalize_to_list_of_substitutions, perform_substitutions
 from launch_ros.substitutions import FindPackageShare
 
 
+def get_xarm_cache_dir(*paths):
+    # XARM_CACHE_DIR > ROS_HOME/xarm_cache > ~/.ros/xarm_cache
+    cache_dir = os.environ.get('XARM_CACHE_DIR', '')
+    if not cache_dir:
+        ros_home = os.environ.get('ROS_HOME', os.path.join(os.path.expanduser('~'), '.ros'))
+        cache_dir = os.path.join(ros_home, 'xarm_cache')
+    return os.path.join(cache_dir, *paths)
+
+
+def _file_sha256(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except Exception:
+        return ''
+
+
+def _get_xacro_version():
+    try:
+        with open(os.path.join(get_package_share_directory('xacro'), 'package.xml'), 'r') as f:
+            match = re.search(r'<version>\s*([^<\s]+)\s*</version>', f.read())
+            if match:
+                return match.group(1)
+    except Exception:
+        pass
+    return ''
+
+
+class XacroFileCache(object):
+    """
+    On-disk cache of expanded xacro files.
+
+    Entries are keyed by the xacro version, the top-level xacro file and the sorted
+    xacro arguments (arguments naming an existing file are keyed by content).
+    Every entry records the content hash of all included files, a change in any of them
+    invalidates the entry.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir if cache_dir else get_xarm_cache_dir('xacro')
+
+    def get_key(self, xacro_file, mappings):
+        data = {
+            'xacro_version': _get_xacro_version(),
+            'xacro_file': os.path.abspath(xacro_file),
+            'mappings': sorted(mappings.items()),
+            'files': sorted((val, _file_sha256(val)) for val in mappings.values() if val and os.path.isfile(val)),
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, '{}.json'.format(key)), 'r') as f:
+                entry = json.load(f)
+            for path, sha256 in entry['deps'].items():
+                if _file_sha256(path) != sha256:
+                    return None
+            return entry['content']
+        except Exception:
+            return None
+
+    def save(self, key, content, deps):
+        entry = {
+            'deps': {os.path.abspath(path): _file_sha256(path) for path in deps},
+            'content': content
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with NamedTemporaryFile(mode='w', dir=self.cache_dir, prefix='.{}_'.format(key), delete=False) as h:
+                json.dump(entry, h)
+            os.replace(h.name, os.path.join(self.cache_dir, '{}.json'.format(key)))
+        except Exception as e:
+            launch.logging.get_logger('xacro').warning('save xacro cache failed, {}'.format(e))
+
+
+def _run_xacro(cmd, xacro_file, argv):
+    result = subprocess.run([cmd, xacro_file] + argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise SubstitutionFailure('executed command failed. Command: {}\nCaptured stderr output: {}'.format(
+            ' '.join([cmd, xacro_file] + argv), result.stderr))
+    if result.stderr:
+        launch.logging.get_logger('xacro').warning('{}'.format(result.stderr))
+    return result.stdout
+
+
+def _get_xacro_module():
+    """Import xacro once per process and keep its parsed files in memory between expansions."""
+    try:
+        import xacro
+    except ImportError:
+        return None
+    if not hasattr(xacro.parse, 'xarm_parse_cache'):
+        origin_parse = xacro.parse
+        parsed_docs = {}
+
+        def parse(inp, filename=None):
+            if inp is not None or not filename:
+                return origin_parse(inp, filename)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return origin_parse(inp, filename)
+            key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+            if key not in parsed_docs:
+                parsed_docs[key] = origin_parse(inp, filename)
+            # xacro modifies the document while processing it, never hand out the cached one
+            return parsed_docs[key].cloneNode(True)
+
+        parse.xarm_parse_cache = parsed_docs
+        xacro.parse = parse
+        xacro.xarm_lock = threading.Lock()
+    return xacro
+
+
+def _process_xacro(xacro, xacro_file, mappings):
+    with xacro.xarm_lock:
+        all_includes = getattr(xacro, 'all_includes', None)
+        if all_includes is not None:
+            del all_includes[:]
+        doc = xacro.process_file(xacro_file, mappings=mappings)
+        deps = [xacro_file] + list(all_includes) if all_includes is not None else None
+    return doc.toprettyxml(indent='  ', **getattr(xacro, 'encoding', {})), deps
+
+
+def _get_launch_memo(context):
+    """Expanded descriptions of the current launch, kept on the LaunchContext so they live as long as the launch."""
+    if context is None:
+        return None
+    memo = getattr(context, 'xarm_xacro_memo', None)
+    if memo is None:
+        memo = {}
+        try:
+            setattr(context, 'xarm_xacro_memo', memo)
+        except AttributeError:
+            return None
+    return memo
+
+
+class XacroFileContent(Substitution):
+    """
+    Substitution that expands a xacro file, reusing the on-disk cache when possible.
+
+    On a cache miss the file is expanded with the xacro module inside the launch process,
+    the `xacro` executable is only used when the module can not be imported or fails.
+    """
+    def __init__(self, xacro_file, arguments={}, use_cache=True, in_process=True):
+        super().__init__()
+        self.__xacro_file = normalize_to_list_of_substitutions(xacro_file)
+        # keep the same tokenization as the former `xacro file key:=val` Command
+        self.__arguments = []
+        if arguments and isinstance(arguments, dict):
+            for key, val in arguments.items():
+                self.__arguments.extend(normalize_to_list_of_substitutions(['{}:='.format(key), val, ' ']))
+        self.__use_cache = use_cache and os.environ.get('XARM_XACRO_CACHE', 'true').lower() not in ('0', 'false')
+        self.__in_process = in_process and os.environ.get('XARM_XACRO_IN_PROCESS', 'true').lower() not in ('0', 'false')
+
+    def describe(self):
+        return 'XacroFileContent({})'.format(' + '.join([sub.describe() for sub in self.__xacro_file]))
+
+    def perform(self, context):
+        xacro_file = perform_substitutions(context, self.__xacro_file)
+        argv = shlex.split(perform_substitutions(context, self.__arguments))
+        mappings = dict(arg.split(':=', 1) for arg in argv if ':=' in arg)
+
+        # identical descriptions are expanded once per launch, whichever node or launch file asks for them
+        memo = _get_launch_memo(context)
+        memo_key = (os.path.abspath(xacro_file), tuple(sorted(mappings.items())))
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
+        start = time.time()
+        content, source = self.__expand(xacro_file, argv, mappings)
+        launch.logging.get_logger('xacro').info('expand {} took {:.3f}s ({})'.format(
+            os.path.basename(xacro_file), time.time() - start, source))
+        if memo is not None:
+            memo[memo_key] = content
+        return content
+
+    def __expand(self, xacro_file, argv, mappings):
+        cache = XacroFileCache() if self.__use_cache else None
+        if cache:
+            key = cache.get_key(xacro_file, mappings)
+            content = cache.load(key)
+            if content is not None:
+                return content, 'disk cache'
+
+        xacro = _get_xacro_module() if self.__in_process else None
+        if xacro is not None:
+            try:
+                # xacro adds the default values of its arguments to the mappings
+                content, deps = _process_xacro(xacro, xacro_file, dict(mappings))
+                if cache and deps is not None:
+                    cache.save(key, content, deps)
+                return content, 'in-process'
+            except Exception as e:
+                launch.logging.get_logger('xacro').debug('in-process xacro failed, fall back to the executable: {}'.format(e))
+
+        cmd = shutil.which('xacro')
+        if cmd is None:
+            raise SubstitutionFailure('executable \'xacro\' not found on the PATH')
+        content = _run_xacro(cmd, xacro_file, argv)
+        if cache:
+            deps = _run_xacro(cmd, xacro_file, ['--deps'] + argv).split()
+            cache.save(key, content, [xacro_file] + deps)
+        return content, 'executable'
+
+
 def get_xacro_file_content(
-    xacro_file=PathJoinSubstitution([FindPackageShare('xarm_description'), 'urdf', 'xarm_device.urdf.xacro']), 
+    xacro_file=PathJoinSubstitution([FindPackageShare('xarm_description'), 'urdf', 'xarm_device.urdf.xacro']),
     arguments={}):
-    command = [
-        PathJoinSubstitution([FindExecutable(name='xacro')]),
-        ' ',
-        xacro_file,
-        ' '
-    ]
-    if arguments and isinstance(arguments, dict):
-        for key, val in arguments.items():
-            command.extend([
-                '{}:='.format(key),
-                val,
-                ' '
-            ])
-    return Command(command)
+    return XacroFileContent(xacro_file, arguments=arguments)